@@ -0,0 +1,56 @@
+"""Benchmark decoding the bytecode of all methods in decompiled/.
+
+Run from the root of the repository:
+
+    python benchmarks/decode.py
+
+Methods with opcodes that cannot be decoded are skipped.
+"""
+
+from pathlib import Path
+import json
+import time
+
+from jpamb import jvm
+
+
+def methods(folder: Path) -> list[list[dict]]:
+    found = []
+    for file in sorted(folder.rglob("*.json")):
+        for method in json.loads(file.read_text())["methods"]:
+            if not method["code"]:
+                continue
+            try:
+                jvm.decode_method(method["code"]["bytecode"])
+            except NotImplementedError:
+                continue
+            found.append(method["code"]["bytecode"])
+    return found
+
+
+def best_of(repeat: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    bytecodes = methods(Path("decompiled"))
+    count = sum(map(len, bytecodes))
+    print(f"Decoding {len(bytecodes)} methods with {count} opcodes")
+
+    def decode():
+        for bytecode in bytecodes:
+            jvm.decode_method(bytecode)
+
+    for name, validate in [("without validation", False), ("with validation", True)]:
+        with jvm.validation(validate):
+            seconds = best_of(20, decode)
+        print(f"{name:20} {seconds * 1e3:7.2f} ms  {seconds / count * 1e6:5.2f} us/op")
+
+
+if __name__ == "__main__":
+    main()
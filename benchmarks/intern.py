@@ -0,0 +1,34 @@
+"""Report the memory used by the opcodes of all methods in the suite, with
+and without interning, and the time to compare all pairs of methods.
+
+Run from the root of the repository:
+
+    python benchmarks/intern.py
+"""
+
+import time
+
+from jpamb import jvm, model
+
+
+def main():
+    suite = model.Suite()
+    for key, value in suite.opcode_memory().items():
+        print(f"{key:16} {value:8d}")
+
+    methods = [opcodes for _, opcodes in suite.all_opcodes()]
+    interner = jvm.Interner()
+    interned = [interner.method(opcodes) for opcodes in methods]
+
+    start = time.perf_counter()
+    plain = sum(a == b for a in methods for b in methods)
+    middle = time.perf_counter()
+    shared = sum(a.same_as(b) for a in interned for b in interned)
+    end = time.perf_counter()
+    assert plain <= shared
+    print(f"compare, plain    {(middle - start) * 1e3:8.2f} ms")
+    print(f"compare, interned {(end - middle) * 1e3:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
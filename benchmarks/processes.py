@@ -0,0 +1,33 @@
+"""Stress test the process runner by running many trivial analyzers.
+
+Run from the root of the repository:
+
+    python benchmarks/processes.py [COUNT] [JOBS]
+"""
+
+import sys
+import threading
+import time
+
+from jpamb import process
+
+ANALYZER = [sys.executable, "-S", "-c", "print('ok;100%')"]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    jobs = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+
+    start = time.perf_counter()
+    results = process.run_many([ANALYZER] * count, jobs=jobs, timeout=10)
+    seconds = time.perf_counter() - start
+
+    failed = [r for r in results if isinstance(r, Exception)]
+    assert all(r[0] == "ok;100%\n" for r in results if not isinstance(r, Exception))
+    print(f"ran {count} analyzers, {jobs} at a time, in {seconds:.2f}s")
+    print(f"{count / seconds:.0f} runs/s, {len(failed)} failed")
+    print(f"{threading.active_count()} threads alive")
+
+
+if __name__ == "__main__":
+    main()
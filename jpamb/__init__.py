@@ -1,9 +1,36 @@
-from jpamb import jvm
-from jpamb.model import Suite, Input
+"""
+jpamb
 
-from typing import NoReturn, Any
+The functions used by analyzers to read their arguments. Importing jpamb is
+cheap, as the submodules, and 'Suite' and 'Input', are imported when first
+used; the startup of an analyzer is part of its time.
 
-from pathlib import Path
+"""
+
+from typing import NoReturn, Any, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from jpamb import jvm
+    from jpamb.model import Suite, Input
+
+_LAZY = {"Suite": "jpamb.model", "Input": "jpamb.model"}
+
+
+def __getattr__(name: str):
+    import importlib
+
+    if name in _LAZY:
+        return getattr(importlib.import_module(_LAZY[name]), name)
+    if name.startswith("__"):
+        raise AttributeError(name)
+    try:
+        return importlib.import_module(f"jpamb.{name}")
+    except ModuleNotFoundError as e:
+        if e.name != f"jpamb.{name}":
+            raise
+        raise AttributeError(f"module 'jpamb' has no attribute {name!r}") from None
 
 
 def getmethodid(
@@ -12,7 +39,7 @@ def getmethodid(
     group: str,
     tags: list[str],
     for_science: bool,
-) -> jvm.AbsMethodID:
+) -> "jvm.AbsMethodID":
     """Get the method id from the program arguments, or output the info."""
 
     import sys
@@ -24,7 +51,7 @@ def getmethodid(
     return parse_methodid(mid)
 
 
-def getcase() -> tuple[jvm.AbsMethodID, Input]:
+def getcase() -> tuple["jvm.AbsMethodID", "Input"]:
     """Get the case from the program arguments."""
     import sys
 
@@ -55,17 +82,25 @@ def printinfo(
     sys.exit(0)
 
 
-def sourcefile(lookup: jvm.Absolute[Any] | jvm.ClassName) -> Path:
+def sourcefile(lookup: "jvm.Absolute[Any] | jvm.ClassName") -> "Path":
+    from jpamb.model import Suite
+
     return Suite().sourcefile(lookup.classname)
 
 
-def classfile(lookup: jvm.Absolute[Any] | jvm.ClassName) -> Path:
+def classfile(lookup: "jvm.Absolute[Any] | jvm.ClassName") -> "Path":
+    from jpamb.model import Suite
+
     return Suite().classfile(lookup.classname)
 
 
-def parse_methodid(mid) -> jvm.AbsMethodID:
-    return jvm.AbsMethodID.decode(mid)
+def parse_methodid(mid) -> "jvm.AbsMethodID":
+    from jpamb.jvm.base import AbsMethodID
+
+    return AbsMethodID.decode(mid)
+
 
+def parse_input(i) -> "Input":
+    from jpamb.model import Input
 
-def parse_input(i) -> Input:
     return Input.decode(i)
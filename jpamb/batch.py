@@ -0,0 +1,374 @@
+"""
+jpamb.batch
+
+This module runs one method on many inputs at once. The locals and the
+operand stack are numpy arrays with one lane per input, and each instruction
+is executed as a vectorized operation over the lanes that are at it.
+
+When the lanes disagree on a branch they are split, and they reconverge at
+the immediate post-dominator of the branch, like threads on a SIMT machine
+(the entries on the reconvergence stack are called warps here).
+
+Only methods with int, boolean, and char parameters that do not call other
+methods or use arrays can be run in batch, other methods fall back on the
+'jpamb.interpreter' one input at a time. See 'BatchInterpreter.supports'.
+
+This module requires numpy.
+
+"""
+
+from dataclasses import dataclass
+from typing import Sequence
+
+import numpy as np
+
+from jpamb import jvm, model
+from jpamb.interpreter import (
+    DEFAULT_MAX_STEPS,
+    DIVIDE_BY_ZERO,
+    EXCEPTIONS,
+    NON_TERMINATION,
+    OK,
+    Interpreter,
+    from_value,
+    parameter_slots,
+)
+
+EXIT = -1
+"""The virtual instruction all returns and throws go to."""
+
+COMPARISONS = {
+    "eq": np.equal,
+    "ne": np.not_equal,
+    "lt": np.less,
+    "ge": np.greater_equal,
+    "gt": np.greater,
+    "le": np.less_equal,
+}
+
+
+def successors(opcodes: Sequence[jvm.Opcode], i: int) -> list[int]:
+    """The instructions that can follow instruction i, ignoring exceptions."""
+    match opcodes[i]:
+        case jvm.Goto(target=t):
+            return [t]
+        case jvm.If(target=t) | jvm.Ifz(target=t):
+            return [i + 1, t]
+        case jvm.Return() | jvm.Throw():
+            return [EXIT]
+    return [i + 1]
+
+
+def postdominators(opcodes: Sequence[jvm.Opcode]) -> list[int]:
+    """Compute the immediate post-dominator of each instruction.
+
+    Uses the algorithm by Cooper, Harvey, and Kennedy on the reversed
+    control flow graph. Instructions that cannot reach an exit, like the
+    ones in an infinite loop, are post-dominated by EXIT.
+    """
+    n = len(opcodes)
+    preds = [[] for _ in range(n)]
+    exits = []
+    for i in range(n):
+        for s in successors(opcodes, i):
+            if s == EXIT:
+                exits.append(i)
+            else:
+                preds[s].append(i)
+
+    # Postorder of the reversed graph, starting from the exit.
+    order, visited = [], set()
+    stack = [(EXIT, iter(exits))]
+    while stack:
+        node, children = stack[-1]
+        for c in children:
+            if c not in visited:
+                visited.add(c)
+                stack.append((c, iter(preds[c])))
+                break
+        else:
+            stack.pop()
+            order.append(node)
+    number = {node: k for k, node in enumerate(order)}
+
+    ipdom = {EXIT: EXIT}
+
+    def intersect(a, b):
+        while a != b:
+            while number[a] < number[b]:
+                a = ipdom[a]
+            while number[b] < number[a]:
+                b = ipdom[b]
+        return a
+
+    changed = True
+    while changed:
+        changed = False
+        for node in reversed(order[:-1]):
+            new = None
+            for s in successors(opcodes, node):
+                if s in ipdom:
+                    new = s if new is None else intersect(s, new)
+            if ipdom.get(node) != new:
+                ipdom[node] = new
+                changed = True
+
+    return [ipdom.get(i, EXIT) for i in range(n)]
+
+
+@dataclass
+class Warp:
+    """A group of lanes at the same instruction.
+
+    The lanes run until they reach the 'reconverge' instruction, where they
+    are joined with the lanes of the warp below it on the stack.
+    """
+
+    pc: int
+    lanes: np.ndarray
+    sp: int
+    reconverge: int
+
+
+class BatchInterpreter:
+    """Runs a method on many inputs with vectorized instructions.
+
+    The outcomes are the same as running each input with the
+    'jpamb.interpreter', including the step budget of 'max_steps'.
+    """
+
+    def __init__(
+        self,
+        suite: model.Suite | None = None,
+        max_steps: int = DEFAULT_MAX_STEPS,
+    ):
+        self.interpreter = Interpreter(suite, max_steps)
+        self.max_steps = max_steps
+        self.ipdoms: dict[jvm.AbsMethodID, list[int]] = {}
+
+    @property
+    def suite(self) -> model.Suite:
+        return self.interpreter.suite
+
+    def supports(self, methodid: jvm.AbsMethodID) -> bool:
+        """Check if the method can be run in batch."""
+        scalars = (jvm.Int, jvm.Boolean, jvm.Char, jvm.Short, jvm.Byte)
+        if not all(isinstance(p, scalars) for p in methodid.extension.params):
+            return False
+        for op in self.interpreter.opcodes(methodid):
+            match op:
+                case jvm.Push(value=jvm.Value(type=jvm.Int())):
+                    pass
+                case jvm.Load() | jvm.Store() | jvm.Incr() | jvm.Binary():
+                    pass
+                case jvm.If() | jvm.Ifz() if op.condition in COMPARISONS:
+                    pass
+                case jvm.Goto() | jvm.New() | jvm.Throw() | jvm.Dup(words=1):
+                    pass
+                case jvm.Cast(to_=jvm.Int() | jvm.Short() | jvm.Byte() | jvm.Char()):
+                    pass
+                case jvm.Return(type=None | jvm.Int()):
+                    pass
+                case jvm.Get(static=True, field=f) if (
+                    f.extension.name == "$assertionsDisabled"
+                ):
+                    pass
+                case jvm.InvokeSpecial(method=m) if m.extension.name == "<init>":
+                    pass
+                case _:
+                    return False
+        return True
+
+    def run_many(
+        self, methodid: jvm.AbsMethodID, inputs: Sequence[model.Input]
+    ) -> list[str]:
+        """Run the method on each of the inputs and return the outcomes."""
+        if not self.supports(methodid):
+            return [self.interpreter.run(methodid, i) for i in inputs]
+        if methodid not in self.ipdoms:
+            self.ipdoms[methodid] = postdominators(self.interpreter.opcodes(methodid))
+        return Batch(self, methodid, inputs).run()
+
+
+class Batch:
+    """The state of running a method on a batch of inputs."""
+
+    def __init__(
+        self,
+        runner: BatchInterpreter,
+        methodid: jvm.AbsMethodID,
+        inputs: Sequence[model.Input],
+    ):
+        self.opcodes = runner.interpreter.opcodes(methodid)
+        self.ipdom = runner.ipdoms[methodid]
+        self.max_steps = runner.max_steps
+        self.size = len(inputs)
+        self.outcomes: list[str | None] = [None] * self.size
+        self.done = np.zeros(self.size, dtype=bool)
+        self.steps = np.zeros(self.size, dtype=np.int64)
+        self.stack: list[np.ndarray] = []
+        self.locals: dict[int, np.ndarray] = {}
+        for k, slot in enumerate(parameter_slots(methodid.extension.params)):
+            self.locals[slot] = np.array(
+                [from_value(i.values[k]) for i in inputs], dtype=np.int64
+            )
+        self.classes: list[jvm.ClassName] = []
+
+    def slot(self, sp: int) -> np.ndarray:
+        while len(self.stack) <= sp:
+            self.stack.append(np.zeros(self.size, dtype=np.int64))
+        return self.stack[sp]
+
+    def local(self, index: int) -> np.ndarray:
+        if index not in self.locals:
+            self.locals[index] = np.zeros(self.size, dtype=np.int64)
+        return self.locals[index]
+
+    def finish(self, lanes: np.ndarray, outcome: str):
+        """Record the outcome of the lanes, and remove them from the run."""
+        over = self.steps[lanes] > self.max_steps
+        for lane, o in zip(lanes.tolist(), over.tolist()):
+            self.outcomes[lane] = NON_TERMINATION if o else outcome
+        self.done[lanes] = True
+
+    def run(self) -> list[str]:
+        warps = [Warp(0, np.arange(self.size), 0, EXIT)]
+        while warps:
+            warp = warps[-1]
+            if len(warp.lanes) == 0 or warp.pc == warp.reconverge:
+                warps.pop()
+                if warps:
+                    below = warps[-1]
+                    below.lanes = below.lanes[~self.done[below.lanes]]
+                    if below.pc == warp.pc:
+                        below.sp = warp.sp
+                continue
+            self.steps[warp.lanes] += 1
+            self.step(warps, warp, self.opcodes[warp.pc])
+        return self.outcomes
+
+    def wrap(self, values: np.ndarray, bits: int = 32) -> np.ndarray:
+        half = 1 << (bits - 1)
+        return ((values + half) & ((half << 1) - 1)) - half
+
+    def step(self, warps: list[Warp], warp: Warp, op: jvm.Opcode):
+        lanes, sp = warp.lanes, warp.sp
+        match op:
+            case jvm.Push(value=v):
+                self.slot(sp)[lanes] = v.value
+                warp.sp += 1
+            case jvm.Load(index=n):
+                self.slot(sp)[lanes] = self.local(n)[lanes]
+                warp.sp += 1
+            case jvm.Store(index=n):
+                self.local(n)[lanes] = self.stack[sp - 1][lanes]
+                warp.sp -= 1
+            case jvm.Dup():
+                self.slot(sp)[lanes] = self.stack[sp - 1][lanes]
+                warp.sp += 1
+            case jvm.Incr(index=n, amount=a):
+                local = self.local(n)
+                local[lanes] = self.wrap(local[lanes] + a)
+            case jvm.Cast(to_=to):
+                top = self.stack[sp - 1]
+                match to:
+                    case jvm.Short():
+                        top[lanes] = self.wrap(top[lanes], 16)
+                    case jvm.Byte():
+                        top[lanes] = self.wrap(top[lanes], 8)
+                    case jvm.Char():
+                        top[lanes] = top[lanes] & 0xFFFF
+            case jvm.Binary(operant=opr):
+                a, b = self.stack[sp - 2][lanes], self.stack[sp - 1][lanes]
+                match opr:
+                    case jvm.BinaryOpr.Add:
+                        r = self.wrap(a + b)
+                    case jvm.BinaryOpr.Sub:
+                        r = self.wrap(a - b)
+                    case jvm.BinaryOpr.Mul:
+                        r = self.wrap(a * b)
+                    case jvm.BinaryOpr.Div | jvm.BinaryOpr.Rem:
+                        zero = b == 0
+                        if zero.any():
+                            self.finish(lanes[zero], DIVIDE_BY_ZERO)
+                            lanes, a, b = lanes[~zero], a[~zero], b[~zero]
+                            warp.lanes = lanes
+                        q = np.abs(a) // np.abs(b)
+                        if opr == jvm.BinaryOpr.Div:
+                            r = self.wrap(np.where((a < 0) == (b < 0), q, -q))
+                        else:
+                            r = np.abs(a) - q * np.abs(b)
+                            r = np.where(a < 0, -r, r)
+                self.stack[sp - 2][lanes] = r
+                warp.sp -= 1
+            case jvm.If(condition=c, target=t):
+                a, b = self.stack[sp - 2][lanes], self.stack[sp - 1][lanes]
+                warp.sp -= 2
+                self.branch(warps, warp, COMPARISONS[c](a, b), t)
+                return
+            case jvm.Ifz(condition=c, target=t):
+                a = self.stack[sp - 1][lanes]
+                warp.sp -= 1
+                self.branch(warps, warp, COMPARISONS[c](a, 0), t)
+                return
+            case jvm.Goto(target=t):
+                self.jump(warp, t)
+                return
+            case jvm.Get():
+                # We always run with assertions enabled, like `java -ea`.
+                self.slot(sp)[lanes] = 0
+                warp.sp += 1
+            case jvm.New(classname=cn):
+                if cn not in self.classes:
+                    self.classes.append(cn)
+                self.slot(sp)[lanes] = self.classes.index(cn)
+                warp.sp += 1
+            case jvm.InvokeSpecial(method=m):
+                # Constructors of the exceptions have no effects we track.
+                warp.sp -= len(m.extension.params) + 1
+            case jvm.Throw():
+                refs = self.stack[sp - 1][lanes]
+                for ref in np.unique(refs).tolist():
+                    name = self.classes[ref].slashed()
+                    if name not in EXCEPTIONS:
+                        raise NotImplementedError(f"Unhandled exception {name}")
+                    self.finish(lanes[refs == ref], EXCEPTIONS[name])
+                warp.lanes = lanes[:0]
+                return
+            case jvm.Return():
+                self.finish(lanes, OK)
+                warp.lanes = lanes[:0]
+                return
+            case _:
+                raise NotImplementedError(f"Unhandled {op!r}")
+        warp.pc += 1
+
+    def jump(self, warp: Warp, target: int):
+        if target <= warp.pc:
+            # Stop the lanes that are looping beyond the budget.
+            over = self.steps[warp.lanes] > self.max_steps
+            if over.any():
+                self.finish(warp.lanes[over], NON_TERMINATION)
+                warp.lanes = warp.lanes[~over]
+        warp.pc = target
+
+    def branch(self, warps: list[Warp], warp: Warp, taken: np.ndarray, target: int):
+        if taken.all():
+            self.jump(warp, target)
+            return
+        if not taken.any():
+            warp.pc += 1
+            return
+
+        # The lanes diverge, so continue with the warp at the post-dominator
+        # and push a warp for each side of the branch.
+        reconverge = self.ipdom[warp.pc]
+        lanes, pc = warp.lanes, warp.pc
+        if reconverge == warp.reconverge:
+            warps.pop()
+        else:
+            warp.pc = reconverge
+        warps.append(Warp(pc + 1, lanes[~taken], warp.sp, reconverge))
+        jumping = Warp(pc, lanes[taken], warp.sp, reconverge)
+        self.jump(jumping, target)
+        warps.append(jumping)
@@ -0,0 +1,271 @@
+"""
+jpamb.bench
+
+This module contains the benchmarks of jpamb itself, run with 'jpamb bench':
+micro benchmarks of the decoders and parsers that the cli and analyzers call
+for every case or method, and macro benchmarks of loading the suite and
+interpreting the cases. They run on the checked in 'decompiled/' folder and
+'stats/cases.txt'.
+
+Each benchmark is timed with 'perf_counter_ns', taking the best of several
+repeats, and then run once more under 'tracemalloc' to measure the memory it
+allocates. The results are saved as JSON, and can be compared with a saved
+baseline to find regressions.
+
+"""
+
+from dataclasses import dataclass, asdict
+import gc
+import json
+from pathlib import Path
+import time
+from time import perf_counter_ns
+import tracemalloc
+from typing import Callable
+
+from jpamb import jvm, model
+
+DEFAULT_FILE = Path(".jpamb-bench.json")
+
+# The relative slowdown of a benchmark that is reported as a regression.
+THRESHOLD = 0.10
+
+
+@dataclass(frozen=True)
+class Benchmark:
+    """A benchmark; 'setup' prepares the data and returns the number of
+    operations and a function doing them."""
+
+    name: str
+    kind: str
+    setup: Callable[[model.Suite], tuple[int, Callable[[], object]]]
+
+
+BENCHMARKS: dict[str, Benchmark] = {}
+
+
+def benchmark(name: str, kind: str = "micro"):
+    def register(setup):
+        BENCHMARKS[name] = Benchmark(name, kind, setup)
+        return setup
+
+    return register
+
+
+def _lines(suite: model.Suite) -> list[str]:
+    with open(suite.case_file) as fp:
+        return [line for line in fp if line.strip()]
+
+
+def _bytecode(suite: model.Suite) -> list[dict]:
+    """Every opcode of the decompiled methods that can be decoded."""
+    found = []
+    for file in sorted(suite.decompiledfiles()):
+        for method in json.loads(file.read_text())["methods"]:
+            for op in (method["code"] or {}).get("bytecode", []):
+                try:
+                    jvm.Opcode.from_json(op)
+                except NotImplementedError:
+                    continue
+                found.append(op)
+    return found
+
+
+@benchmark("AbsMethodID.decode")
+def _decode_methodid(suite):
+    methodids = [case.methodid.encode() for case in suite.cases]
+    decode = jvm.AbsMethodID.decode
+    return len(methodids), lambda: [decode(m) for m in methodids]
+
+
+@benchmark("Case.decode")
+def _decode_case(suite):
+    lines = _lines(suite)
+    return len(lines), lambda: [model.Case.decode(line) for line in lines]
+
+
+@benchmark("Input.decode")
+def _decode_input(suite):
+    inputs = [model.Case.match(line).group(2) for line in _lines(suite)]
+    return len(inputs), lambda: [model.Input.decode(i) for i in inputs]
+
+
+@benchmark("Opcode.from_json")
+def _decode_opcode(suite):
+    bytecode = _bytecode(suite)
+    decode = jvm.Opcode.from_json
+    return len(bytecode), lambda: [decode(op) for op in bytecode]
+
+
+@benchmark("Suite.findmethod")
+def _findmethod(suite):
+    methods = [m for m, _ in suite.case_methods()]
+    return len(methods), lambda: [suite.findmethod(m) for m in methods]
+
+
+@benchmark("Response.parse")
+def _parse_response(suite):
+    outputs = [
+        "\n".join(f"{q};{(i * 7 + j * 13) % 101}%" for j, q in enumerate(model.QUERIES))
+        for i in range(len(suite.cases))
+    ]
+    return len(outputs), lambda: [model.Response.parse(out) for out in outputs]
+
+
+@benchmark("Prediction.score")
+def _score(suite):
+    predictions = [model.Prediction.parse(f"{p}%") for p in range(101)]
+    predictions += [model.Prediction(w) for w in (-3.0, 0.5, 2.0)]
+    cases = [(p, happens) for p in predictions for happens in (False, True)]
+    return len(cases), lambda: [p.score(happens) for p, happens in cases]
+
+
+@benchmark("Suite.cases", "macro")
+def _cases(suite):
+    def load():
+        suite.invalidate_cache()
+        return suite.cases
+
+    return len(suite.cases), load
+
+
+@benchmark("Suite.method_opcodes", "macro")
+def _method_opcodes(suite):
+    methods = [m for m, _ in suite.case_methods()]
+    return len(methods), lambda: [suite.method_opcodes(m) for m in methods]
+
+
+@benchmark("ClassFile.opcodes", "macro")
+def _classfile_opcodes(suite):
+    methods = [m for m, _ in suite.case_methods()]
+
+    def decode():
+        suite.invalidate_cache()
+        return [suite.method_opcodes(m, "classfiles") for m in methods]
+
+    return len(methods), decode
+
+
+@benchmark("Interpreter.run", "macro")
+def _interpret(suite):
+    from jpamb.interpreter import Interpreter
+
+    cases = suite.cases
+
+    def interpret():
+        interpreter = Interpreter(suite)
+        return [interpreter.run(c.methodid, c.input) for c in cases]
+
+    return len(cases), interpret
+
+
+@dataclass
+class Result:
+    """The result of a benchmark; the times are of one call, doing 'ops'
+    operations, and the memory is in bytes."""
+
+    kind: str
+    ops: int
+    calls: int
+    best_ns: int
+    median_ns: int
+    peak: int
+    retained: int
+
+    @property
+    def ops_per_sec(self) -> float:
+        return self.ops / max(self.best_ns, 1) * 1e9
+
+
+def measure(bench: Benchmark, suite: model.Suite, repeat=5, min_time=0.2) -> Result:
+    """Time the benchmark, after a call to warm up, at least 'repeat' times
+    and for at least 'min_time' seconds; then measure the memory of one more
+    call."""
+    ops, fn = bench.setup(suite)
+    fn()
+    times = []
+    deadline = perf_counter_ns() + int(min_time * 1e9)
+    while len(times) < repeat or perf_counter_ns() < deadline:
+        start = perf_counter_ns()
+        fn()
+        times.append(perf_counter_ns() - start)
+    times.sort()
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = fn()
+        current, peak = tracemalloc.get_traced_memory()
+        del result
+    finally:
+        tracemalloc.stop()
+    return Result(
+        kind=bench.kind,
+        ops=ops,
+        calls=len(times),
+        best_ns=times[0],
+        median_ns=times[len(times) // 2],
+        peak=peak - before,
+        retained=current - before,
+    )
+
+
+def run(
+    suite: model.Suite, names=None, repeat=5, min_time=0.2, progress=None
+) -> dict[str, Result]:
+    results = {}
+    for name, bench in BENCHMARKS.items():
+        if names is not None and name not in names:
+            continue
+        if progress:
+            progress(name)
+        results[name] = measure(bench, suite, repeat, min_time)
+    return results
+
+
+def save(results: dict[str, Result], path: Path):
+    from jpamb.calibration import machine
+
+    with open(path, "w") as fp:
+        json.dump(
+            {
+                "machine": machine(),
+                "created": time.time(),
+                "results": {name: asdict(r) for name, r in results.items()},
+            },
+            fp,
+            indent=2,
+        )
+
+
+def load(path: Path) -> dict:
+    with open(path) as fp:
+        saved = json.load(fp)
+    saved["results"] = {n: Result(**r) for n, r in saved["results"].items()}
+    return saved
+
+
+@dataclass
+class Change:
+    """The change of a benchmark from the baseline, as the ratio of the
+    operations per second."""
+
+    name: str
+    ratio: float
+    regression: bool
+
+
+def compare(
+    baseline: dict[str, Result], results: dict[str, Result], threshold=THRESHOLD
+) -> dict[str, Change]:
+    """The change of each benchmark in both; a benchmark regressed if it does
+    less than '1 - threshold' of the operations per second of the baseline."""
+    changes = {}
+    for name, result in results.items():
+        if (old := baseline.get(name)) is None:
+            continue
+        ratio = result.ops_per_sec / old.ops_per_sec
+        changes[name] = Change(name, ratio, ratio < 1 - threshold)
+    return changes
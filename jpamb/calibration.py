@@ -0,0 +1,192 @@
+"""
+jpamb.calibration
+
+This module contains the calibration of the machine, which 'evaluate' uses
+to make the running times of analyzers comparable across machines. The
+machine is timed on a few small kernels, each stressing something an
+analyzer spends its time on, and the relative time of an analyzer is its
+time divided by a weighted geometric mean of the kernel times (see
+'PROFILES').
+
+The calibration is saved to a file, and reused as long as it is for the
+same machine and a quick re-check of the sieve kernel agrees with it.
+
+"""
+
+from dataclasses import dataclass, field, asdict
+import json
+import math
+from pathlib import Path
+import platform
+import sys
+import threading
+import time
+from time import perf_counter_ns
+
+from jpamb import timeline
+
+DEFAULT_FILE = Path(".jpamb-calibration.json")
+
+# The largest relative change of the sieve kernel before the machine is
+# calibrated again.
+TOLERANCE = 0.25
+
+
+def _sieve():
+    from jpamb import timer
+
+    timer.sieve(100_000)
+
+
+def _python():
+    # A loop of plain bytecode: the collatz steps of the first numbers.
+    steps = 0
+    for n in range(1, 3_000):
+        while n != 1:
+            n = n // 2 if n % 2 == 0 else 3 * n + 1
+            steps += 1
+    return steps
+
+
+def _allocation():
+    # Many small, short lived dicts and tuples, like the states of an
+    # abstract interpreter.
+    states = {}
+    for i in range(60_000):
+        state = {"pc": (i % 97, i), "stack": (i, i + 1, None)}
+        states[i % 1024] = (state, tuple(state))
+    return len(states)
+
+
+def _memory():
+    # Copy a buffer much larger than the caches.
+    src = bytearray(32 * 1024 * 1024)
+    dst = bytearray(len(src))
+    for _ in range(2):
+        dst[:] = src
+    return len(dst)
+
+
+KERNELS = {
+    "sieve": _sieve,
+    "python": _python,
+    "allocation": _allocation,
+    "memory": _memory,
+}
+
+# The weights of the kernels in the composite time, by kind of analyzer.
+PROFILES = {
+    "python": {"sieve": 1, "python": 3, "allocation": 2, "memory": 1},
+    "native": {"sieve": 3, "python": 0, "allocation": 1, "memory": 2},
+}
+
+
+def time_kernel(kernel, repeat: int = 5) -> int:
+    """The fastest of 'repeat' runs of the kernel, in nanoseconds."""
+    best = math.inf
+    for _ in range(repeat):
+        start = perf_counter_ns()
+        kernel()
+        best = min(best, perf_counter_ns() - start)
+    return best
+
+
+def machine() -> dict[str, str]:
+    """What identifies the machine a calibration is valid for."""
+    return {
+        "node": platform.node(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "python": sys.version.split()[0],
+    }
+
+
+@dataclass
+class Calibration:
+    """The times of the kernels on a machine, in nanoseconds."""
+
+    kernels: dict[str, int]
+    machine: dict[str, str] = field(default_factory=machine)
+    created: float = field(default_factory=time.time)
+
+    @staticmethod
+    def measure(repeat: int = 5) -> "Calibration":
+        return Calibration(
+            {name: time_kernel(kernel, repeat) for name, kernel in KERNELS.items()}
+        )
+
+    def composite(self, profile: str = "python") -> float:
+        """The weighted geometric mean of the kernel times, in nanoseconds."""
+        weights = PROFILES[profile]
+        total = sum(weights.values())
+        return math.exp(
+            sum(w * math.log(self.kernels[k]) for k, w in weights.items()) / total
+        )
+
+    def relative(self, ns: int, profile: str = "python") -> float:
+        """The log10 of the time relative to the composite of the profile."""
+        return math.log10(ns / self.composite(profile))
+
+    def recheck(self) -> bool:
+        """Check that the machine is still as fast as when calibrated."""
+        with timeline.span("recheck", "calibration") as span:
+            sieve = time_kernel(KERNELS["sieve"], repeat=3)
+            span.annotate(sieve=sieve)
+        return abs(sieve / self.kernels["sieve"] - 1) <= TOLERANCE
+
+    def save(self, path: Path = DEFAULT_FILE):
+        with open(path, "w") as fp:
+            json.dump(asdict(self), fp, indent=2)
+
+    @staticmethod
+    def load(path: Path = DEFAULT_FILE) -> "Calibration | None":
+        """The saved calibration, if it is for this machine."""
+        try:
+            with open(path) as fp:
+                calibration = Calibration(**json.load(fp))
+        except (OSError, ValueError, TypeError):
+            return None
+        if calibration.machine != machine() or set(calibration.kernels) != set(KERNELS):
+            return None
+        return calibration
+
+
+def calibrate(path: Path | None = DEFAULT_FILE, force: bool = False) -> Calibration:
+    """The calibration of this machine: the saved one, if it still holds,
+    or a new one, which is saved."""
+    with timeline.span("calibrate", "calibration", force=force) as span:
+        if not force and path is not None:
+            if (calibration := Calibration.load(path)) and calibration.recheck():
+                span.annotate(cached=True)
+                return calibration
+        calibration = Calibration.measure()
+        if path is not None:
+            calibration.save(path)
+        return calibration
+
+
+@dataclass
+class Calibrator:
+    """Keeps the calibration of a session up to date, by re-checking it
+    every 'interval' seconds; it can be shared between threads."""
+
+    path: Path | None = DEFAULT_FILE
+    interval: float = 60.0
+    calibration: Calibration | None = None
+    checked: float = -math.inf
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def get(self) -> Calibration:
+        with self.lock:
+            return self._get()
+
+    def _get(self) -> Calibration:
+        now = time.monotonic()
+        if self.calibration is None:
+            self.calibration = calibrate(self.path)
+            self.checked = now
+        elif now - self.checked >= self.interval:
+            if not self.calibration.recheck():
+                self.calibration = calibrate(self.path, force=True)
+            self.checked = now
+        return self.calibration
@@ -2,6 +2,7 @@ import click
 from pathlib import Path
 import shlex
 import enum
+import itertools
 import math
 import sys
 import json
@@ -10,7 +11,8 @@ from collections import Counter
 import matplotlib.pyplot as plt
 import matplotlib.colors as colors
 
-from jpamb import model, logger, jvm
+from jpamb import model, logger, jvm, timeline
+from jpamb.events import NO_EVENTS, Events, open_events
 from jpamb.logger import log
 
 import subprocess
@@ -37,103 +39,33 @@ def re_parser(ctx_, parms_, expr):
         return re.compile(expr)
 
 
-def run(cmd: list[str], /, timeout=2.0, logout=None, logerr=None, **kwargs):
-    import threading
-    from time import monotonic, perf_counter_ns
+def shard_parser(ctx_, parms_, expr):
+    from jpamb.schedule import parse_shard
 
-    if not logerr:
+    if expr:
+        try:
+            return parse_shard(expr)
+        except ValueError as e:
+            raise click.BadParameter(str(e))
 
-        def logerr(a):
-            pass
 
-    if not logout:
+def trace_parser(ctx, parms_, path):
+    if path:
+        timeline.start(f"jpamb {ctx.info_name}")
+        ctx.call_on_close(lambda: timeline.stop().write(path))
 
-        def logout(a):
-            pass
 
-    cp = None
-    stdout = []
-    stderr = []
-    tout = None
-    try:
-        start = monotonic()
-        start_ns = perf_counter_ns()
-
-        if timeout:
-            end = start + timeout
-        else:
-            end = None
-
-        cp = subprocess.Popen(
-            cmd,
-            stderr=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            text=True,
-            **kwargs,
-        )
-        assert cp and cp.stdout and cp.stderr
-
-        def log_lines(cp):
-            assert cp.stderr
-            with cp.stderr:
-                for line in iter(cp.stderr.readline, ""):
-                    stderr.append(line)
-                    logerr(line[:-1])
-
-        def save_result(cp):
-            assert cp.stdout
-            with cp.stdout:
-                for line in iter(cp.stdout.readline, ""):
-                    stdout.append(line)
-                    logout(line[:-1])
-
-        terr = threading.Thread(
-            target=log_lines,
-            args=(cp,),
-            daemon=True,
-        )
-        terr.start()
-        tout = threading.Thread(
-            target=save_result,
-            args=(cp,),
-            daemon=True,
-        )
-        tout.start()
-
-        terr.join(end and end - monotonic())
-        tout.join(end and end - monotonic())
-        exitcode = cp.wait(end and end - monotonic())
-        end_ns = perf_counter_ns()
-
-        if exitcode != 0:
-            raise subprocess.CalledProcessError(
-                cmd=cmd,
-                returncode=exitcode,
-                stderr="".join(stderr),
-                output="".join(stdout),
-            )
+def run(cmd: list[str], /, timeout=2.0, logout=None, logerr=None, **kwargs):
+    from jpamb import process
 
-        return ("".join(stdout), end_ns - start_ns)
-    except subprocess.CalledProcessError as e:
-        if tout:
-            tout.join()
-        e.stderr = "".join(stderr)
-        e.stdout = "".join(stdout)
-        raise e
-    except subprocess.TimeoutExpired:
-        if cp:
-            cp.terminate()
-            if cp.stdout:
-                cp.stdout.close()
-            if cp.stderr:
-                cp.stderr.close()
-        raise
+    return process.run(cmd, timeout, logout, logerr, **kwargs)
 
 
 @dataclasses.dataclass
 class Reporter:
     report: IO
     prefix: str = ""
+    events: Events = NO_EVENTS
 
     @contextmanager
     def context(self, title):
@@ -153,14 +85,84 @@ class Reporter:
         for msg in msgs.splitlines():
             print(f"{self.prefix}{msg}", file=self.report)
 
-    def run(self, args, **kwargs):
+    def run(self, args, case=None, **kwargs):
+        from jpamb.process import LimitExceeded
+
         with self.context(f"Run {shlex.join(args)}"):
             with self.context("Stderr"):
-                out, time = run(args, logerr=self.output, **kwargs)
+                try:
+                    out, time = observe(
+                        args, self.events, case, logerr=self.output, **kwargs
+                    )
+                except LimitExceeded as e:
+                    self.output(f"Exceeded the {e.limit} limit")
+                    raise
             with self.context("Stdout"):
                 self.output(out)
             return out
 
+    def replay(self, args, stderr: list[str], result: str | Exception):
+        """Report a run like 'run', from its stderr and its stdout or the
+        exception it raised, see 'capture'."""
+        from jpamb.process import LimitExceeded
+
+        with self.context(f"Run {shlex.join(args)}"):
+            with self.context("Stderr"):
+                for line in stderr:
+                    self.output(line)
+                if isinstance(result, LimitExceeded):
+                    self.output(f"Exceeded the {result.limit} limit")
+                if isinstance(result, Exception):
+                    raise result
+            with self.context("Stdout"):
+                self.output(result)
+            return result
+
+
+def observe(args, events: Events, case=None, logerr=None, **kwargs):
+    """Run the command like 'run', and emit the events of the run."""
+    from time import perf_counter_ns
+
+    if events is NO_EVENTS:
+        return run(args, logerr=logerr, **kwargs)
+
+    def out(line):
+        events.emit("stdout", case=case, line=line)
+
+    def err(line):
+        events.emit("stderr", case=case, line=line)
+        if logerr:
+            logerr(line)
+
+    events.emit("spawn", case=case, cmd=[str(a) for a in args])
+    start = perf_counter_ns()
+    try:
+        output, ns = run(args, logout=out, logerr=err, **kwargs)
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        events.emit(
+            "exit",
+            case=case,
+            returncode=getattr(e, "returncode", None),
+            error=type(e).__name__,
+            duration=perf_counter_ns() - start,
+        )
+        raise
+    events.emit("exit", case=case, returncode=0, duration=ns)
+    return (output, ns)
+
+
+def capture(
+    args, events: Events = NO_EVENTS, case=None, **kwargs
+) -> tuple[list[str], str | Exception]:
+    """Run the command, and return the lines of its stderr, and its stdout or
+    the exception it raised."""
+    stderr = []
+    try:
+        out, _ = observe(args, events, case, stderr.append, **kwargs)
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        return (stderr, e)
+    return (stderr, out)
+
 
 def resolve_cmd(program, with_python=None):
     if with_python is None:
@@ -187,6 +189,31 @@ def resolve_cmd(program, with_python=None):
     return program
 
 
+def check_profile(program, profile):
+    """Check that the PROGRAM can be profiled into the folder 'profile'."""
+    from jpamb.profiling import is_python
+
+    if profile is None:
+        return
+    if not is_python(program):
+        raise click.UsageError("--profile only works for analyzers in python")
+    profile.mkdir(parents=True, exist_ok=True)
+
+
+def builtin_backend(suite, backend):
+    """Get the in-process runner for the backend."""
+    match backend:
+        case "interpreter":
+            from jpamb.interpreter import Interpreter
+
+            return Interpreter(suite)
+        case "compiled":
+            from jpamb.compiler import Compiler
+
+            return Compiler(suite)
+    raise ValueError(f"Unknown backend {backend!r}")
+
+
 @click.group()
 @click.option(
     "-v",
@@ -205,12 +232,59 @@ def resolve_cmd(program, with_python=None):
     default=".",
     help="the base of the jpamb folder.",
 )
+@click.option(
+    "--memory-limit",
+    type=int,
+    help="limit the address space of analyzers to this many megabytes.",
+)
+@click.option(
+    "--cpu-limit",
+    type=int,
+    help="limit the cpu time of analyzers to this many seconds.",
+)
+@click.option(
+    "--process-limit",
+    type=int,
+    help="limit the number of processes of the user while running analyzers.",
+)
+@click.option(
+    "--forkserver / --no-forkserver",
+    help="run python analyzers by forking a server with jpamb already "
+    "imported, instead of starting a new python for every run.",
+)
+@click.option(
+    "--preload",
+    multiple=True,
+    help="a module for the fork server to import; defaults to jpamb.model, "
+    "jpamb.jvm.opcode and loguru.",
+)
 @click.pass_context
-def cli(ctx, workdir: Path, verbose):
+def cli(
+    ctx,
+    workdir: Path,
+    verbose,
+    memory_limit,
+    cpu_limit,
+    process_limit,
+    forkserver,
+    preload,
+):
     """This is the jpamb main entry point."""
+    from jpamb import process
+
     logger.initialize(verbose)
     log.debug(f"Setup suite in {workdir}")
     ctx.obj = model.Suite(workdir)
+    process.LIMITS = process.Limits(
+        memory=memory_limit and memory_limit * 1024 * 1024,
+        cpu=cpu_limit,
+        processes=process_limit,
+    )
+    if forkserver:
+        from jpamb.forkserver import DEFAULT_PRELOAD, ForkServer
+
+        process.FORKSERVER = ForkServer(preload or DEFAULT_PRELOAD, workdir)
+        ctx.call_on_close(process.FORKSERVER.close)
 
 
 @cli.command()
@@ -250,14 +324,96 @@ def checkhealth(suite):
     type=click.File(mode="w"),
     help="A file to write the report to. (Good for golden testing)",
 )
+@click.option(
+    "--jobs",
+    "-j",
+    show_default=True,
+    default=1,
+    help="the number of methods to run at a time.",
+)
+@click.option(
+    "--history",
+    show_default=True,
+    default=".jpamb-history.json",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="the file to keep the durations of methods in, used to run the "
+    "slowest methods first.",
+)
+@click.option(
+    "--shard",
+    help="only run on this shard of the methods, as i/N, like 1/4.",
+    callback=shard_parser,
+)
+@click.option(
+    "--profile",
+    type=click.Path(file_okay=False, path_type=Path),
+    help="a folder to save a profile of each method in, for analyzers in "
+    "python; the slowest functions over all methods are shown at the end.",
+)
+@click.option(
+    "--profile-mode",
+    type=click.Choice(["cprofile", "sampling"]),
+    default="cprofile",
+    show_default=True,
+    help="cprofile counts every call, but slows the analyzer down; sampling "
+    "looks at the stack every few milliseconds, which keeps the times "
+    "representative.",
+)
+@click.option(
+    "--profile-top",
+    type=int,
+    default=20,
+    show_default=True,
+    help="the number of functions to show of the profile.",
+)
+@click.option(
+    "--trace-out",
+    type=click.Path(dir_okay=False, path_type=Path),
+    envvar="JPAMB_TRACE_OUT",
+    expose_value=False,
+    callback=trace_parser,
+    help="a file to write a timeline of the run to, in the Chrome Trace Event "
+    "format, for Perfetto or chrome://tracing.",
+)
+@click.option(
+    "--events",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="A file to write a JSON Lines stream of the events of the run to.",
+)
 @click.argument("PROGRAM", nargs=-1)
 @click.pass_obj
-def test(suite, program, report, filter, fail_fast, with_python, timeout):
+def test(
+    suite,
+    program,
+    report,
+    filter,
+    fail_fast,
+    with_python,
+    timeout,
+    jobs,
+    history,
+    shard,
+    events,
+    profile,
+    profile_mode,
+    profile_top,
+):
     """Test run a PROGRAM."""
+    from jpamb import profiling
+    from jpamb.schedule import History, run_methods, shard_methods
 
     program = resolve_cmd(program, with_python)
+    check_profile(program, profile)
 
-    r = Reporter(report)
+    def command(methodid):
+        if profile is None:
+            return program + (str(methodid),)
+        path = profile / profiling.filename(methodid)
+        return profiling.command(program, path, profile_mode) + (str(methodid),)
+
+    events = open_events(events)
+    click.get_current_context().call_on_close(events.close)
+    r = Reporter(report, events=events)
 
     if not filter:
         with r.context("Info"):
@@ -268,23 +424,55 @@ def test(suite, program, report, filter, fail_fast, with_python, timeout):
                 for k, v in sorted(dataclasses.asdict(info).items()):
                     r.output(f"- {k}: {v}")
 
-    total = 0
-    for methodid, correct in suite.case_methods():
-        if filter and not filter.search(str(methodid)):
-            continue
+    methods = {
+        methodid: correct
+        for methodid, correct in suite.case_methods()
+        if not filter or filter.search(str(methodid))
+    }
+    if shard:
+        methods = {m: methods[m] for m in shard_methods(suite, list(methods), *shard)}
+
+    def work(methodid):
+        events.emit("case", case=str(methodid))
+        with timeline.span(str(methodid), "case"):
+            return capture(command(methodid), events, str(methodid), timeout=timeout)
+
+    outcome = run_methods(
+        suite,
+        list(methods),
+        work,
+        shlex.join(program),
+        jobs=jobs,
+        history=History.load(history),
+    )
 
-        with r.context(f"Case {methodid}"):
-            out = r.run(program + (str(methodid),), timeout=timeout)
+    total = 0
+    for methodid, correct in methods.items():
+        case = str(methodid)
+        with r.context(f"Case {methodid}"), timeline.span(case, "report"):
+            out = r.replay(command(methodid), *outcome.results[methodid])
             response = model.Response.parse(out)
+            events.emit(
+                "response",
+                case=case,
+                predictions={k: v.wager for k, v in response.predictions.items()},
+            )
             with r.context("Results"):
                 for k, v in sorted(response.predictions.items()):
                     r.output(f"- {k}: {v} {v.wager:0.2f}")
             score = response.score(correct)
             r.output(f"Score {score:0.2f}")
             total += score
+        events.emit("score", case=case, score=score)
+        events.emit("done", case=case, duration=int(outcome.durations[methodid] * 1e9))
 
     r.output(f"Total {total:0.2f}")
 
+    if profile is not None:
+        with r.context(f"Profile in {profile}"):
+            paths = [profile / profiling.filename(m) for m in methods]
+            r.output(profiling.table(paths, profile_top))
+
 
 @cli.command()
 @click.option(
@@ -297,6 +485,12 @@ def test(suite, program, report, filter, fail_fast, with_python, timeout):
     "--stepwise / --no-stepwise",
     help="continue from last failure",
 )
+@click.option(
+    "--backend",
+    type=click.Choice(["interpreter", "compiled"], case_sensitive=True),
+    help="run the cases in-process with a builtin backend instead of PROGRAM, "
+    "which uses its step budget instead of the timeout.",
+)
 @click.option(
     "--timeout",
     show_default=True,
@@ -316,13 +510,53 @@ def test(suite, program, report, filter, fail_fast, with_python, timeout):
     type=click.File(mode="w"),
     help="A file to write the report to. (Good for golden testing)",
 )
+@click.option(
+    "--shard",
+    help="only run on this shard of the methods, as i/N, like 1/4.",
+    callback=shard_parser,
+)
+@click.option(
+    "--trace-out",
+    type=click.Path(dir_okay=False, path_type=Path),
+    envvar="JPAMB_TRACE_OUT",
+    expose_value=False,
+    callback=trace_parser,
+    help="a file to write a timeline of the run to, in the Chrome Trace Event "
+    "format, for Perfetto or chrome://tracing.",
+)
+@click.option(
+    "--events",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="A file to write a JSON Lines stream of the events of the run to.",
+)
 @click.argument("PROGRAM", nargs=-1)
 @click.pass_obj
-def interpret(suite, program, report, filter, with_python, timeout, stepwise):
+def interpret(
+    suite,
+    program,
+    report,
+    filter,
+    with_python,
+    timeout,
+    stepwise,
+    backend,
+    shard,
+    events,
+):
     """Use PROGRAM as an interpreter."""
-
-    r = Reporter(report)
-    program = resolve_cmd(program, with_python)
+    from time import perf_counter_ns
+
+    events = open_events(events)
+    click.get_current_context().call_on_close(events.close)
+    r = Reporter(report, events=events)
+    if backend:
+        if program:
+            raise click.UsageError("Expected either a PROGRAM or a --backend")
+        if with_python:
+            raise click.UsageError("--with-python cannot be used with --backend")
+        runner = builtin_backend(suite, backend)
+    else:
+        program = resolve_cmd(program, with_python)
 
     last_case = None
     if stepwise:
@@ -335,6 +569,12 @@ def interpret(suite, program, report, filter, with_python, timeout, stepwise):
         except IOError:
             last_case = None
 
+    if shard:
+        from jpamb.schedule import shard_methods
+
+        methods = [m for m, _ in suite.case_methods()]
+        methods = set(shard_methods(suite, methods, *shard))
+
     total = 0
     count = 0
     for case in suite.cases:
@@ -345,19 +585,34 @@ def interpret(suite, program, report, filter, with_python, timeout, stepwise):
         if filter and not filter.search(str(case)):
             continue
 
-        with r.context(f"Case {case}"):
+        if shard and case.methodid not in methods:
+            continue
+
+        start = perf_counter_ns()
+        events.emit("case", case=str(case))
+        with r.context(f"Case {case}"), timeline.span(str(case), "case"):
             try:
-                out = r.run(
-                    program + (case.methodid.encode(), case.input.encode()),
-                    timeout=timeout,
-                )
-                ret = out.splitlines()[-1].strip()
+                if backend:
+                    ret = runner.run(case.methodid, case.input)
+                else:
+                    out = r.run(
+                        program + (case.methodid.encode(), case.input.encode()),
+                        case=str(case),
+                        timeout=timeout,
+                    )
+                    ret = out.splitlines()[-1].strip()
             except subprocess.TimeoutExpired:
                 ret = "*"
             except subprocess.CalledProcessError as e:
                 log.error(e)
                 ret = "failure"
+            except (NotImplementedError, RecursionError) as e:
+                log.error(e)
+                r.output(f"Failed with {e!r}")
+                ret = "failure"
             r.output(f"Expected {case.result!r} and got {ret!r}")
+            events.emit("result", case=str(case), expected=case.result, got=ret)
+            events.emit("done", case=str(case), duration=perf_counter_ns() - start)
             if case.result == ret:
                 total += 1
             elif stepwise:
@@ -386,6 +641,40 @@ def interpret(suite, program, report, filter, with_python, timeout, stepwise):
     default=3,
     help="number of iterations.",
 )
+@click.option(
+    "--adaptive / --no-adaptive",
+    help="run each method until the confidence interval of the relative time "
+    "is narrower than --ci-width, with --iterations as the minimum.",
+)
+@click.option(
+    "--ci-width",
+    show_default=True,
+    default=0.05,
+    help="the target width of the 95% confidence interval of the relative time.",
+)
+@click.option(
+    "--max-iterations",
+    show_default=True,
+    default=30,
+    help="the maximum number of iterations per method, when adaptive.",
+)
+@click.option(
+    "--budget",
+    type=float,
+    help="the maximum seconds to spend on a method, when adaptive.",
+)
+@click.option(
+    "--warmup",
+    show_default=True,
+    default=0,
+    help="number of runs per method to discard before the iterations.",
+)
+@click.option(
+    "--reject-outliers / --no-reject-outliers",
+    default=True,
+    show_default=True,
+    help="leave outliers of the relative time out of its statistics.",
+)
 @click.option(
     "--timeout",
     show_default=True,
@@ -396,23 +685,146 @@ def interpret(suite, program, report, filter, with_python, timeout, stepwise):
     "--report",
     "-r",
     default="-",
-    type=click.File(mode="w"),
+    type=click.File(mode="w", lazy=True),
     help="A file to write the report to",
 )
+@click.option(
+    "--checkpoint",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="a JSON Lines file to stream the results to; defaults to the report "
+    "with a .jsonl suffix, when the report is a file.",
+)
+@click.option(
+    "--resume / --no-resume",
+    help="continue from the checkpoint, skipping the work already done.",
+)
+@click.option(
+    "--calibration",
+    show_default=True,
+    default=".jpamb-calibration.json",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="the file to keep the calibration of the machine in.",
+)
+@click.option(
+    "--recalibrate / --no-recalibrate",
+    help="calibrate the machine, even if the calibration file is up to date.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    show_default=True,
+    default=1,
+    help="the number of methods to run at a time; running more than one "
+    "makes the times less precise.",
+)
+@click.option(
+    "--history",
+    show_default=True,
+    default=".jpamb-history.json",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="the file to keep the durations of methods in, used to run the "
+    "slowest methods first.",
+)
+@click.option(
+    "--recheck-interval",
+    show_default=True,
+    default=60.0,
+    help="seconds between checks that the calibration still holds.",
+)
+@click.option(
+    "--shard",
+    help="only run on this shard of the methods, as i/N, like 1/4.",
+    callback=shard_parser,
+)
+@click.option(
+    "--profile",
+    type=click.Path(file_okay=False, path_type=Path),
+    help="a folder to save a profile of each method in, for analyzers in "
+    "python; the slowest functions over all methods are shown at the end.",
+)
+@click.option(
+    "--profile-mode",
+    type=click.Choice(["cprofile", "sampling"]),
+    default="cprofile",
+    show_default=True,
+    help="cprofile counts every call, but slows the analyzer down; sampling "
+    "looks at the stack every few milliseconds, which keeps the times "
+    "representative.",
+)
+@click.option(
+    "--profile-top",
+    type=int,
+    default=20,
+    show_default=True,
+    help="the number of functions to show of the profile.",
+)
+@click.option(
+    "--trace-out",
+    type=click.Path(dir_okay=False, path_type=Path),
+    envvar="JPAMB_TRACE_OUT",
+    expose_value=False,
+    callback=trace_parser,
+    help="a file to write a timeline of the run to, in the Chrome Trace Event "
+    "format, for Perfetto or chrome://tracing.",
+)
 @click.argument("PROGRAM", nargs=-1)
-def evaluate(ctx, program, report, timeout, iterations, with_python):
+def evaluate(
+    ctx,
+    program,
+    report,
+    checkpoint,
+    resume,
+    calibration,
+    recalibrate,
+    recheck_interval,
+    jobs,
+    history,
+    shard,
+    timeout,
+    iterations,
+    with_python,
+    adaptive,
+    ci_width,
+    max_iterations,
+    budget,
+    warmup,
+    reject_outliers,
+    profile,
+    profile_mode,
+    profile_top,
+):
     """Evaluate the PROGRAM."""
+    from jpamb import profiling
+    from jpamb.process import LimitExceeded, measure
+    from jpamb.sampling import Sampler
+    from jpamb.calibration import Calibrator, calibrate
+    from jpamb.schedule import History, run_methods, shard_methods
+    from jpamb.report import (
+        Checkpoint,
+        CheckpointWriter,
+        finalize,
+        summarize_method,
+    )
 
     program = resolve_cmd(program, with_python)
+    check_profile(program, profile)
 
-    def calibrate(count=100_000):
-        from time import perf_counter_ns
-        from jpamb import timer
+    if checkpoint is None and report.name != "-":
+        checkpoint = Path(report.name + ".jsonl")
 
-        start = perf_counter_ns()
-        timer.sieve(count)
-        end = perf_counter_ns()
-        return end - start
+    def command(methodid, i):
+        if profile is None:
+            return program + (methodid.encode(),)
+        path = profile / profiling.filename(methodid, i)
+        return profiling.command(program, path, profile_mode) + (methodid.encode(),)
+
+    if resume and checkpoint is None:
+        raise click.UsageError("--resume needs a --checkpoint or a --report file")
+
+    calibrator = Calibrator(calibration, recheck_interval)
+    if recalibrate:
+        calibrator.calibration = calibrate(calibration, force=True)
+    log.info(f"Calibration: {calibrator.get().kernels}")
 
     try:
         (out, _) = run(
@@ -421,77 +833,167 @@ def evaluate(ctx, program, report, timeout, iterations, with_python):
             logerr=log.debug,
             timeout=timeout,
         )
-        info = model.AnalysisInfo.parse(out)
+        info = dataclasses.asdict(model.AnalysisInfo.parse(out))
     except ValueError:
         log.error("Expected info, but got:")
         for o in out.splitlines():
             log.error(o)
 
-    total_score = 0
-    total_time = 0
-    total_relative = 0
-    total_methods = 0
-    bymethod = {}
-
-    for methodid, correct in ctx.obj.case_methods():
+    done = Checkpoint()
+    if resume and checkpoint.exists():
+        done = Checkpoint.read(checkpoint)
+        # The results of another analyzer, or another version of it, are
+        # not comparable with the results of this one.
+        if done.info is not None and done.info != json.loads(json.dumps(info)):
+            log.warning(f"{checkpoint} is of another analyzer; starting over")
+            done, resume = (Checkpoint(), False)
+        else:
+            log.info(f"Resuming from {checkpoint}: {len(done.methods)} methods done")
+    writer = CheckpointWriter.open(checkpoint, resume) if checkpoint else None
+    if writer and done.info is None:
+        writer.info(info)
+
+    # Analyzers in python are compared to the speed of python on the machine.
+    python = profiling.is_python(program) or "python" in info.get("tags", ())
+    kind = "python" if python else "native"
+
+    methods = dict(ctx.obj.case_methods())
+    if shard:
+        methods = {m: methods[m] for m in shard_methods(ctx.obj, list(methods), *shard)}
+    bymethod = {str(m): done.methods[str(m)] for m in methods if str(m) in done.methods}
+    if bymethod:
+        log.success(f"Skipping {len(bymethod)} methods done in checkpoint")
+
+    def evaluate_method(methodid):
+        with timeline.span(str(methodid), "case"):
+            return _evaluate_method(methodid)
+
+    def _evaluate_method(methodid):
+        correct = methods[methodid]
         log.success(f"Running on {methodid}")
-        results = []
 
-        _score = 0
-        _time = 0
-        _relative = 0
-        for i in range(iterations):
+        results = done.results(str(methodid))
+        ran = []
+        sampler = Sampler(
+            minimum=iterations,
+            width=ci_width if adaptive else None,
+            maximum=max(max_iterations, iterations),
+            budget=budget,
+            outliers=reject_outliers,
+        )
+        for result in results:
+            if "relative" in result:
+                sampler.add(result["relative"], result["time"] / 1e9)
+            else:
+                sampler.fail()
+
+        def record(result):
+            results.append(result)
+            if writer:
+                writer.iteration(str(methodid), result)
+
+        for i in itertools.chain(range(-warmup, 0), itertools.count(len(results))):
+            if sampler.done():
+                break
             log.info(f"Running on {methodid}, iter {i}")
-            r1 = calibrate()
-            out, time = run(
-                program + (methodid.encode(),), logerr=log.debug, timeout=timeout
-            )
-            r2 = calibrate()
+            composite = calibrator.get().composite(kind)
+            ran.append(i)
+            try:
+                out, time, usage = measure(
+                    command(methodid, i), logerr=log.debug, timeout=timeout
+                )
+            except LimitExceeded as e:
+                log.error(e)
+                if i >= 0:
+                    record({"iteration": i, "limit": e.limit})
+                    sampler.fail()
+                continue
+            except subprocess.TimeoutExpired:
+                log.error(f"Timed out after {timeout}s")
+                if i >= 0:
+                    record({"iteration": i, "timeout": timeout})
+                    sampler.fail()
+                continue
+            if i < 0:
+                log.debug(f"Discarding warmup run {i + warmup}")
+                continue
             response = model.Response.parse(out)
             score = response.score(correct)
-            relative = math.log10(time / (r1 + r2) * 2)
+            relative = math.log10(time / composite)
+            sampler.add(relative, time / 1e9)
 
             result = {k: v.wager for k, v in response.predictions.items()}
-
-            results.append(
+            record(
                 {
                     "iteration": i,
                     "response": result,
                     "score": score,
                     "time": time,
                     "relative": relative,
-                    "calibrates": [r1, r2],
+                    **dataclasses.asdict(usage),
+                    "composite": composite,
                 }
             )
 
-            _score += score
-            _relative += relative
-            _time += time
-
-        bymethod[str(methodid)] = {
-            "score": _score / iterations,
-            "time": _time / iterations,
-            "relative": _relative / iterations,
-            "iterations": results,
-        }
-
-        total_score += _score / iterations
-        total_time += _time / iterations
-        total_relative += _relative / iterations
-
-        total_methods += 1
-
-    json.dump(
-        {
-            "info": dataclasses.asdict(info),
-            "bymethod": bymethod,
-            "score": total_score,
-            "time": total_time / total_methods,
-            "relative": total_relative / total_methods,
-        },
-        report,
-        indent=2,
+        if profile is not None:
+            profiling.merge(
+                [profile / profiling.filename(methodid, i) for i in ran],
+                profile / profiling.filename(methodid),
+            )
+        summary = summarize_method(results, sampler.summary())
+        if writer:
+            writer.method(str(methodid), summary)
+        return summary
+
+    outcome = run_methods(
+        ctx.obj,
+        [m for m in methods if str(m) not in bymethod],
+        evaluate_method,
+        shlex.join(program),
+        jobs=jobs,
+        history=History.load(history),
+        runs=warmup + iterations,
     )
+    for methodid, summary in outcome.results.items():
+        if isinstance(summary, Exception):
+            raise summary
+        bymethod[str(methodid)] = summary
+    bymethod = {str(m): bymethod[str(m)] for m in methods}
+
+    if writer:
+        writer.close()
+    result = finalize(info, bymethod, calibrator.get(), kind)
+    if shard:
+        result["shard"] = "{}/{}".format(*shard)
+    with timeline.span("write", "report"):
+        json.dump(result, report, indent=2)
+
+    if profile is not None:
+        paths = [profile / profiling.filename(m) for m in methods]
+        click.echo(f"Profile in {profile}:", err=True)
+        click.echo(profiling.table(paths, profile_top), err=True)
+
+
+@cli.command("merge-reports")
+@click.option(
+    "--report",
+    "-r",
+    default="-",
+    type=click.File(mode="w"),
+    help="A file to write the merged report to",
+)
+@click.argument("REPORTS", nargs=-1, required=True, type=click.File(mode="r"))
+@click.pass_obj
+def merge_reports(suite, report, reports):
+    """Merge the REPORTS of the shards of an evaluation into one report."""
+    from jpamb.report import merge
+
+    methods = [str(m) for m, _ in suite.case_methods()]
+    try:
+        merged = merge({fp.name: json.load(fp) for fp in reports}, methods)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    json.dump(merged, report, indent=2)
 
 
 @cli.command()
@@ -511,32 +1013,43 @@ def evaluate(ctx, program, report, timeout, iterations, with_python):
     "--test / --no-test",
     help="test that all cases are correct.",
 )
+@click.option(
+    "--trace-out",
+    type=click.Path(dir_okay=False, path_type=Path),
+    envvar="JPAMB_TRACE_OUT",
+    expose_value=False,
+    callback=trace_parser,
+    help="a file to write a timeline of the run to, in the Chrome Trace Event "
+    "format, for Perfetto or chrome://tracing.",
+)
 @click.pass_obj
 def build(suite, compile, decompile, document, test):
     """Rebuild all benchmarks."""
 
     if compile:
-        run(
-            ["mvn", "compile"],
-            logerr=log.warning,
-            logout=log.info,
-            timeout=600,
-        )
+        with timeline.span("mvn compile", "build"):
+            run(
+                ["mvn", "compile"],
+                logerr=log.warning,
+                logout=log.info,
+                timeout=600,
+            )
 
     if decompile:
         log.info("Decompiling")
         for cl in suite.classes():
             log.info(f"Decompiling {cl}")
-            res, t = run(
-                [
-                    "jvm2json",
-                    "-s",
-                    suite.classfile(cl),
-                ],
-                logerr=log.warning,
-            )
-            with open(suite.decompiledfile(cl), "w") as f:
-                json.dump(json.loads(res), f, indent=2, sort_keys=True)
+            with timeline.span("jvm2json", "build", classname=str(cl)):
+                res, t = run(
+                    [
+                        "jvm2json",
+                        "-s",
+                        suite.classfile(cl),
+                    ],
+                    logerr=log.warning,
+                )
+                with open(suite.decompiledfile(cl), "w") as f:
+                    json.dump(json.loads(res), f, indent=2, sort_keys=True)
         log.success("Done decompiling")
 
     if document:
@@ -650,6 +1163,491 @@ def inspect(suite, method, format):
         print(f"{i:03d} | {res}")
 
 
+@cli.command()
+@click.option(
+    "--jobs",
+    "-j",
+    type=int,
+    default=1,
+    show_default=True,
+    help="The number of worker processes to run the cases in.",
+)
+@click.argument("METHOD", nargs=-1)
+@click.pass_obj
+def coverage(suite, method, jobs):
+    """Show which instructions the cases execute.
+
+    Without a METHOD, print a summary of every method run by the cases,
+    otherwise list the instructions of each METHOD like `inspect`, marking
+    the executed ones with a '+'.
+    """
+    from jpamb.interpreter import Coverage, cover_cases
+
+    cases = [case.encode() for case in suite.cases]
+    coverage = Coverage()
+    if jobs <= 1:
+        coverage.merge(Coverage.decode(cover_cases(suite.workfolder, cases)))
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        chunks = [cases[i::jobs] for i in range(jobs)]
+        with ProcessPoolExecutor(jobs) as pool:
+            for result in pool.map(cover_cases, [suite.workfolder] * jobs, chunks):
+                coverage.merge(Coverage.decode(result))
+
+    if not method:
+        covered = total = 0
+        methods = {m for m, _ in suite.case_methods()} | set(coverage.bitmaps)
+        for m in sorted(methods, key=str):
+            size = len(suite.method_opcodes(m))
+            hits = coverage.covered(m)
+            covered, total = covered + hits, total + size
+            print(f"{hits:4d}/{size:<4d} {hits / size:6.1%}  {m.encode()}")
+        print(f"{covered:4d}/{total:<4d} {covered / max(total, 1):6.1%}  total")
+        return
+
+    for m in method:
+        m = jvm.AbsMethodID.decode(m)
+        hits = coverage.bitmaps.get(m, b"")
+        print(m.encode())
+        for i, op in enumerate(suite.method_opcodes(m)):
+            mark = "+" if i < len(hits) and hits[i] else " "
+            print(f"{mark} {i:03d} | {op}")
+
+
+@cli.command("opcode-stats")
+@click.option(
+    "--jobs",
+    "-j",
+    type=int,
+    default=1,
+    show_default=True,
+    help="The number of worker processes to run the cases in.",
+)
+@click.option(
+    "--sample",
+    type=int,
+    default=0,
+    help="Time the handler of every SAMPLE-th instruction; 0 to only count.",
+)
+@click.option(
+    "--top",
+    type=int,
+    default=20,
+    show_default=True,
+    help="The number of most executed instructions to show.",
+)
+@click.option(
+    "--json",
+    "output",
+    type=click.File(mode="w"),
+    help="A file to write the stats to as JSON.",
+)
+@click.pass_obj
+def opcode_stats(suite, jobs, sample, top, output):
+    """Show which opcodes the interpreter executes most on the cases.
+
+    Prints the number of executions of each opcode class, and, with
+    --sample, the time of their handlers, followed by the most executed
+    instructions.
+    """
+    from jpamb.interpreter import OpcodeStats, count_cases
+
+    cases = [case.encode() for case in suite.cases]
+    stats = OpcodeStats(sample)
+    if jobs <= 1:
+        stats.merge(OpcodeStats.decode(count_cases(suite.workfolder, cases, sample)))
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        chunks = [cases[i::jobs] for i in range(jobs)]
+        with ProcessPoolExecutor(jobs) as pool:
+            for result in pool.map(
+                count_cases, [suite.workfolder] * jobs, chunks, [sample] * jobs
+            ):
+                stats.merge(OpcodeStats.decode(result))
+
+    summary = stats.summary(suite.method_opcodes)
+    if output:
+        json.dump(summary, output, indent=2)
+
+    header = f"{'count':>10} {'share':>6}  {'opcode':<14}"
+    if sample:
+        header += f" {'samples':>8} {'mean':>8} {'p50':>8} {'p90':>8}"
+    print(header)
+    for name, row in summary["byopcode"].items():
+        line = f"{row['count']:>10d} {row['share']:>6.1%}  {name:<14}"
+        if time := row.get("time"):
+            line += f" {time['samples']:>8d} {time['mean_ns']:>6.0f}ns"
+            line += f" {time['p50_ns']:>6d}ns {time['p90_ns']:>6d}ns"
+        print(line)
+    print(f"{summary['total']:>10d} {1:>6.1%}  total")
+    print()
+    for row in summary["instructions"][:top]:
+        print(
+            f"{row['count']:>10d}  {row['method']}:{row['offset']:03d} {row['opcode']}"
+        )
+
+
+@cli.command()
+@click.option(
+    "--filter",
+    "-f",
+    help="only run the benchmarks matching the regular expression.",
+    callback=re_parser,
+)
+@click.option(
+    "--repeat",
+    type=int,
+    default=5,
+    show_default=True,
+    help="the least number of times to time each benchmark.",
+)
+@click.option(
+    "--min-time",
+    type=float,
+    default=0.2,
+    show_default=True,
+    help="the least number of seconds to time each benchmark.",
+)
+@click.option(
+    "--output",
+    "-o",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=".jpamb-bench.json",
+    show_default=True,
+    help="the file to save the results in.",
+)
+@click.option(
+    "--baseline",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="saved results to compare with; fails if a benchmark regressed.",
+)
+@click.option(
+    "--threshold",
+    type=float,
+    default=0.10,
+    show_default=True,
+    help="the slowdown relative to the baseline that is a regression.",
+)
+@click.pass_obj
+def bench(suite, filter, repeat, min_time, output, baseline, threshold):
+    """Benchmark the hot paths of jpamb itself.
+
+    Reports the operations per second, and the peak and retained memory of
+    one call of each benchmark.
+    """
+    from jpamb import bench
+    from jpamb.calibration import machine
+
+    names = [n for n in bench.BENCHMARKS if not filter or filter.search(n)]
+    results = bench.run(
+        suite, names, repeat, min_time, lambda n: log.info(f"Running {n}")
+    )
+    bench.save(results, output)
+
+    changes = {}
+    if baseline:
+        saved = bench.load(baseline)
+        if saved["machine"] != machine():
+            log.warning(f"The baseline {baseline} is from another machine")
+        changes = bench.compare(saved["results"], results, threshold)
+
+    print(
+        f"{'benchmark':<22} {'kind':<5} {'ops':>5} {'ops/s':>12} {'us/op':>8}"
+        f" {'peak':>9} {'retained':>9}" + (f" {'change':>8}" if baseline else "")
+    )
+    for name, r in results.items():
+        line = (
+            f"{name:<22} {r.kind:<5} {r.ops:>5d} {r.ops_per_sec:>12,.0f}"
+            f" {1e6 / r.ops_per_sec:>8.2f} {r.peak / 1024:>7.1f}KB"
+            f" {r.retained / 1024:>7.1f}KB"
+        )
+        if change := changes.get(name):
+            line += f" {change.ratio - 1:>+8.1%}"
+            if change.regression:
+                line += "  regression"
+        print(line)
+
+    if regressed := [c.name for c in changes.values() if c.regression]:
+        raise click.ClickException(
+            f"{len(regressed)} benchmarks are more than {threshold:.0%} slower "
+            f"than {baseline}: {', '.join(regressed)}"
+        )
+
+
+@cli.group()
+def trace():
+    """Record, show, and compare execution traces of the interpreter."""
+
+
+@trace.command("record")
+@click.option(
+    "--output",
+    "-o",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    required=True,
+    help="The trace file to write.",
+)
+@click.option(
+    "--capacity",
+    type=int,
+    default=1 << 16,
+    show_default=True,
+    help="The number of instructions to keep; only the last are kept.",
+)
+@click.argument("METHOD")
+@click.argument("INPUT")
+@click.pass_obj
+def trace_record(suite, method, input, output, capacity):
+    """Run METHOD on INPUT and record a trace."""
+    from jpamb.interpreter import Interpreter
+    from jpamb.trace import Trace
+
+    recorder = Trace(capacity)
+    result = Interpreter(suite, trace=recorder).run(
+        jvm.AbsMethodID.decode(method), model.Input.decode(input)
+    )
+    recorder.write(output)
+    log.info(f"Recorded {recorder.count} instructions, ending in {result}")
+
+
+@trace.command("show")
+@click.argument("FILE", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+def trace_show(file):
+    """Print the records of a trace FILE."""
+    from jpamb.trace import Trace
+
+    recorded = Trace.read(file)
+    if recorded.dropped:
+        print(f"... {recorded.dropped} earlier records were dropped")
+    for i, record in enumerate(recorded.records(), recorded.dropped):
+        print(f"{i:6d} {record}")
+
+
+@trace.command("diff")
+@click.option(
+    "--context",
+    "-C",
+    type=int,
+    default=3,
+    show_default=True,
+    help="The number of equal records to show before the difference.",
+)
+@click.argument("A", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.argument("B", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+def trace_diff(a, b, context):
+    """Show where the traces A and B first differ."""
+    from jpamb.trace import Trace, diff
+
+    ra, rb = Trace.read(a).records(), Trace.read(b).records()
+    i = diff(ra, rb)
+    if i is None:
+        print(f"The traces are the same ({len(ra)} records)")
+        return
+    for k in range(max(0, i - context), i):
+        print(f"  {k:6d} {ra[k]}")
+    print(f"- {i:6d} {ra[i] if i < len(ra) else '<end>'}")
+    print(f"+ {i:6d} {rb[i] if i < len(rb) else '<end>'}")
+    sys.exit(1)
+
+
+@cli.command()
+@click.option(
+    "--executions",
+    "-n",
+    type=int,
+    default=10_000,
+    show_default=True,
+    help="The number of inputs to try.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=int,
+    default=1,
+    show_default=True,
+    help="The number of worker processes, which share their corpus.",
+)
+@click.option("--seed", type=int, default=0, show_default=True)
+@click.option(
+    "--max-steps",
+    type=int,
+    default=10_000,
+    show_default=True,
+    help="The steps after which a run is considered non-terminating.",
+)
+@click.option(
+    "--corpus",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    help="Write the inputs that covered new edges to this file.",
+)
+@click.argument("METHOD")
+@click.pass_obj
+def fuzz(suite, method, executions, jobs, seed, max_steps, corpus):
+    """Find inputs that reach each outcome of METHOD with a coverage-guided fuzzer."""
+    from jpamb import fuzz
+
+    method = jvm.AbsMethodID.decode(method)
+    result = fuzz.fuzz(
+        suite,
+        method,
+        executions=executions,
+        jobs=jobs,
+        seed=seed,
+        max_steps=max_steps,
+    )
+    log.info(
+        f"Ran {result.executions} inputs in {result.seconds:0.2f}s "
+        f"({result.executions / max(result.seconds, 1e-9):0.0f}/s), "
+        f"covering {result.edges} edges with a corpus of {len(result.corpus)}"
+    )
+    for outcome, input in sorted(result.found.items()):
+        print(f"{outcome:<20} {input.encode()}")
+    if corpus:
+        with open(corpus, "w") as f:
+            for input in result.corpus:
+                print(input.encode(), file=f)
+
+
+@cli.group()
+def synthetic():
+    """Generate synthetic methods, and measure how analyzers scale with them."""
+
+
+@synthetic.command("generate")
+@click.option(
+    "--sizes",
+    default="1000,3000,10000,30000,100000",
+    show_default=True,
+    help="the comma separated numbers of instructions of the methods.",
+)
+@click.option(
+    "--methods",
+    "-n",
+    type=int,
+    default=1,
+    show_default=True,
+    help="the number of methods of each size, with different seeds.",
+)
+@click.option(
+    "--branch-density",
+    type=float,
+    default=0.1,
+    show_default=True,
+    help="the share of statements that are ifs.",
+)
+@click.option(
+    "--loop-depth",
+    type=int,
+    default=1,
+    show_default=True,
+    help="how deep loops are nested.",
+)
+@click.option(
+    "--arrays",
+    type=float,
+    default=0.1,
+    show_default=True,
+    help="the share of statements that use an array.",
+)
+@click.option("--seed", type=int, default=0, show_default=True)
+@click.option(
+    "--inputs",
+    type=int,
+    default=3,
+    show_default=True,
+    help="the number of cases of each method.",
+)
+@click.argument(
+    "CORPUS", type=click.Path(file_okay=False, writable=True, path_type=Path)
+)
+def synthetic_generate(
+    corpus, sizes, methods, branch_density, loop_depth, arrays, seed, inputs
+):
+    """Write a corpus of synthetic methods, and their cases, to CORPUS."""
+    from jpamb import synthetic
+
+    try:
+        sizes = [int(s) for s in sizes.split(",")]
+    except ValueError:
+        raise click.BadParameter(f"not a list of numbers: {sizes}", param_hint="sizes")
+    shapes = [
+        synthetic.Shape(size, branch_density, loop_depth, arrays, seed + i)
+        for size in sizes
+        for i in range(methods)
+    ]
+    manifest = synthetic.generate(corpus, shapes, inputs)
+    log.info(f"Wrote {len(manifest)} methods to {corpus}")
+    for entry in manifest:
+        print(
+            f"{entry['method']:<40} {entry['instructions']:>8d} {entry['steps']:>12d}"
+        )
+
+
+@synthetic.command("scaling")
+@click.option(
+    "--with-python/--no-with-python",
+    "-W/-noW",
+    help="the analysis is a python script, which should run in the same interpreter as jpamb.",
+    default=None,
+)
+@click.option(
+    "--repeat",
+    type=int,
+    default=1,
+    show_default=True,
+    help="the number of runs of each method; the fastest is kept.",
+)
+@click.option(
+    "--timeout",
+    type=float,
+    default=60.0,
+    show_default=True,
+    help="timeout in seconds of each run.",
+)
+@click.option(
+    "--plot",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    help="plot the time against the number of instructions to this image.",
+)
+@click.option(
+    "--report",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    help="write the times as JSON to this file.",
+)
+@click.argument("CORPUS", type=click.Path(exists=True, file_okay=False, path_type=Path))
+@click.argument("PROGRAM", nargs=-1, required=True)
+def synthetic_scaling(corpus, program, with_python, repeat, timeout, plot, report):
+    """Time PROGRAM on each method of the synthetic CORPUS."""
+    from jpamb import synthetic
+
+    program = resolve_cmd(program, with_python)
+    results = synthetic.scaling(corpus, program, repeat, timeout)
+
+    print(f"{'method':<40} {'instructions':>12} {'seconds':>9}")
+    for entry in results:
+        seconds = entry["seconds"]
+        shown = f"{seconds:>9.3f}" if seconds is not None else entry["error"]
+        print(f"{entry['method']:<40} {entry['instructions']:>12d} {shown:>9}")
+
+    if report:
+        with open(report, "w") as fp:
+            json.dump(results, fp, indent=2)
+
+    if plot:
+        timed = [e for e in results if e["seconds"] is not None]
+        plt.figure()
+        plt.loglog(
+            [e["instructions"] for e in timed], [e["seconds"] for e in timed], "o-"
+        )
+        plt.xlabel("instructions")
+        plt.ylabel("seconds")
+        plt.title(" ".join(Path(p).name for p in program))
+        plt.savefig(plot)
+        plt.close()
+
+
 @cli.command()
 @click.pass_context
 @click.option(
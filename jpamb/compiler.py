@@ -0,0 +1,438 @@
+"""
+jpamb.compiler
+
+This module translates the bytecode of a method into python source code, one
+python function per method, and compiles it with 'compile()'. The compiled
+functions have the same semantics and outcomes as 'jpamb.interpreter', but
+do not pay the per-instruction dispatch overhead.
+
+Locals become python locals ('l0', 'l1', ...) and stack slots become
+temporaries ('s0', 's1', ...). Methods without branches become straight-line
+code, methods without backwards jumps become a chain of guarded blocks, and
+methods with loops become a state machine over the basic blocks in a
+'while True:' loop, where falling through to the next block or jumping
+forward does not go through the loop head.
+
+"""
+
+from dataclasses import dataclass
+import hashlib
+import types
+
+from jpamb import jvm, model
+from jpamb.interpreter import (
+    DEFAULT_MAX_STEPS,
+    DIVIDE_BY_ZERO,
+    NON_TERMINATION,
+    NULL_POINTER,
+    OK,
+    OUT_OF_BOUNDS,
+    COMPARISONS as INTERPRETED,
+    Failure,
+    Instance,
+    exception,
+    from_value,
+    idiv,
+    irem,
+    parameter_slots,
+    resolve,
+)
+
+COMPARISONS = {
+    "eq": "==",
+    "ne": "!=",
+    "lt": "<",
+    "ge": ">=",
+    "gt": ">",
+    "le": "<=",
+    "is": "is",
+    "isnot": "is not",
+}
+
+HELPERS = {
+    "Failure": Failure,
+    "Instance": Instance,
+    "exception": exception,
+    "idiv": idiv,
+    "irem": irem,
+    "DIVIDE_BY_ZERO": DIVIDE_BY_ZERO,
+    "NON_TERMINATION": NON_TERMINATION,
+    "NULL_POINTER": NULL_POINTER,
+    "OUT_OF_BOUNDS": OUT_OF_BOUNDS,
+}
+
+
+def wrap(expr: str, bits: int = 32) -> str:
+    half = 1 << (bits - 1)
+    return f"(({expr}) + {half:#x} & {(half << 1) - 1:#x}) - {half:#x}"
+
+
+def is_constant(expr: str) -> bool:
+    return expr == "None" or expr.lstrip("-").isdigit()
+
+
+def constant(expr: str) -> int | None:
+    return None if expr == "None" else int(expr)
+
+
+@dataclass(frozen=True)
+class Translation:
+    """The python source of a method, and the constants it refers to."""
+
+    source: str
+    constants: tuple
+
+    def content_hash(self) -> str:
+        return hashlib.sha256(self.source.encode()).hexdigest()
+
+
+class Translator:
+    """Translates the opcodes of a single method."""
+
+    def __init__(self, opcodes: tuple[jvm.Opcode, ...], params: jvm.ParameterType):
+        self.opcodes = opcodes
+        self.params = params
+        self.constants: list = []
+        self.lines: list[str] = []
+        self.indent = 1
+
+    def emit(self, line: str):
+        self.lines.append("    " * self.indent + line)
+
+    def constant(self, value) -> str:
+        self.constants.append(value)
+        return f"k{len(self.constants) - 1}"
+
+    def blocks(self) -> list[int]:
+        """Find the start index of the basic blocks."""
+        leaders = {0}
+        for i, op in enumerate(self.opcodes):
+            match op:
+                case jvm.If(target=t) | jvm.Ifz(target=t) | jvm.Goto(target=t):
+                    leaders.add(t)
+                    leaders.add(i + 1)
+                case jvm.Return() | jvm.Throw():
+                    leaders.add(i + 1)
+        return sorted(i for i in leaders if i < len(self.opcodes))
+
+    def translate(self) -> Translation:
+        starts = self.blocks()
+        ends = dict(zip(starts, starts[1:] + [len(self.opcodes)]))
+
+        # The jumps backwards in the code, from the jump to the target.
+        backjumps = {
+            i: op.target
+            for i, op in enumerate(self.opcodes)
+            if isinstance(op, (jvm.If, jvm.Ifz, jvm.Goto)) and op.target <= i
+        }
+        self.looping = bool(backjumps)
+        self.single = len(starts) == 1
+
+        slots = parameter_slots(self.params)
+        args = ", ".join(["rt"] + [f"l{s}" for s in slots])
+        self.lines.append(f"def method({args}):")
+        self.emit("fuel = rt.fuel")
+        if not self.single:
+            self.emit("pc = 0")
+        if self.looping:
+            self.emit("while True:")
+            self.indent += 1
+
+        # Translate the blocks that are reachable in order.
+        depths = self.depths(starts, ends, backjumps)
+        for start in starts:
+            if start not in depths:
+                continue
+            if not self.single:
+                self.emit(f"if pc == {start}:")
+                self.indent += 1
+            # Charge the instructions of the block to the fuel.
+            self.emit(f"fuel -= {ends[start] - start}")
+            self.emit("if fuel < 0:")
+            self.emit("    raise Failure(NON_TERMINATION)")
+            stack = [f"s{k}" for k in range(depths[start])]
+            for i in range(start, ends[start]):
+                stack = self.opcode(i, self.opcodes[i], stack, depths, backjumps)
+                if stack is None:
+                    break
+            else:
+                # Fall through into the next block
+                self.flush(stack)
+                depths.setdefault(ends[start], len(stack))
+                if not self.single:
+                    self.emit(f"pc = {ends[start]}")
+            if not self.single:
+                self.indent -= 1
+
+        return Translation("\n".join(self.lines) + "\n", tuple(self.constants))
+
+    def depths(self, starts, ends, backjumps) -> dict[int, int]:
+        """Compute the stack depth at the start of each reachable block."""
+        lines, constants, indent = self.lines, self.constants, self.indent
+        self.lines, self.constants = [], []
+        depths = {0: 0}
+        worklist = [0]
+        while worklist:
+            start = worklist.pop()
+            before = set(depths)
+            stack = [f"s{k}" for k in range(depths[start])]
+            for i in range(start, ends[start]):
+                stack = self.opcode(i, self.opcodes[i], stack, depths, backjumps)
+                if stack is None:
+                    break
+            else:
+                depths.setdefault(ends[start], len(stack))
+            worklist.extend(set(depths) - before)
+        self.lines, self.constants, self.indent = lines, constants, indent
+        return depths
+
+    def flush(self, stack: list[str]):
+        """Store the stack into the slots, as expected at a block boundary."""
+        moves = [(f"s{k}", e) for k, e in enumerate(stack) if e != f"s{k}"]
+        if moves:
+            targets = ", ".join(t for t, _ in moves)
+            exprs = ", ".join(e for _, e in moves)
+            self.emit(f"{targets} = {exprs}")
+
+    def spill(self, stack: list[str], local: str):
+        """Save the stack entries that refer to a local before it changes."""
+        for k, e in enumerate(stack):
+            if e == local:
+                self.emit(f"s{k} = {e}")
+                stack[k] = f"s{k}"
+
+    def jump(self, i: int, target: int, backjumps: dict[int, int]):
+        self.emit(f"pc = {target}")
+        if i in backjumps:
+            self.emit("continue")
+
+    def opcode(self, i, op, stack, depths, backjumps) -> list[str] | None:
+        """Translate a single opcode, returns the symbolic stack after the
+        opcode, or None if the opcode ends the block."""
+        k = len(stack)
+        match op:
+            case jvm.Push(value=v):
+                stack.append(repr(v.value))
+            case jvm.Load(index=n):
+                stack.append(f"l{n}")
+            case jvm.Store(index=n):
+                e = stack.pop()
+                self.spill(stack, f"l{n}")
+                self.emit(f"l{n} = {e}")
+            case jvm.Dup(words=1):
+                stack.append(stack[-1])
+            case jvm.Incr(index=n, amount=a):
+                self.spill(stack, f"l{n}")
+                self.emit(f"l{n} = {wrap(f'l{n} + {a}')}")
+            case jvm.Binary(operant=opr):
+                b, a = stack.pop(), stack.pop()
+                k -= 2
+                match opr:
+                    case jvm.BinaryOpr.Add:
+                        self.emit(f"s{k} = {wrap(f'{a} + {b}')}")
+                    case jvm.BinaryOpr.Sub:
+                        self.emit(f"s{k} = {wrap(f'{a} - {b}')}")
+                    case jvm.BinaryOpr.Mul:
+                        self.emit(f"s{k} = {wrap(f'{a} * {b}')}")
+                    case jvm.BinaryOpr.Div | jvm.BinaryOpr.Rem:
+                        if not is_constant(b) or int(b) == 0:
+                            self.emit(f"if {b} == 0:")
+                            self.emit("    raise Failure(DIVIDE_BY_ZERO)")
+                        fn = "idiv" if opr == jvm.BinaryOpr.Div else "irem"
+                        self.emit(f"s{k} = {fn}({a}, {b})")
+                stack.append(f"s{k}")
+            case jvm.Cast(to_=to):
+                e = stack.pop()
+                match to:
+                    case jvm.Short():
+                        self.emit(f"s{k - 1} = {wrap(e, 16)}")
+                    case jvm.Byte():
+                        self.emit(f"s{k - 1} = {wrap(e, 8)}")
+                    case jvm.Char():
+                        self.emit(f"s{k - 1} = {e} & 0xffff")
+                    case jvm.Int():
+                        self.emit(f"s{k - 1} = {e}")
+                    case _:
+                        raise NotImplementedError(f"Unhandled {op!r}")
+                stack.append(f"s{k - 1}")
+            case jvm.If(condition=c, target=t) | jvm.Ifz(condition=c, target=t):
+                if isinstance(op, jvm.If):
+                    b, a = stack.pop(), stack.pop()
+                else:
+                    a, b = stack.pop(), ("None" if c in ("is", "isnot") else "0")
+                cond = f"{a} {COMPARISONS[c]} {b}"
+                if is_constant(a) and is_constant(b):
+                    # Decide the branch statically, e.g. '$assertionsDisabled'
+                    taken = INTERPRETED[c](constant(a), constant(b))
+                    self.flush(stack)
+                    if taken:
+                        depths.setdefault(t, len(stack))
+                        self.jump(i, t, backjumps)
+                    else:
+                        depths.setdefault(i + 1, len(stack))
+                        self.emit(f"pc = {i + 1}")
+                    return None
+                if any(e != f"s{k}" for k, e in enumerate(stack)):
+                    # The condition might refer to slots that are flushed.
+                    self.emit(f"c = {cond}")
+                    cond = "c"
+                self.flush(stack)
+                depths.setdefault(t, len(stack))
+                depths.setdefault(i + 1, len(stack))
+                self.emit(f"if {cond}:")
+                self.indent += 1
+                self.jump(i, t, backjumps)
+                self.indent -= 1
+                self.emit("else:")
+                self.emit(f"    pc = {i + 1}")
+                return None
+            case jvm.Goto(target=t):
+                self.flush(stack)
+                depths.setdefault(t, len(stack))
+                self.jump(i, t, backjumps)
+                return None
+            case jvm.Get(static=True, field=f) if (
+                f.extension.name == "$assertionsDisabled"
+            ):
+                # We always run with assertions enabled, like `java -ea`.
+                stack.append("0")
+            case jvm.New(classname=cn):
+                self.emit(f"s{k} = Instance({self.constant(cn)})")
+                stack.append(f"s{k}")
+            case jvm.Throw():
+                self.emit(f"raise exception({stack.pop()})")
+                return None
+            case jvm.NewArray(type=tp, dim=1):
+                n = stack.pop()
+                default = None if isinstance(tp, (jvm.Array, jvm.Reference)) else 0
+                self.emit(f"if {n} < 0:")
+                self.emit(
+                    "    raise NotImplementedError('Unhandled negative array size')"
+                )
+                self.emit(f"s{k - 1} = [{default!r}] * {n}")
+                stack.append(f"s{k - 1}")
+            case jvm.ArrayLoad():
+                index, array = stack.pop(), stack.pop()
+                self.check_array(array, index)
+                self.emit(f"s{k - 2} = {array}[{index}]")
+                stack.append(f"s{k - 2}")
+            case jvm.ArrayStore():
+                value, index, array = stack.pop(), stack.pop(), stack.pop()
+                self.check_array(array, index)
+                self.emit(f"{array}[{index}] = {value}")
+            case jvm.ArrayLength():
+                array = stack.pop()
+                self.check_array(array)
+                self.emit(f"s{k - 1} = len({array})")
+                stack.append(f"s{k - 1}")
+            case jvm.InvokeStatic(method=m):
+                n = len(m.extension.params)
+                args = stack[k - n :]
+                del stack[k - n :]
+                fn = f"rt.functions[{self.constant(resolve(m))}]"
+                call = f"{fn}({', '.join(['rt'] + args)})"
+                self.emit("rt.fuel = fuel")
+                if m.extension.return_type is None:
+                    self.emit(call)
+                else:
+                    self.emit(f"s{k - n} = {call}")
+                    stack.append(f"s{k - n}")
+                self.emit("fuel = rt.fuel")
+            case jvm.InvokeSpecial(method=m) if m.extension.name == "<init>":
+                # Constructors of the exceptions have no effects we track.
+                del stack[k - len(m.extension.params) - 1 :]
+            case jvm.Return(type=tp):
+                e = stack.pop() if tp is not None else "None"
+                self.emit("rt.fuel = fuel")
+                self.emit(f"return {e}")
+                return None
+            case _:
+                raise NotImplementedError(f"Unhandled {op!r}")
+        return stack
+
+    def check_array(self, array: str, index: str | None = None):
+        self.emit(f"if {array} is None:")
+        self.emit("    raise Failure(NULL_POINTER)")
+        if index is not None:
+            self.emit(f"if not 0 <= {index} < len({array}):")
+            self.emit("    raise Failure(OUT_OF_BOUNDS)")
+
+
+def translate(
+    opcodes: tuple[jvm.Opcode, ...], params: jvm.ParameterType
+) -> Translation:
+    """Translate the opcodes of a method with the given parameters."""
+    return Translator(opcodes, params).translate()
+
+
+_CODE_CACHE: dict[str, types.CodeType] = {}
+
+
+def compile_translation(translation: Translation) -> types.FunctionType:
+    """Compile a translation into a python function, the code objects are
+    cached by the content hash of the translation."""
+    key = translation.content_hash()
+    if (code := _CODE_CACHE.get(key)) is None:
+        code = compile(translation.source, f"<jpamb.compiler {key[:8]}>", "exec")
+        _CODE_CACHE[key] = code
+    namespace = dict(HELPERS)
+    namespace.update((f"k{i}", c) for i, c in enumerate(translation.constants))
+    exec(code, namespace)
+    return namespace["method"]
+
+
+class Functions(dict):
+    """The compiled functions, compiled on first lookup."""
+
+    def __init__(self, compiler: "Compiler"):
+        super().__init__()
+        self.compiler = compiler
+
+    def __missing__(self, methodid: jvm.AbsMethodID):
+        fn = compile_translation(self.compiler.translate(methodid))
+        self[methodid] = fn
+        return fn
+
+
+class Runtime:
+    """The state shared by the compiled functions during a run."""
+
+    def __init__(self, functions: Functions, fuel: int):
+        self.functions = functions
+        self.fuel = fuel
+
+
+class Compiler:
+    """Compiles and runs the methods in a suite.
+
+    The budget of 'max_steps' is charged with the length of each basic block
+    when it is entered, so the outcomes match 'jpamb.interpreter', except
+    that a run that fails within the last block before the budget runs out
+    is reported as non-terminating. Recursion deeper than python allows is
+    also reported as non-terminating.
+    """
+
+    def __init__(
+        self,
+        suite: model.Suite | None = None,
+        max_steps: int = DEFAULT_MAX_STEPS,
+    ):
+        self.suite = suite or model.Suite()
+        self.max_steps = max_steps
+        self.functions = Functions(self)
+
+    def translate(self, methodid: jvm.AbsMethodID) -> Translation:
+        opcodes = tuple(self.suite.method_opcodes(methodid))
+        return translate(opcodes, methodid.extension.params)
+
+    def run(self, methodid: jvm.AbsMethodID, input: model.Input) -> str:
+        """Run the method on the input and return the outcome."""
+        args = [from_value(v) for v in input.values]
+        fn = self.functions[methodid]
+        try:
+            fn(Runtime(self.functions, self.max_steps), *args)
+        except Failure as e:
+            return e.outcome
+        except RecursionError:
+            return NON_TERMINATION
+        return OK
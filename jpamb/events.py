@@ -0,0 +1,97 @@
+"""
+jpamb.events
+
+This module contains the stream of events of 'test' and 'interpret', one
+JSON object per line, for tools that want the results without parsing the
+report. Every event has a 'kind' and a monotonic timestamp 'ts' in
+nanoseconds; the first event, 'start', also has the wall clock 'time'.
+
+The events are:
+
+    start     {time}
+    case      {case}                         a case is started
+    spawn     {case, cmd}                    a process is started
+    stdout    {case, line}                   a line of output of the process
+    stderr    {case, line}
+    exit      {case, returncode, duration}   the process ended, maybe 'error'
+    response  {case, predictions}            the response was parsed
+    result    {case, expected, got}          the result of interpreting
+    score     {case, score}
+    done      {case, duration}               the case is done
+
+The events are written by a background thread, so that emitting one only
+puts it on a queue.
+
+"""
+
+import json
+import queue
+import threading
+import time
+from typing import IO
+
+# Events are written in batches of at most this many.
+BATCH = 1024
+
+
+class Events:
+    """A stream of events that goes nowhere."""
+
+    def emit(self, kind: str, **fields):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+NO_EVENTS = Events()
+
+
+class EventWriter(Events):
+    """A stream of events written to a file by a background thread."""
+
+    def __init__(self, fp: IO):
+        self.fp = fp
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.thread = threading.Thread(
+            target=self._write, name="jpamb-events", daemon=True
+        )
+        self.thread.start()
+        self.emit("start", time=time.time())
+
+    def emit(self, kind: str, **fields):
+        self.queue.put({"kind": kind, "ts": time.monotonic_ns(), **fields})
+
+    def _write(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < BATCH:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            done = batch[-1] is None
+            self.fp.write("".join(json.dumps(e) + "\n" for e in batch if e is not None))
+            self.fp.flush()
+            if done:
+                return
+
+    def close(self):
+        """Write the remaining events, and close the file."""
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        self.fp.close()
+
+
+def open_events(path) -> Events:
+    """The events written to the file, or no events if there is no path."""
+    if path is None:
+        return NO_EVENTS
+    return EventWriter(open(path, "w"))
@@ -0,0 +1,292 @@
+"""
+jpamb.forkserver
+
+This module contains a fork server for analyzers written in python. Instead
+of starting a new interpreter for every case, which imports jpamb and the
+other modules of the analyzer again each time, a warm server process with
+the modules preloaded forks a child per case, which runs the script of the
+analyzer with 'runpy'.
+
+The child gets the stdin, stdout and stderr of the client, which are sent
+over a unix socket, so that the output, the exit code, and the resources
+used are the same as those of a fresh process. Like 'jpamb.process', the
+child is started in its own session.
+
+The server is run with 'python -m jpamb.forkserver SOCKET [--preload MODULE]
+[--workdir DIR]', and stops when its stdin is closed.
+
+"""
+
+import asyncio
+import atexit
+import contextlib
+from dataclasses import asdict
+import importlib
+import json
+import os
+from pathlib import Path
+import runpy
+import selectors
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import traceback
+
+# The modules preloaded by default; 'import jpamb' alone loads almost
+# nothing, as its submodules are imported when first used.
+DEFAULT_PRELOAD = ("jpamb.model", "jpamb.jvm.opcode", "loguru")
+
+
+def _exitcode(code) -> int:
+    """The exit code of a 'SystemExit', like the interpreter computes it."""
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
+
+
+def _child(request: dict, fds: list[int]) -> int:
+    """Run the script of the request as __main__, in the forked child."""
+    from jpamb.limits import Limits, exitcode
+
+    os.setsid()
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    signal.set_wakeup_fd(-1)
+    Limits(**request["limits"]).apply()
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    os.chdir(request["cwd"])
+
+    # Like a fresh interpreter: stdout is block buffered on pipes, and
+    # stderr is line buffered.
+    sys.stdin = open(0, closefd=False)
+    sys.stdout = open(1, "w", closefd=False)
+    sys.stderr = open(2, "w", buffering=1, errors="backslashreplace", closefd=False)
+    sys.__stdin__, sys.__stdout__, sys.__stderr__ = sys.stdin, sys.stdout, sys.stderr
+
+    script, *_ = sys.argv = request["argv"]
+    path = os.path.abspath(script)
+    sys.path[0] = os.path.dirname(path)
+    atexit._clear()
+    try:
+        runpy.run_path(path, run_name="__main__")
+        code = 0
+    except SystemExit as e:
+        code = _exitcode(e.code)
+    except BaseException as e:
+        # Leave out the frames of the server, like a fresh interpreter.
+        tb = e.__traceback__
+        while tb is not None and tb.tb_frame.f_code.co_filename != path:
+            tb = tb.tb_next
+        traceback.print_exception(type(e), e, tb)
+        code = exitcode(e)
+    try:
+        atexit._run_exitfuncs()
+        sys.stdout.flush()
+        sys.stderr.flush()
+    except BaseException:
+        code = code or 120
+    return code
+
+
+def _reply(conn: socket.socket, message: dict):
+    with contextlib.suppress(OSError):
+        conn.sendall(json.dumps(message).encode() + b"\n")
+
+
+def serve(path: str):
+    """Serve requests on the unix socket at 'path', until stdin is closed."""
+    from jpamb.process import Usage
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen()
+
+    wakeup, wakeup_w = os.pipe()
+    os.set_blocking(wakeup, False)
+    os.set_blocking(wakeup_w, False)
+    signal.set_wakeup_fd(wakeup_w)
+    signal.signal(signal.SIGCHLD, lambda *_: None)
+
+    selector = selectors.DefaultSelector()
+    selector.register(listener, selectors.EVENT_READ)
+    selector.register(wakeup, selectors.EVENT_READ)
+    selector.register(sys.stdin, selectors.EVENT_READ)
+    waiting: dict[int, socket.socket] = {}
+
+    def reap():
+        while waiting:
+            try:
+                exited = os.waitid(os.P_ALL, 0, os.WEXITED | os.WNOHANG | os.WNOWAIT)
+                if exited is None:
+                    return
+                # Kill the processes left in the group of the child, before
+                # the child is reaped and its pid can be reused.
+                with contextlib.suppress(ProcessLookupError, PermissionError):
+                    os.killpg(exited.si_pid, signal.SIGKILL)
+                pid, status, ru = os.wait4(exited.si_pid, 0)
+            except ChildProcessError:
+                return
+            if (conn := waiting.pop(pid, None)) is not None:
+                _reply(
+                    conn,
+                    {
+                        "exitcode": os.waitstatus_to_exitcode(status),
+                        "usage": asdict(Usage.from_rusage(ru)),
+                    },
+                )
+                conn.close()
+
+    def spawn(conn: socket.socket):
+        message, fds, _, _ = socket.recv_fds(conn, 1 << 16, 3)
+        if not message:
+            conn.close()
+            return
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                for fileobj in (listener, conn, *waiting.values()):
+                    fileobj.close()
+                os.close(wakeup)
+                os.close(wakeup_w)
+                code = _child(json.loads(message), fds)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            os._exit(code)
+        for fd in fds:
+            os.close(fd)
+        waiting[pid] = conn
+        _reply(conn, {"pid": pid})
+
+    # Interrupts are for the client; the children get their own handler.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    print("ready", flush=True)
+    os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    while True:
+        for key, _ in selector.select():
+            if key.fileobj is listener:
+                conn, _ = listener.accept()
+                spawn(conn)
+            elif key.fileobj is wakeup:
+                with contextlib.suppress(BlockingIOError):
+                    os.read(wakeup, 4096)
+            elif not os.read(sys.stdin.fileno(), 4096):
+                return
+        reap()
+
+
+class ForkServer:
+    """The client of a fork server, which runs python scripts."""
+
+    def __init__(self, preload=DEFAULT_PRELOAD, workdir: Path | None = None):
+        self.preload = tuple(preload)
+        self.workdir = workdir
+        self.tmpdir = tempfile.TemporaryDirectory(prefix="jpamb-forkserver-")
+        self.path = os.path.join(self.tmpdir.name, "socket")
+        self.server: subprocess.Popen | None = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        cmd = [sys.executable, "-m", "jpamb.forkserver", self.path]
+        for module in self.preload:
+            cmd += ["--preload", module]
+        if self.workdir is not None:
+            cmd += ["--workdir", str(self.workdir)]
+        self.server = subprocess.Popen(
+            cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+        )
+        if self.server.stdout.readline().strip() != "ready":
+            self.server.wait()
+            raise RuntimeError(f"The fork server failed with {self.server.returncode}")
+        self.server.stdout.close()
+
+    def close(self):
+        if self.server is not None:
+            self.server.stdin.close()
+            try:
+                self.server.wait(5)
+            except subprocess.TimeoutExpired:
+                self.server.kill()
+                self.server.wait()
+            self.server = None
+        self.tmpdir.cleanup()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def accepts(self, cmd) -> bool:
+        """Check that the command runs a python script with this python."""
+        from jpamb.limits import is_script
+
+        return is_script(cmd)
+
+    async def spawn(
+        self, cmd, stdout: int, stderr: int, limits=None
+    ) -> tuple[int, asyncio.Future]:
+        """Start the script of 'cmd' with the given stdout and stderr; returns
+        the pid of the child, and a future of its exit code and 'Usage'."""
+        from jpamb.limits import Limits
+        from jpamb.process import Usage
+
+        with self.lock:
+            if self.server is None:
+                self.start()
+        request = {
+            "argv": [str(arg) for arg in cmd[1:]],
+            "cwd": os.getcwd(),
+            "limits": asdict(limits or Limits()),
+        }
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.path)
+        socket.send_fds(sock, [json.dumps(request).encode()], [0, stdout, stderr])
+        sock.setblocking(False)
+        reader, writer = await asyncio.open_unix_connection(sock=sock)
+        pid = json.loads(await reader.readline())["pid"]
+
+        async def exited():
+            try:
+                line = await reader.readline()
+            finally:
+                writer.close()
+            if not line:
+                raise RuntimeError("The fork server stopped")
+            result = json.loads(line)
+            return (result["exitcode"], Usage(**result["usage"]))
+
+        return (pid, asyncio.ensure_future(exited()))
+
+
+def main(argv: list[str]):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="jpamb.forkserver")
+    parser.add_argument("socket")
+    parser.add_argument("--preload", action="append", default=[])
+    parser.add_argument("--workdir", type=Path)
+    args = parser.parse_args(argv)
+
+    for module in args.preload:
+        importlib.import_module(module)
+    if args.workdir is not None:
+        from jpamb import model
+
+        model.Suite(args.workdir.absolute()).preload()
+    serve(args.socket)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
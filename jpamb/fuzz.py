@@ -0,0 +1,314 @@
+"""
+jpamb.fuzz
+
+This module contains a coverage-guided fuzzer for the case methods. It
+generates inputs matching the parameters of a method, runs them with the
+'jpamb.interpreter', and keeps the inputs that cover new edges of the
+control flow graph in a corpus, which is used to derive new inputs.
+
+Edges are recorded in a fixed size bitmap, like in AFL: each instruction
+gets a random location, and the edge from a to b sets the bit
+'(loc[a] >> 1) ^ loc[b]'.
+
+"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+import random
+import string
+import time
+
+from jpamb import jvm, model
+from jpamb.interpreter import (
+    DEFAULT_MAX_STEPS,
+    NON_TERMINATION,
+    OK,
+    Failure,
+    Interpreter,
+    bitmap_indices,
+    from_value,
+)
+
+MAP_SIZE = 1 << 16
+
+INTERESTING_INTS = (0, 1, -1, 2, -2, 10, 16, 100, 255, 1024, 2**31 - 1, -(2**31))
+
+CHARS = string.ascii_letters + string.digits
+
+
+class EdgeInterpreter(Interpreter):
+    """An interpreter that records the edges it takes in a bitmap."""
+
+    def __init__(self, suite=None, max_steps=DEFAULT_MAX_STEPS):
+        super().__init__(suite, max_steps)
+        self.locations: dict[jvm.AbsMethodID, list[int]] = {}
+        self.bitmap = bytearray(MAP_SIZE)
+
+    def location(self, methodid: jvm.AbsMethodID) -> list[int]:
+        try:
+            return self.locations[methodid]
+        except KeyError:
+            rng = random.Random(str(methodid))
+            locs = [rng.randrange(MAP_SIZE) for _ in self.opcodes(methodid)]
+            self.locations[methodid] = locs
+            return locs
+
+    def run(self, methodid: jvm.AbsMethodID, input: model.Input) -> str:
+        """Run the method on the input, and record the edges into a fresh
+        'bitmap'."""
+        frame = self.frame(methodid, [from_value(v) for v in input.values])
+        self.frames = [frame]
+        self.bitmap = bitmap = bytearray(MAP_SIZE)
+        handlers = self.handlers
+        locs = self.location(frame.methodid)
+        prev = 0
+        try:
+            for _ in range(self.max_steps):
+                op = frame.opcodes[frame.pc]
+                loc = locs[frame.pc]
+                bitmap[prev ^ loc] = 1
+                prev = loc >> 1
+                callee = handlers[type(op)](frame, op)
+                if callee is None:
+                    return OK
+                if callee is not frame:
+                    frame = callee
+                    locs = self.location(frame.methodid)
+        except Failure as e:
+            return e.outcome
+        return NON_TERMINATION
+
+
+def constants(opcodes) -> list[int]:
+    """Collect the integer constants of a method, and their neighbours."""
+    found = set()
+    for op in opcodes:
+        match op:
+            case jvm.Push(value=jvm.Value(type=jvm.Int(), value=v)):
+                found.update((v - 1, v, v + 1))
+    return sorted(found)
+
+
+class Generator:
+    """Generates and mutates inputs for a list of parameter types."""
+
+    def __init__(self, params: jvm.ParameterType, rng: random.Random, ints=()):
+        self.params = params
+        self.rng = rng
+        self.ints = tuple(INTERESTING_INTS) + tuple(ints)
+
+    def int(self) -> int:
+        rng = self.rng
+        match rng.randrange(3):
+            case 0:
+                return rng.choice(self.ints)
+            case 1:
+                return rng.randint(-128, 128)
+            case _:
+                return rng.randint(-(2**31), 2**31 - 1)
+
+    def char(self) -> str:
+        return self.rng.choice(CHARS)
+
+    def value(self, tp: jvm.Type) -> jvm.Value:
+        match tp:
+            case jvm.Int():
+                return jvm.Value.int(self.int())
+            case jvm.Boolean():
+                return jvm.Value.boolean(self.rng.random() < 0.5)
+            case jvm.Char():
+                return jvm.Value.char(self.char())
+            case jvm.Array(jvm.Int()):
+                n = self.rng.randrange(8)
+                return jvm.Value.array(jvm.Int(), [self.int() for _ in range(n)])
+            case jvm.Array(jvm.Char()):
+                n = self.rng.randrange(8)
+                return jvm.Value.array(jvm.Char(), [self.char() for _ in range(n)])
+        raise NotImplementedError(f"Cannot generate values of type {tp}")
+
+    def generate(self) -> model.Input:
+        return model.Input(tuple(self.value(tp) for tp in self.params))
+
+    def mutate(self, input: model.Input) -> model.Input:
+        """Change one of the values of the input."""
+        if not input.values:
+            return input
+        values = list(input.values)
+        k = self.rng.randrange(len(values))
+        v = values[k]
+        match v.type:
+            case jvm.Int() if self.rng.random() < 0.5:
+                delta = self.rng.choice((-1, 1)) * self.rng.randint(1, 16)
+                values[k] = jvm.Value.int(
+                    max(-(2**31), min(2**31 - 1, v.value + delta))
+                )
+            case jvm.Array(tp) if v.value and self.rng.random() < 0.5:
+                content = list(v.value)
+                i = self.rng.randrange(len(content))
+                match self.rng.randrange(3):
+                    case 0:
+                        del content[i]
+                    case 1:
+                        content.insert(i, self.value(tp).value)
+                    case _:
+                        content[i] = self.value(tp).value
+                values[k] = jvm.Value.array(tp, content)
+            case _:
+                values[k] = self.value(v.type)
+        return model.Input(tuple(values))
+
+
+@dataclass
+class Fuzzer:
+    """The state of fuzzing a single method."""
+
+    methodid: jvm.AbsMethodID
+    interpreter: EdgeInterpreter
+    rng: random.Random
+    coverage: bytearray = field(default_factory=lambda: bytearray(MAP_SIZE))
+    corpus: list[model.Input] = field(default_factory=list)
+    found: dict[str, model.Input] = field(default_factory=dict)
+    executions: int = 0
+
+    def __post_init__(self):
+        opcodes = self.interpreter.opcodes(self.methodid)
+        self.generator = Generator(
+            self.methodid.extension.params, self.rng, constants(opcodes)
+        )
+
+    def execute(self, input: model.Input) -> bool:
+        """Run an input, and return true if it covered new edges. Inputs
+        the interpreter cannot handle, like huge array sizes, are skipped."""
+        try:
+            outcome = self.interpreter.run(self.methodid, input)
+        except (NotImplementedError, MemoryError, RecursionError):
+            return False
+        self.executions += 1
+        self.found.setdefault(outcome, input)
+        return self.merge(self.interpreter.bitmap, input)
+
+    def merge(self, bitmap: bytes, input: model.Input) -> bool:
+        coverage, new = self.coverage, False
+        for i in bitmap_indices(bitmap):
+            if not coverage[i]:
+                coverage[i] = 1
+                new = True
+        if new:
+            self.corpus.append(input)
+        return new
+
+    def step(self):
+        if not self.corpus or self.rng.random() < 0.1:
+            input = self.generator.generate()
+        else:
+            input = self.generator.mutate(self.rng.choice(self.corpus))
+        self.execute(input)
+
+    def fuzz(self, executions: int):
+        for _ in range(executions):
+            self.step()
+
+
+_worker: tuple[jvm.AbsMethodID, EdgeInterpreter] | None = None
+
+
+def _initialize(workfolder: Path, methodid: str, max_steps: int):
+    global _worker
+    _worker = (
+        jvm.AbsMethodID.decode(methodid),
+        EdgeInterpreter(model.Suite(workfolder), max_steps),
+    )
+
+
+def _fuzz_round(corpus: list[str], executions: int, seed: str):
+    """Fuzz in a worker starting from the shared corpus; returns the new
+    corpus entries, the first input found for each outcome, and the number
+    of executions.
+
+    A round only depends on its arguments, and not on the rounds the worker
+    did before, so that the fuzzing is the same for the same seed."""
+    assert _worker is not None
+    fuzzer = Fuzzer(*_worker, random.Random(seed))
+    for line in corpus:
+        fuzzer.execute(model.Input.decode(line))
+    known = set(corpus)
+    fuzzer.fuzz(executions)
+    entries = [e for e in (i.encode() for i in fuzzer.corpus) if e not in known]
+    found = {k: v.encode() for k, v in fuzzer.found.items()}
+    return entries, found, fuzzer.executions
+
+
+@dataclass
+class Result:
+    """The result of fuzzing a method."""
+
+    found: dict[str, model.Input]
+    corpus: list[model.Input]
+    edges: int
+    executions: int
+    seconds: float
+
+
+def fuzz(
+    suite: model.Suite,
+    methodid: jvm.AbsMethodID,
+    executions: int = 10_000,
+    jobs: int = 1,
+    seed: int = 0,
+    max_steps: int = 10_000,
+    rounds: int = 10,
+) -> Result:
+    """Fuzz the method for about the given number of executions.
+
+    With more than one job, the executions are spread over a process pool
+    in rounds, and the corpus is shared between the workers after each
+    round.
+    """
+    start = time.perf_counter()
+    if jobs <= 1:
+        fuzzer = Fuzzer(
+            methodid, EdgeInterpreter(suite, max_steps), random.Random(seed)
+        )
+        fuzzer.fuzz(executions)
+        return Result(
+            fuzzer.found,
+            fuzzer.corpus,
+            len(bitmap_indices(fuzzer.coverage)),
+            fuzzer.executions,
+            time.perf_counter() - start,
+        )
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    # The main process keeps the shared corpus and coverage.
+    main = Fuzzer(methodid, EdgeInterpreter(suite, max_steps), random.Random(seed))
+    per_round = max(1, executions // (jobs * rounds))
+    total = 0
+    with ProcessPoolExecutor(
+        jobs,
+        initializer=_initialize,
+        initargs=(suite.workfolder, methodid.encode(), max_steps),
+    ) as pool:
+        for r in range(rounds):
+            corpus = [i.encode() for i in main.corpus]
+            futures = [
+                pool.submit(_fuzz_round, corpus, per_round, f"{seed}:{r}:{k}")
+                for k in range(jobs)
+            ]
+            for future in futures:
+                entries, found, count = future.result()
+                total += count
+                for line in entries:
+                    main.execute(model.Input.decode(line))
+                for outcome, line in found.items():
+                    main.found.setdefault(outcome, model.Input.decode(line))
+
+    # The executions of the main process only merge the corpus entries of
+    # the workers, and are not counted.
+    return Result(
+        main.found,
+        main.corpus,
+        len(bitmap_indices(main.coverage)),
+        total,
+        time.perf_counter() - start,
+    )
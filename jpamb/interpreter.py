@@ -0,0 +1,675 @@
+"""
+jpamb.interpreter
+
+This module contains a concrete interpreter of the decompiled bytecode, which
+runs a case method on an 'Input' and reports the outcome using the same
+strings as the cases (see 'model.QUERIES').
+
+The interpreter works on plain python values: ints, booleans, shorts, and
+chars are all python ints (as they are on the JVM stack), arrays are python
+lists, and null is None.
+
+"""
+
+from collections import Counter
+from dataclasses import dataclass
+from time import perf_counter_ns
+from typing import TYPE_CHECKING, Callable, Sequence
+import operator
+import random
+
+from jpamb import jvm, model
+
+if TYPE_CHECKING:
+    from jpamb.trace import Trace
+
+OK = "ok"
+DIVIDE_BY_ZERO = "divide by zero"
+ASSERTION_ERROR = "assertion error"
+OUT_OF_BOUNDS = "out of bounds"
+NULL_POINTER = "null pointer"
+NON_TERMINATION = "*"
+
+DEFAULT_MAX_STEPS = 100_000
+
+EXCEPTIONS = {
+    "java/lang/ArithmeticException": DIVIDE_BY_ZERO,
+    "java/lang/AssertionError": ASSERTION_ERROR,
+    "java/lang/ArrayIndexOutOfBoundsException": OUT_OF_BOUNDS,
+    "java/lang/NullPointerException": NULL_POINTER,
+}
+
+COMPARISONS = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "lt": operator.lt,
+    "ge": operator.ge,
+    "gt": operator.gt,
+    "le": operator.le,
+    "is": operator.is_,
+    "isnot": operator.is_not,
+}
+
+
+class Failure(Exception):
+    """Raised when a method completes abruptly, carries the outcome."""
+
+    def __init__(self, outcome: str):
+        super().__init__(outcome)
+        self.outcome = outcome
+
+
+@dataclass(eq=False)
+class Instance:
+    """An object on the heap, we only track its class."""
+
+    classname: jvm.ClassName
+
+
+def wrap(n: int, bits: int = 32) -> int:
+    """Truncate n to a signed integer of the given number of bits."""
+    half = 1 << (bits - 1)
+    return ((n + half) & ((half << 1) - 1)) - half
+
+
+def idiv(a: int, b: int) -> int:
+    """Integer division rounding towards zero, as on the JVM."""
+    q = abs(a) // abs(b)
+    return wrap(q if (a < 0) == (b < 0) else -q)
+
+
+def irem(a: int, b: int) -> int:
+    """Integer remainder with the sign of the dividend, as on the JVM."""
+    r = abs(a) % abs(b)
+    return r if a >= 0 else -r
+
+
+def exception(objectref) -> Failure:
+    """Get the failure corresponding to throwing objectref."""
+    if objectref is None:
+        return Failure(NULL_POINTER)
+    name = objectref.classname.slashed()
+    try:
+        return Failure(EXCEPTIONS[name])
+    except KeyError:
+        raise NotImplementedError(f"Unhandled exception {name}") from None
+
+
+def from_value(value: jvm.Value):
+    """Convert a jvm value into the representation used by the interpreter."""
+    match value.type:
+        case jvm.Int() | jvm.Short() | jvm.Byte():
+            return value.value
+        case jvm.Boolean():
+            return int(value.value)
+        case jvm.Char():
+            return ord(value.value)
+        case jvm.Array(jvm.Char()):
+            return [ord(c) for c in value.value]
+        case jvm.Array(_):
+            return [from_value(jvm.Value(value.type.contains, v)) for v in value.value]
+        case jvm.Reference():
+            assert value.value is None, f"expected null, but got {value}"
+            return None
+    raise NotImplementedError(f"Cannot interpret {value}")
+
+
+def parameter_slots(params: jvm.ParameterType) -> list[int]:
+    """Get the local variable index of each parameter."""
+    slots, index = [], 0
+    for tp in params:
+        slots.append(index)
+        index += 2 if isinstance(tp, (jvm.Long, jvm.Double)) else 1
+    return slots
+
+
+def resolve(methodid: jvm.AbsMethodID) -> jvm.AbsMethodID:
+    """Method ids read from the bytecode use slashed class names; make them
+    dotted, so that they match the method ids of the cases."""
+    classname = jvm.ClassName.decode(methodid.classname.encode().replace("/", "."))
+    return jvm.AbsMethodID(classname, methodid.extension)
+
+
+class Frame:
+    """A method activation."""
+
+    __slots__ = ("methodid", "opcodes", "locals", "stack", "pc")
+
+    def __init__(self, methodid, opcodes, locals):
+        self.methodid: jvm.AbsMethodID = methodid
+        self.opcodes: tuple[jvm.Opcode, ...] = opcodes
+        self.locals: dict[int, object] = locals
+        self.stack: list = []
+        self.pc: int = 0
+
+    def __str__(self):
+        locals = ", ".join(f"{k}:{v}" for k, v in sorted(self.locals.items()))
+        return f"<{{{locals}}}, {self.stack}, {self.methodid}:{self.pc}>"
+
+
+class Coverage:
+    """The instructions executed in each method, as a bytearray per method
+    indexed by opcode index.
+
+    Coverage from different runs, or different processes, is combined with
+    'merge'.
+    """
+
+    def __init__(self):
+        self.bitmaps: dict[jvm.AbsMethodID, bytearray] = {}
+
+    def bitmap(self, methodid: jvm.AbsMethodID, size: int) -> bytearray:
+        try:
+            return self.bitmaps[methodid]
+        except KeyError:
+            hits = self.bitmaps[methodid] = bytearray(size)
+            return hits
+
+    def merge(self, other: "Coverage"):
+        for methodid, hits in other.bitmaps.items():
+            mine = self.bitmap(methodid, len(hits))
+            for i in bitmap_indices(hits):
+                mine[i] = 1
+
+    def encode(self) -> dict[str, bytes]:
+        return {m.encode(): bytes(hits) for m, hits in self.bitmaps.items()}
+
+    @staticmethod
+    def decode(bitmaps: dict[str, bytes]) -> "Coverage":
+        coverage = Coverage()
+        for m, hits in bitmaps.items():
+            coverage.bitmaps[jvm.AbsMethodID.decode(m)] = bytearray(hits)
+        return coverage
+
+    def covered(self, methodid: jvm.AbsMethodID) -> int:
+        """The number of executed instructions in the method."""
+        return len(bitmap_indices(self.bitmaps.get(methodid, b"")))
+
+
+def bitmap_indices(bitmap: bytes) -> list[int]:
+    """The indices of the set bytes in a bitmap."""
+    indices, i = [], bitmap.find(1)
+    while i >= 0:
+        indices.append(i)
+        i = bitmap.find(1, i + 1)
+    return indices
+
+
+def cover_cases(
+    workfolder, cases: list[str], max_steps: int = DEFAULT_MAX_STEPS
+) -> dict[str, bytes]:
+    """Run the encoded cases and return the encoded coverage. This works on
+    strings and bytes so that it can run in a worker process."""
+    coverage = Coverage()
+    interpreter = Interpreter(model.Suite(workfolder), max_steps, coverage)
+    for case in cases:
+        case = model.Case.decode(case)
+        interpreter.run(case.methodid, case.input)
+    return coverage.encode()
+
+
+class OpcodeStats:
+    """The number of times each instruction was executed, as a list of
+    counts per method indexed by opcode index, and, if 'sample' is set, the
+    time the handler of about every 'sample'-th instruction took, as a histogram
+    per opcode class with buckets of powers of two nanoseconds.
+
+    Like 'Coverage', stats from different runs, or different processes, are
+    combined with 'merge'.
+    """
+
+    BUCKETS = 64
+
+    def __init__(self, sample: int = 0):
+        self.sample = sample
+        self.counts: dict[jvm.AbsMethodID, list[int]] = {}
+        self.times: dict[str, list[int]] = {}
+        self.total_ns: Counter[str] = Counter()
+
+    def method(self, methodid: jvm.AbsMethodID, size: int) -> list[int]:
+        try:
+            return self.counts[methodid]
+        except KeyError:
+            counts = self.counts[methodid] = [0] * size
+            return counts
+
+    def time(self, kind: type, ns: int):
+        name = kind.__name__
+        try:
+            histogram = self.times[name]
+        except KeyError:
+            histogram = self.times[name] = [0] * self.BUCKETS
+        histogram[ns.bit_length()] += 1
+        self.total_ns[name] += ns
+
+    def merge(self, other: "OpcodeStats"):
+        for methodid, counts in other.counts.items():
+            mine = self.method(methodid, len(counts))
+            for i, n in enumerate(counts):
+                mine[i] += n
+        for name, histogram in other.times.items():
+            mine = self.times.setdefault(name, [0] * self.BUCKETS)
+            for i, n in enumerate(histogram):
+                mine[i] += n
+        self.total_ns.update(other.total_ns)
+
+    def encode(self) -> dict:
+        return {
+            "sample": self.sample,
+            "counts": {m.encode(): counts for m, counts in self.counts.items()},
+            "times": self.times,
+            "total_ns": dict(self.total_ns),
+        }
+
+    @staticmethod
+    def decode(encoded: dict) -> "OpcodeStats":
+        stats = OpcodeStats(encoded["sample"])
+        for m, counts in encoded["counts"].items():
+            stats.counts[jvm.AbsMethodID.decode(m)] = list(counts)
+        stats.times = {name: list(h) for name, h in encoded["times"].items()}
+        stats.total_ns = Counter(encoded["total_ns"])
+        return stats
+
+    def by_opcode(
+        self, opcodes: Callable[[jvm.AbsMethodID], Sequence[jvm.Opcode]]
+    ) -> Counter[str]:
+        """The number of executions of each opcode class."""
+        counts: Counter[str] = Counter()
+        for methodid, hits in self.counts.items():
+            for op, n in zip(opcodes(methodid), hits):
+                if n:
+                    counts[type(op).__name__] += n
+        return counts
+
+    def percentile(self, name: str, q: float) -> int:
+        """The upper bound of the bucket of the 'q' percentile of the times
+        of the opcode class, in nanoseconds."""
+        histogram = self.times[name]
+        seen, rank = 0, q * sum(histogram)
+        for bucket, n in enumerate(histogram):
+            seen += n
+            if n and seen >= rank:
+                return 1 << bucket
+        return 0
+
+    def summary(
+        self, opcodes: Callable[[jvm.AbsMethodID], Sequence[jvm.Opcode]]
+    ) -> dict:
+        """The stats by opcode class and by instruction, most executed first."""
+        counts = self.by_opcode(opcodes)
+        total = max(sum(counts.values()), 1)
+        byopcode = {}
+        for name, n in counts.most_common():
+            byopcode[name] = {"count": n, "share": n / total}
+            if name in self.times:
+                samples = sum(self.times[name])
+                byopcode[name]["time"] = {
+                    "samples": samples,
+                    "mean_ns": self.total_ns[name] / samples,
+                    "p50_ns": self.percentile(name, 0.5),
+                    "p90_ns": self.percentile(name, 0.9),
+                    "histogram": self.times[name],
+                }
+        instructions = [
+            {
+                "method": methodid.encode(),
+                "offset": i,
+                "opcode": type(op).__name__,
+                "count": n,
+            }
+            for methodid, hits in self.counts.items()
+            for i, (op, n) in enumerate(zip(opcodes(methodid), hits))
+            if n
+        ]
+        instructions.sort(key=lambda r: r["count"], reverse=True)
+        return {
+            "total": sum(counts.values()),
+            "sample": self.sample,
+            "byopcode": byopcode,
+            "instructions": instructions,
+        }
+
+
+def count_cases(
+    workfolder, cases: list[str], sample: int = 0, max_steps: int = DEFAULT_MAX_STEPS
+) -> dict:
+    """Run the encoded cases and return the encoded opcode stats, like
+    'cover_cases'."""
+    stats = OpcodeStats(sample)
+    interpreter = Interpreter(model.Suite(workfolder), max_steps, stats=stats)
+    for case in cases:
+        case = model.Case.decode(case)
+        interpreter.run(case.methodid, case.input)
+    return stats.encode()
+
+
+class Interpreter:
+    """A dispatch loop interpreter of the methods in a suite.
+
+    The opcodes of each method are decoded once and cached. A run that takes
+    more than 'max_steps' instructions is reported as non-terminating.
+    """
+
+    def __init__(
+        self,
+        suite: model.Suite | None = None,
+        max_steps: int = DEFAULT_MAX_STEPS,
+        coverage: "Coverage | None" = None,
+        trace: "Trace | None" = None,
+        stats: "OpcodeStats | None" = None,
+    ):
+        if sum(x is not None for x in (coverage, trace, stats)) > 1:
+            raise ValueError("Can only record one of coverage, a trace, or stats")
+        self.suite = suite or model.Suite()
+        self.max_steps = max_steps
+        self.coverage = coverage
+        self.trace = trace
+        self.stats = stats
+        self.methods: dict[jvm.AbsMethodID, tuple[jvm.Opcode, ...]] = {}
+        self.frames: list[Frame] = []
+        self.handlers = {
+            jvm.Push: self.push,
+            jvm.Load: self.load,
+            jvm.Store: self.store,
+            jvm.Dup: self.dup,
+            jvm.Binary: self.binary,
+            jvm.Incr: self.incr,
+            jvm.Cast: self.cast,
+            jvm.If: self.if_,
+            jvm.Ifz: self.ifz,
+            jvm.Goto: self.goto,
+            jvm.Get: self.get,
+            jvm.New: self.new,
+            jvm.Throw: self.throw,
+            jvm.NewArray: self.newarray,
+            jvm.ArrayLoad: self.array_load,
+            jvm.ArrayStore: self.array_store,
+            jvm.ArrayLength: self.arraylength,
+            jvm.InvokeStatic: self.invoke_static,
+            jvm.InvokeSpecial: self.invoke_special,
+            jvm.Return: self.return_,
+        }
+
+    def opcodes(self, methodid: jvm.AbsMethodID) -> tuple[jvm.Opcode, ...]:
+        try:
+            return self.methods[methodid]
+        except KeyError:
+            opcodes = tuple(self.suite.method_opcodes(methodid))
+            self.methods[methodid] = opcodes
+            return opcodes
+
+    def frame(self, methodid: jvm.AbsMethodID, args: list) -> Frame:
+        slots = parameter_slots(methodid.extension.params)
+        return Frame(methodid, self.opcodes(methodid), dict(zip(slots, args)))
+
+    def run(self, methodid: jvm.AbsMethodID, input: model.Input) -> str:
+        """Run the method on the input and return the outcome."""
+        frame = self.frame(methodid, [from_value(v) for v in input.values])
+        self.frames = [frame]
+        try:
+            if self.trace is not None:
+                return self.traced_loop(frame, self.trace)
+            if self.coverage is not None:
+                return self.covered_loop(frame, self.coverage)
+            if self.stats is not None:
+                if self.stats.sample:
+                    return self.timed_loop(frame, self.stats)
+                return self.counted_loop(frame, self.stats)
+            return self.loop(frame)
+        except Failure as e:
+            return e.outcome
+
+    def loop(self, frame: Frame) -> str:
+        handlers = self.handlers
+        for _ in range(self.max_steps):
+            op = frame.opcodes[frame.pc]
+            frame = handlers[type(op)](frame, op)
+            if frame is None:
+                return OK
+        return NON_TERMINATION
+
+    def covered_loop(self, frame: Frame, coverage: "Coverage") -> str:
+        """Like 'loop', but marks each executed instruction in the coverage."""
+        handlers, bitmap = self.handlers, coverage.bitmap
+        hits = bitmap(frame.methodid, len(frame.opcodes))
+        for _ in range(self.max_steps):
+            pc = frame.pc
+            hits[pc] = 1
+            op = frame.opcodes[pc]
+            callee = handlers[type(op)](frame, op)
+            if callee is None:
+                return OK
+            if callee is not frame:
+                frame = callee
+                hits = bitmap(frame.methodid, len(frame.opcodes))
+        return NON_TERMINATION
+
+    def traced_loop(self, frame: Frame, trace: "Trace") -> str:
+        """Like 'loop', but records each instruction in the trace."""
+        handlers, record = self.handlers, trace.record
+        method = trace.method(frame.methodid)
+        for _ in range(self.max_steps):
+            op = frame.opcodes[frame.pc]
+            record(method, frame.pc, type(op), frame.stack)
+            callee = handlers[type(op)](frame, op)
+            if callee is None:
+                return OK
+            if callee is not frame:
+                frame = callee
+                method = trace.method(frame.methodid)
+        return NON_TERMINATION
+
+    def counted_loop(self, frame: Frame, stats: OpcodeStats) -> str:
+        """Like 'loop', but counts each executed instruction."""
+        handlers, method = self.handlers, stats.method
+        counts = method(frame.methodid, len(frame.opcodes))
+        for _ in range(self.max_steps):
+            pc = frame.pc
+            counts[pc] += 1
+            op = frame.opcodes[pc]
+            callee = handlers[type(op)](frame, op)
+            if callee is None:
+                return OK
+            if callee is not frame:
+                frame = callee
+                counts = method(frame.methodid, len(frame.opcodes))
+        return NON_TERMINATION
+
+    def timed_loop(self, frame: Frame, stats: OpcodeStats) -> str:
+        """Like 'counted_loop', but also times the handler of about every
+        'stats.sample'-th instruction. The distance between the timed
+        instructions is random, so that it does not line up with a loop."""
+        handlers, method, time = self.handlers, stats.method, stats.time
+        distance = random.Random(0).randint
+        sample = stats.sample
+        countdown = distance(1, 2 * sample - 1)
+        counts = method(frame.methodid, len(frame.opcodes))
+        for _ in range(self.max_steps):
+            pc = frame.pc
+            counts[pc] += 1
+            op = frame.opcodes[pc]
+            countdown -= 1
+            if countdown:
+                callee = handlers[type(op)](frame, op)
+            else:
+                countdown = distance(1, 2 * sample - 1)
+                start = perf_counter_ns()
+                callee = handlers[type(op)](frame, op)
+                time(type(op), perf_counter_ns() - start)
+            if callee is None:
+                return OK
+            if callee is not frame:
+                frame = callee
+                counts = method(frame.methodid, len(frame.opcodes))
+        return NON_TERMINATION
+
+    def push(self, frame: Frame, op: jvm.Push):
+        frame.stack.append(op.value.value)
+        frame.pc += 1
+        return frame
+
+    def load(self, frame: Frame, op: jvm.Load):
+        frame.stack.append(frame.locals[op.index])
+        frame.pc += 1
+        return frame
+
+    def store(self, frame: Frame, op: jvm.Store):
+        frame.locals[op.index] = frame.stack.pop()
+        frame.pc += 1
+        return frame
+
+    def dup(self, frame: Frame, op: jvm.Dup):
+        if op.words != 1:
+            raise NotImplementedError(f"Unhandled {op!r}")
+        frame.stack.append(frame.stack[-1])
+        frame.pc += 1
+        return frame
+
+    def binary(self, frame: Frame, op: jvm.Binary):
+        stack = frame.stack
+        b, a = stack.pop(), stack.pop()
+        match op.operant:
+            case jvm.BinaryOpr.Add:
+                r = wrap(a + b)
+            case jvm.BinaryOpr.Sub:
+                r = wrap(a - b)
+            case jvm.BinaryOpr.Mul:
+                r = wrap(a * b)
+            case jvm.BinaryOpr.Div:
+                if b == 0:
+                    raise Failure(DIVIDE_BY_ZERO)
+                r = idiv(a, b)
+            case jvm.BinaryOpr.Rem:
+                if b == 0:
+                    raise Failure(DIVIDE_BY_ZERO)
+                r = irem(a, b)
+            case _:
+                raise NotImplementedError(f"Unhandled {op!r}")
+        stack.append(r)
+        frame.pc += 1
+        return frame
+
+    def incr(self, frame: Frame, op: jvm.Incr):
+        frame.locals[op.index] = wrap(frame.locals[op.index] + op.amount)
+        frame.pc += 1
+        return frame
+
+    def cast(self, frame: Frame, op: jvm.Cast):
+        match op.to_:
+            case jvm.Short():
+                frame.stack.append(wrap(frame.stack.pop(), 16))
+            case jvm.Byte():
+                frame.stack.append(wrap(frame.stack.pop(), 8))
+            case jvm.Char():
+                frame.stack.append(frame.stack.pop() & 0xFFFF)
+            case jvm.Int():
+                pass
+            case _:
+                raise NotImplementedError(f"Unhandled {op!r}")
+        frame.pc += 1
+        return frame
+
+    def if_(self, frame: Frame, op: jvm.If):
+        b, a = frame.stack.pop(), frame.stack.pop()
+        if COMPARISONS[op.condition](a, b):
+            frame.pc = op.target
+        else:
+            frame.pc += 1
+        return frame
+
+    def ifz(self, frame: Frame, op: jvm.Ifz):
+        a = frame.stack.pop()
+        zero = None if op.condition in ("is", "isnot") else 0
+        if COMPARISONS[op.condition](a, zero):
+            frame.pc = op.target
+        else:
+            frame.pc += 1
+        return frame
+
+    def goto(self, frame: Frame, op: jvm.Goto):
+        frame.pc = op.target
+        return frame
+
+    def get(self, frame: Frame, op: jvm.Get):
+        if not (op.static and op.field.extension.name == "$assertionsDisabled"):
+            raise NotImplementedError(f"Unhandled {op!r}")
+        # We always run with assertions enabled, like `java -ea`.
+        frame.stack.append(0)
+        frame.pc += 1
+        return frame
+
+    def new(self, frame: Frame, op: jvm.New):
+        frame.stack.append(Instance(op.classname))
+        frame.pc += 1
+        return frame
+
+    def throw(self, frame: Frame, op: jvm.Throw):
+        raise exception(frame.stack.pop())
+
+    def newarray(self, frame: Frame, op: jvm.NewArray):
+        if op.dim != 1:
+            raise NotImplementedError(f"Unhandled {op!r}")
+        count = frame.stack.pop()
+        if count < 0:
+            raise NotImplementedError("Unhandled negative array size")
+        default = None if isinstance(op.type, (jvm.Array, jvm.Reference)) else 0
+        frame.stack.append([default] * count)
+        frame.pc += 1
+        return frame
+
+    def array_load(self, frame: Frame, op: jvm.ArrayLoad):
+        stack = frame.stack
+        index, array = stack.pop(), stack.pop()
+        if array is None:
+            raise Failure(NULL_POINTER)
+        if not 0 <= index < len(array):
+            raise Failure(OUT_OF_BOUNDS)
+        stack.append(array[index])
+        frame.pc += 1
+        return frame
+
+    def array_store(self, frame: Frame, op: jvm.ArrayStore):
+        stack = frame.stack
+        value, index, array = stack.pop(), stack.pop(), stack.pop()
+        if array is None:
+            raise Failure(NULL_POINTER)
+        if not 0 <= index < len(array):
+            raise Failure(OUT_OF_BOUNDS)
+        array[index] = value
+        frame.pc += 1
+        return frame
+
+    def arraylength(self, frame: Frame, op: jvm.ArrayLength):
+        array = frame.stack.pop()
+        if array is None:
+            raise Failure(NULL_POINTER)
+        frame.stack.append(len(array))
+        frame.pc += 1
+        return frame
+
+    def invoke_static(self, frame: Frame, op: jvm.InvokeStatic):
+        n = len(op.method.extension.params)
+        args = frame.stack[len(frame.stack) - n :]
+        del frame.stack[len(frame.stack) - n :]
+        callee = self.frame(resolve(op.method), args)
+        self.frames.append(callee)
+        return callee
+
+    def invoke_special(self, frame: Frame, op: jvm.InvokeSpecial):
+        if op.method.extension.name != "<init>":
+            raise NotImplementedError(f"Unhandled {op!r}")
+        # Constructors of the exceptions have no effects we track.
+        n = len(op.method.extension.params) + 1
+        del frame.stack[len(frame.stack) - n :]
+        frame.pc += 1
+        return frame
+
+    def return_(self, frame: Frame, op: jvm.Return):
+        self.frames.pop()
+        if not self.frames:
+            return None
+        caller = self.frames[-1]
+        if op.type is not None:
+            caller.stack.append(frame.stack.pop())
+        caller.pc += 1
+        return caller
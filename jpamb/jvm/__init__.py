@@ -1,2 +1,38 @@
+"""
+jpamb.jvm
+
+The names and types of 'jpamb.jvm.base' are imported right away, while the
+opcodes of 'jpamb.jvm.opcode', the interning of 'jpamb.jvm.intern' and the
+class file reader of 'jpamb.jvm.classfile' are imported when one of their
+names is first used, as most analyzers only need the names and values.
+
+"""
+
 from jpamb.jvm.base import *
-from jpamb.jvm.opcode import *
+
+_LAZY = ("jpamb.jvm.opcode", "jpamb.jvm.intern", "jpamb.jvm.classfile")
+
+
+def _load():
+    import importlib
+
+    for name in _LAZY:
+        module = importlib.import_module(name)
+        globals().update(
+            (k, v) for k, v in vars(module).items() if not k.startswith("_")
+        )
+
+
+def __getattr__(name: str):
+    if name.startswith("__"):
+        raise AttributeError(name)
+    _load()
+    try:
+        return globals()[name]
+    except KeyError:
+        raise AttributeError(f"module 'jpamb.jvm' has no attribute {name!r}")
+
+
+def __dir__():
+    _load()
+    return list(globals())
@@ -15,7 +15,7 @@ from functools import total_ordering
 import re
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import Callable, Protocol, Self, Iterable, Optional, Iterator, NoReturn
+from typing import Callable, Protocol, Self, Iterable, Optional, NoReturn
 
 
 @dataclass(frozen=True, order=True)
@@ -130,19 +130,8 @@ class Type(ABC):
     @staticmethod
     def from_json(json: str) -> "Type":
         if isinstance(json, str):
-            match json:
-                case "integer":
-                    return Int()
-                case "int":
-                    return Int()
-                case "char":
-                    return Char()
-                case "short":
-                    return Short()
-                case "ref":
-                    return Reference()
-                case "boolean":
-                    return Boolean()
+            if json in JSON_TYPES:
+                return JSON_TYPES[json]
         if "base" in json:
             return Type.from_json(json["base"])
         if "kind" in json:
@@ -395,6 +384,17 @@ class Double(StackType):
         return "double"
 
 
+# The types in the jvm2json output that are plain strings.
+JSON_TYPES: dict[str, Type] = {
+    "integer": Int(),
+    "int": Int(),
+    "char": Char(),
+    "short": Short(),
+    "ref": Reference(),
+    "boolean": Boolean(),
+}
+
+
 @dataclass(frozen=True, order=True)
 class ParameterType:
     """A list of parameters types"""
@@ -643,29 +643,39 @@ class Value:
 class ValueParser:
     Token = namedtuple("Token", "kind value")
 
+    TOKEN_RE = re.compile(
+        "|".join(
+            f"(?P<{n}>{m})"
+            for n, m in [
+                ("OPEN_ARRAY", r"\[[IC]:"),
+                ("CLOSE_ARRAY", r"\]"),
+                ("INT", r"-?\d+"),
+                ("BOOL", r"true|false"),
+                ("CHAR", r"'[^']'"),
+                ("COMMA", r","),
+                ("SKIP", r"[ \t]+"),
+            ]
+        )
+    )
+
+    # The contents and end of a well-formed array literal, used to parse
+    # them in bulk.
+    INT_ARRAY_RE = re.compile(r"[ \t]*(?:-?\d+[ \t]*(?:,[ \t]*-?\d+[ \t]*)*)?\]")
+    CHAR_ARRAY_RE = re.compile(r"[ \t]*(?:'[^']'[ \t]*(?:,[ \t]*'[^']'[ \t]*)*)?\]")
+    CHAR_RE = re.compile(r"'([^'])'")
+
     input: str
     head: Optional["ValueParser.Token"]
-    _tokens: Iterator["ValueParser.Token"]
+    pos: int
 
     def __init__(self, input) -> None:
         self.input = input
-        self._tokens = ValueParser.tokenize(input)
+        self.pos = 0
         self.next()
 
     @staticmethod
     def tokenize(string):
-        token_specification = [
-            ("OPEN_ARRAY", r"\[[IC]:"),
-            ("CLOSE_ARRAY", r"\]"),
-            ("INT", r"-?\d+"),
-            ("BOOL", r"true|false"),
-            ("CHAR", r"'[^']'"),
-            ("COMMA", r","),
-            ("SKIP", r"[ \t]+"),
-        ]
-        tok_regex = "|".join(f"(?P<{n}>{m})" for n, m in token_specification)
-
-        for m in re.finditer(tok_regex, string):
+        for m in ValueParser.TOKEN_RE.finditer(string):
             kind, value = m.lastgroup, m.group()
             if kind == "SKIP":
                 continue
@@ -676,10 +686,14 @@ class ValueParser:
         return ValueParser(string).parse_comma_seperated_values()
 
     def next(self):
-        try:
-            self.head = next(self._tokens)
-        except StopIteration:
-            self.head = None
+        search = ValueParser.TOKEN_RE.search
+        while m := search(self.input, self.pos):
+            self.pos = m.end()
+            if m.lastgroup != "SKIP":
+                self.head = ValueParser.Token(m.lastgroup, m.group())
+                return
+        self.pos = len(self.input)
+        self.head = None
 
     def expected(self, expected) -> NoReturn:
         raise ValueError(f"Expected {expected} but got {self.head} in {self.input}")
@@ -734,6 +748,23 @@ class ValueParser:
         else:
             self.expected("int or char array")
 
+        # The head is the token after the open bracket; the fast path parses
+        # the rest of the array directly from the input.
+        start = self.pos - len(self.head.value) if self.head else self.pos
+        if parser == self.parse_int:
+            m = ValueParser.INT_ARRAY_RE.match(self.input, start)
+            if m:
+                body = self.input[start : m.end() - 1]
+                inputs = tuple(map(int, body.split(","))) if body.strip() else ()
+        else:
+            m = ValueParser.CHAR_ARRAY_RE.match(self.input, start)
+            if m:
+                inputs = tuple(ValueParser.CHAR_RE.findall(self.input, start, m.end()))
+        if m:
+            self.pos = m.end()
+            self.next()
+            return Value(type, inputs)
+
         inputs = self.parse_comma_seperated_values(parser, "CLOSE_ARRAY")
 
         self.expect("CLOSE_ARRAY")
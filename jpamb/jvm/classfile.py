@@ -0,0 +1,512 @@
+"""
+jpamb.jvm.classfile
+
+This module contains a reader of java class files, as an alternative to the
+output of jvm2json. A 'ClassFile' reads the constant pool and the methods of
+a class, and the bytecode of a method is only decoded into the opcodes of
+'jpamb.jvm.opcode' when it is first asked for.
+
+The opcodes are the same as those 'Opcode.from_json' decodes from the output
+of jvm2json: jump targets are the indices of instructions, class names are
+kept with slashes, and instructions that the JSON decoder does not handle
+raise a 'NotImplementedError'.
+
+    cf = ClassFile.read(suite.classfile(cn))
+    opcodes = cf.method(methodid.extension).opcodes()
+
+"""
+
+from dataclasses import dataclass
+from functools import cached_property
+from pathlib import Path
+import struct
+
+from jpamb.jvm import base as jvm
+from jpamb.jvm import opcode as op
+
+MAGIC = 0xCAFEBABE
+
+# The formats of the entries of the constant pool, by tag, after the tag.
+_CONSTANTS = {
+    3: ">i",  # Integer
+    4: ">f",  # Float
+    5: ">q",  # Long
+    6: ">d",  # Double
+    7: ">H",  # Class
+    8: ">H",  # String
+    9: ">HH",  # Fieldref
+    10: ">HH",  # Methodref
+    11: ">HH",  # InterfaceMethodref
+    12: ">HH",  # NameAndType
+    15: ">BH",  # MethodHandle
+    16: ">H",  # MethodType
+    17: ">HH",  # Dynamic
+    18: ">HH",  # InvokeDynamic
+    19: ">H",  # Module
+    20: ">H",  # Package
+}
+
+
+class ConstantPool:
+    """The constant pool of a class file; entry 0 is unused, and longs and
+    doubles take two entries."""
+
+    def __init__(self, entries: list):
+        self.entries = entries
+
+    def __getitem__(self, index: int):
+        return self.entries[index]
+
+    def utf8(self, index: int) -> str:
+        tag, value = self.entries[index]
+        assert tag == 1, f"Expected an Utf8 constant at {index}, got tag {tag}"
+        return value
+
+    def classname(self, index: int) -> str:
+        """The name of a Class constant, with slashes."""
+        return self.utf8(self.entries[index][1][0])
+
+    def name_and_type(self, index: int) -> tuple[str, str]:
+        name, descriptor = self.entries[index][1]
+        return self.utf8(name), self.utf8(descriptor)
+
+    def member(self, index: int) -> tuple[int, str, str, str]:
+        """The tag, class name, name and descriptor of a field or method
+        reference."""
+        tag, (cls, nat) = self.entries[index]
+        return (tag, self.classname(cls), *self.name_and_type(nat))
+
+
+def _utf8(data: bytes) -> str:
+    # Class files use a modified UTF-8, which encodes the null character in
+    # two bytes and characters outside the BMP as surrogate pairs.
+    return data.replace(b"\xc0\x80", b"\x00").decode("utf-8", "surrogatepass")
+
+
+@dataclass(frozen=True)
+class ExceptionHandler:
+    """An entry of the exception table; 'start', 'end' and 'handler' are
+    indices of instructions, like in the output of jvm2json, and
+    'catch_type' is None for handlers of every exception."""
+
+    start: int
+    end: int
+    handler: int
+    catch_type: str | None
+
+
+@dataclass(frozen=True)
+class Code:
+    """The Code attribute of a method."""
+
+    max_stack: int
+    max_locals: int
+    bytecode: bytes
+    table: tuple[tuple[int, int, int, int], ...]
+    pool: ConstantPool
+
+    @cached_property
+    def offsets(self) -> tuple[int, ...]:
+        """The offsets of the instructions."""
+        return tuple(_offsets(self.bytecode))
+
+    @cached_property
+    def opcodes(self) -> tuple[op.Opcode, ...]:
+        return _Decoder(self).decode()
+
+    @cached_property
+    def exceptions(self) -> tuple[ExceptionHandler, ...]:
+        index = {o: i for i, o in enumerate(self.offsets)}
+        index[len(self.bytecode)] = len(self.offsets)
+        return tuple(
+            ExceptionHandler(
+                index[start],
+                index[end],
+                index[handler],
+                self.pool.classname(catch) if catch else None,
+            )
+            for start, end, handler, catch in self.table
+        )
+
+
+@dataclass(frozen=True)
+class MethodInfo:
+    access: int
+    name: str
+    descriptor: str
+    code: Code | None
+
+    def opcodes(self) -> tuple[op.Opcode, ...]:
+        """The opcodes of the method, decoded the first time they are asked
+        for."""
+        if self.code is None:
+            raise ValueError(f"The method {self.name} has no code")
+        return self.code.opcodes
+
+
+class _Reader:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.pos = 0
+
+    def unpack(self, fmt: str):
+        values = struct.unpack_from(fmt, self.data, self.pos)
+        self.pos += struct.calcsize(fmt)
+        return values
+
+    def u1(self) -> int:
+        self.pos += 1
+        return self.data[self.pos - 1]
+
+    def u2(self) -> int:
+        return self.unpack(">H")[0]
+
+    def u4(self) -> int:
+        return self.unpack(">I")[0]
+
+    def bytes(self, n: int) -> bytes:
+        self.pos += n
+        return self.data[self.pos - n : self.pos]
+
+    def attributes(self, pool: ConstantPool) -> dict[str, bytes]:
+        attributes = {}
+        for _ in range(self.u2()):
+            name = pool.utf8(self.u2())
+            attributes[name] = self.bytes(self.u4())
+        return attributes
+
+
+@dataclass(frozen=True)
+class ClassFile:
+    """A class file, with the constant pool and the methods read; the
+    bytecode of the methods is decoded lazily."""
+
+    version: tuple[int, int]
+    access: int
+    name: str
+    super: str | None
+    interfaces: tuple[str, ...]
+    methods: tuple[MethodInfo, ...]
+    pool: ConstantPool
+
+    @staticmethod
+    def read(path: Path) -> "ClassFile":
+        with open(path, "rb") as fp:
+            return ClassFile.parse(fp.read())
+
+    @staticmethod
+    def parse(data: bytes) -> "ClassFile":
+        r = _Reader(data)
+        magic, minor, major, count = r.unpack(">IHHH")
+        if magic != MAGIC:
+            raise ValueError(f"Not a class file, the magic is {magic:#x}")
+
+        entries: list = [None] * count
+        i = 1
+        while i < count:
+            tag = r.u1()
+            if tag == 1:
+                entries[i] = (tag, _utf8(r.bytes(r.u2())))
+            elif tag in _CONSTANTS:
+                entries[i] = (tag, r.unpack(_CONSTANTS[tag]))
+            else:
+                raise ValueError(f"Unknown constant pool tag {tag} at entry {i}")
+            i += 2 if tag in (5, 6) else 1
+        pool = ConstantPool(entries)
+
+        access, this, super = r.unpack(">HHH")
+        interfaces = tuple(pool.classname(r.u2()) for _ in range(r.u2()))
+        for _ in range(r.u2()):
+            r.unpack(">HHH")
+            r.attributes(pool)
+
+        methods = []
+        for _ in range(r.u2()):
+            flags, name, descriptor = r.unpack(">HHH")
+            code = r.attributes(pool).get("Code")
+            methods.append(
+                MethodInfo(
+                    flags,
+                    pool.utf8(name),
+                    pool.utf8(descriptor),
+                    _code(code, pool) if code is not None else None,
+                )
+            )
+
+        return ClassFile(
+            version=(major, minor),
+            access=access,
+            name=pool.classname(this),
+            super=pool.classname(super) if super else None,
+            interfaces=interfaces,
+            methods=tuple(methods),
+            pool=pool,
+        )
+
+    def method(self, methodid: jvm.MethodID) -> MethodInfo:
+        """The method with the name and parameters of 'methodid'."""
+        params = f"({methodid.params.encode()})"
+        for method in self.methods:
+            if method.name == methodid.name and method.descriptor.startswith(params):
+                return method
+        raise IndexError(f"Could not find {methodid.encode()} in {self.name}")
+
+
+def _code(data: bytes, pool: ConstantPool) -> Code:
+    r = _Reader(data)
+    max_stack, max_locals, length = r.unpack(">HHI")
+    bytecode = r.bytes(length)
+    table = tuple(r.unpack(">HHHH") for _ in range(r.u2()))
+    return Code(max_stack, max_locals, bytecode, table, pool)
+
+
+# The lengths of the instructions with operands of a fixed size; the other
+# instructions of the JVM are one byte long.
+_LENGTHS = {
+    0x10: 2,  # bipush
+    0x11: 3,  # sipush
+    0x12: 2,  # ldc
+    0x13: 3,  # ldc_w
+    0x14: 3,  # ldc2_w
+    **{code: 2 for code in range(0x15, 0x1A)},  # xload
+    **{code: 2 for code in range(0x36, 0x3B)},  # xstore
+    0x84: 3,  # iinc
+    **{code: 3 for code in range(0x99, 0xA9)},  # if*, goto, jsr
+    0xA9: 2,  # ret
+    **{code: 3 for code in range(0xB2, 0xB9)},  # get, put, invoke
+    0xB9: 5,  # invokeinterface
+    0xBA: 5,  # invokedynamic
+    0xBB: 3,  # new
+    0xBC: 2,  # newarray
+    0xBD: 3,  # anewarray
+    0xC0: 3,  # checkcast
+    0xC1: 3,  # instanceof
+    0xC5: 4,  # multianewarray
+    0xC6: 3,  # ifnull
+    0xC7: 3,  # ifnonnull
+    0xC8: 5,  # goto_w
+    0xC9: 5,  # jsr_w
+}
+
+
+def _offsets(code: bytes):
+    """The offsets of the instructions of the code."""
+    pc = 0
+    while pc < len(code):
+        yield pc
+        opcode = code[pc]
+        if opcode == 0xAA:  # tableswitch
+            pad = pc + 4 - pc % 4
+            low, high = struct.unpack_from(">ii", code, pad + 4)
+            pc = pad + 12 + 4 * (high - low + 1)
+        elif opcode == 0xAB:  # lookupswitch
+            pad = pc + 4 - pc % 4
+            (npairs,) = struct.unpack_from(">i", code, pad + 4)
+            pc = pad + 8 + 8 * npairs
+        elif opcode == 0xC4:  # wide
+            pc += 6 if code[pc + 1] == 0x84 else 4
+        else:
+            pc += _LENGTHS.get(opcode, 1)
+
+
+# The types of the instructions by their prefix, as jvm2json names them;
+# the other prefixes are of types that 'Type.from_json' does not handle.
+_PREFIXES = {"i": jvm.Int(), "a": jvm.Reference(), "c": jvm.Char(), "s": jvm.Short()}
+
+# The element types of 'newarray'.
+_ATYPES = {4: jvm.Boolean(), 5: jvm.Char(), 9: jvm.Short(), 10: jvm.Int()}
+
+# The field types of descriptors that 'Type.from_json' handles.
+_DESCRIPTORS = {"I": jvm.Int(), "C": jvm.Char(), "S": jvm.Short(), "Z": jvm.Boolean()}
+
+_BINARY = {
+    0x60: op.BinaryOpr.Add,
+    0x64: op.BinaryOpr.Sub,
+    0x68: op.BinaryOpr.Mul,
+    0x6C: op.BinaryOpr.Div,
+    0x70: op.BinaryOpr.Rem,
+}
+
+_CONDITIONS = ("eq", "ne", "lt", "ge", "gt", "le")
+
+
+def _unhandled(what) -> NotImplementedError:
+    return NotImplementedError(f"Unhandled opcode {what!r} (implement yourself)")
+
+
+def _type(descriptor: str) -> tuple[jvm.Type, str]:
+    """Decode the field type at the start of the descriptor."""
+    if descriptor[0] == "[":
+        element, rest = _type(descriptor[1:])
+        return jvm.Array(element), rest
+    if descriptor[0] == "L":
+        raise NotImplementedError(f"Type.from_json: class type {descriptor!r}")
+    if (tt := _DESCRIPTORS.get(descriptor[0])) is None:
+        raise NotImplementedError(f"Type.from_json: {descriptor[0]!r}")
+    return tt, descriptor[1:]
+
+
+def _method_descriptor(descriptor: str) -> tuple[jvm.ParameterType, jvm.Type | None]:
+    rest = descriptor[1:]
+    params = []
+    while rest[0] != ")":
+        tt, rest = _type(rest)
+        params.append(tt)
+    returns = None if rest[1:] == "V" else _type(rest[1:])[0]
+    return jvm.ParameterType(tuple(params)), returns
+
+
+class _Decoder:
+    """Decodes the bytecode of a method into opcodes."""
+
+    def __init__(self, code: Code):
+        self.code = code.bytecode
+        self.pool = code.pool
+        self.offsets = code.offsets
+        self.index = {o: i for i, o in enumerate(self.offsets)}
+
+    def decode(self) -> tuple[op.Opcode, ...]:
+        return tuple([self.instruction(pc) for pc in self.offsets])
+
+    def s1(self, at: int) -> int:
+        return struct.unpack_from(">b", self.code, at)[0]
+
+    def s2(self, at: int) -> int:
+        return struct.unpack_from(">h", self.code, at)[0]
+
+    def u2(self, at: int) -> int:
+        return struct.unpack_from(">H", self.code, at)[0]
+
+    def target(self, pc: int, delta: int) -> int:
+        return self.index[pc + delta]
+
+    def prefixed(self, code: int, first: int) -> jvm.Type:
+        """The type of a typed instruction, like 'iload', of the group of
+        instructions starting at 'first', in the order i, l, f, d, a, b, c, s."""
+        prefix = "ilfdabcs"[code - first]
+        if (tt := _PREFIXES.get(prefix)) is None:
+            raise _unhandled(f"{prefix} instruction {code:#x}")
+        return tt
+
+    def invoke(self, pc: int, cls: type[op.Opcode]) -> op.Opcode:
+        tag, classname, name, descriptor = self.pool.member(self.u2(pc + 1))
+        if classname.startswith("["):
+            raise _unhandled(f"invoke on the array {classname}")
+        params, returns = _method_descriptor(descriptor)
+        # Like in the output of jvm2json, the class names keep their slashes.
+        method = jvm.AbsMethodID(
+            jvm.ClassName.decode(classname), jvm.MethodID(name, params, returns)
+        )
+        if cls is op.InvokeSpecial:
+            return op.InvokeSpecial(pc, method, tag == 11)
+        if cls is op.InvokeInterface:
+            return op.InvokeInterface(pc, method, self.code[pc + 3])
+        return cls(pc, method)
+
+    def instruction(self, pc: int) -> op.Opcode:
+        code = self.code[pc]
+        if code == 0x01:
+            return op.Push(pc, jvm.Value(jvm.Reference(), None))
+        if 0x02 <= code <= 0x08:
+            return op.Push(pc, jvm.Value.int(code - 0x03))
+        if code == 0x10:
+            return op.Push(pc, jvm.Value.int(self.s1(pc + 1)))
+        if code == 0x11:
+            return op.Push(pc, jvm.Value.int(self.s2(pc + 1)))
+        if code in (0x12, 0x13):
+            index = self.code[pc + 1] if code == 0x12 else self.u2(pc + 1)
+            tag, (value,) = self.pool[index]
+            if tag != 3:
+                raise _unhandled(f"ldc of constant tag {tag}")
+            return op.Push(pc, jvm.Value.int(value))
+        if 0x15 <= code <= 0x19:
+            return op.Load(pc, self.prefixed(code, 0x15), self.code[pc + 1])
+        if 0x1A <= code <= 0x2D:
+            group, n = divmod(code - 0x1A, 4)
+            return op.Load(pc, self.prefixed(group, 0), n)
+        if 0x2E <= code <= 0x35:
+            return op.ArrayLoad(pc, self.prefixed(code, 0x2E))
+        if 0x36 <= code <= 0x3A:
+            return op.Store(pc, self.prefixed(code, 0x36), self.code[pc + 1])
+        if 0x3B <= code <= 0x4E:
+            group, n = divmod(code - 0x3B, 4)
+            return op.Store(pc, self.prefixed(group, 0), n)
+        if 0x4F <= code <= 0x56:
+            return op.ArrayStore(pc, self.prefixed(code, 0x4F))
+        if code == 0x59:
+            return op.Dup(pc, 1)
+        if code == 0x5C:
+            return op.Dup(pc, 2)
+        if code in _BINARY:
+            return op.Binary(pc, jvm.Int(), _BINARY[code])
+        if code == 0x84:
+            return op.Incr(pc, self.code[pc + 1], self.s1(pc + 2))
+        if code == 0x92:
+            return op.Cast(pc, jvm.Int(), jvm.Char())
+        if code == 0x93:
+            return op.Cast(pc, jvm.Int(), jvm.Short())
+        if 0x99 <= code <= 0x9E:
+            condition = _CONDITIONS[code - 0x99]
+            return op.Ifz(pc, condition, self.target(pc, self.s2(pc + 1)))
+        if 0x9F <= code <= 0xA4:
+            condition = _CONDITIONS[code - 0x9F]
+            return op.If(pc, condition, self.target(pc, self.s2(pc + 1)))
+        if code in (0xA5, 0xA6):
+            condition = "is" if code == 0xA5 else "isnot"
+            return op.If(pc, condition, self.target(pc, self.s2(pc + 1)))
+        if code == 0xA7:
+            return op.Goto(pc, self.target(pc, self.s2(pc + 1)))
+        if code == 0xAC:
+            return op.Return(pc, jvm.Int())
+        if code == 0xB0:
+            return op.Return(pc, jvm.Reference())
+        if code == 0xB1:
+            return op.Return(pc, None)
+        if code in (0xB2, 0xB4):
+            _, classname, name, descriptor = self.pool.member(self.u2(pc + 1))
+            field = jvm.AbsFieldID(
+                jvm.ClassName.decode(classname),
+                jvm.FieldID(name, _type(descriptor)[0]),
+            )
+            return op.Get(pc, code == 0xB2, field)
+        if code == 0xB6:
+            return self.invoke(pc, op.InvokeVirtual)
+        if code == 0xB7:
+            return self.invoke(pc, op.InvokeSpecial)
+        if code == 0xB8:
+            return self.invoke(pc, op.InvokeStatic)
+        if code == 0xB9:
+            return self.invoke(pc, op.InvokeInterface)
+        if code == 0xBB:
+            classname = self.pool.classname(self.u2(pc + 1))
+            return op.New(pc, jvm.ClassName.decode(classname))
+        if code == 0xBC:
+            if (tt := _ATYPES.get(self.code[pc + 1])) is None:
+                raise _unhandled(f"newarray of atype {self.code[pc + 1]}")
+            return op.NewArray(pc, tt, 1)
+        if code == 0xBD:
+            classname = self.pool.classname(self.u2(pc + 1))
+            if not classname.startswith("["):
+                raise _unhandled(f"anewarray of class {classname}")
+            return op.NewArray(pc, _type(classname)[0], 1)
+        if code == 0xBE:
+            return op.ArrayLength(pc)
+        if code == 0xBF:
+            return op.Throw(pc)
+        if code == 0xC4 and self.code[pc + 1] == 0x84:
+            return op.Incr(pc, self.u2(pc + 2), self.s2(pc + 4))
+        if code == 0xC4 and 0x15 <= self.code[pc + 1] <= 0x19:
+            return op.Load(pc, self.prefixed(self.code[pc + 1], 0x15), self.u2(pc + 2))
+        if code == 0xC4 and 0x36 <= self.code[pc + 1] <= 0x3A:
+            return op.Store(pc, self.prefixed(self.code[pc + 1], 0x36), self.u2(pc + 2))
+        if code == 0xC5:
+            descriptor = self.pool.classname(self.u2(pc + 1))
+            dim = self.code[pc + 3]
+            return op.NewArray(pc, _type(descriptor[dim:])[0], dim)
+        if code in (0xC6, 0xC7):
+            condition = "is" if code == 0xC6 else "isnot"
+            return op.Ifz(pc, condition, self.target(pc, self.s2(pc + 1)))
+        if code == 0xC8:
+            delta = struct.unpack_from(">i", self.code, pc + 1)[0]
+            return op.Goto(pc, self.target(pc, delta))
+        raise _unhandled(f"{code:#x}")
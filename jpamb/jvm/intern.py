@@ -0,0 +1,104 @@
+"""
+jpamb.jvm.intern
+
+This module contains an opt-in interning of decoded opcodes. Many
+instructions are the same except for their offset, so an 'Interner' stores
+each opcode once with offset 0, and an 'InternedMethod' is an array of
+offsets together with references to the shared opcodes.
+
+Interned opcodes can be compared with 'is' instead of '=='.
+
+"""
+
+from array import array
+from dataclasses import dataclass, replace
+import sys
+
+from jpamb.jvm.opcode import Opcode
+
+
+@dataclass(frozen=True)
+class InternedMethod:
+    """The opcodes of a method; 'payloads[i]' is the shared opcode of the
+    i-th instruction, and 'offsets[i]' its real offset."""
+
+    offsets: array
+    payloads: tuple[Opcode, ...]
+
+    def __len__(self):
+        return len(self.payloads)
+
+    def __getitem__(self, i: int) -> Opcode:
+        """Get the i-th opcode, with its real offset."""
+        return replace(self.payloads[i], offset=self.offsets[i])
+
+    def opcodes(self) -> tuple[Opcode, ...]:
+        return tuple(self[i] for i in range(len(self)))
+
+    def same_as(self, other: "InternedMethod") -> bool:
+        """Check if the methods have the same opcodes, given that they are
+        interned by the same 'Interner'."""
+        return len(self) == len(other) and all(
+            a is b for a, b in zip(self.payloads, other.payloads)
+        )
+
+
+class Interner:
+    """A table of shared opcodes."""
+
+    def __init__(self):
+        self.table: dict[Opcode, Opcode] = {}
+
+    def __len__(self):
+        return len(self.table)
+
+    def intern(self, opcode: Opcode) -> Opcode:
+        """The shared opcode equal to the opcode at offset 0."""
+        key = replace(opcode, offset=0) if opcode.offset != 0 else opcode
+        return self.table.setdefault(key, key)
+
+    def method(self, opcodes: tuple[Opcode, ...]) -> InternedMethod:
+        return InternedMethod(
+            array("i", [op.offset for op in opcodes]),
+            tuple(self.intern(op) for op in opcodes),
+        )
+
+
+def deep_sizeof(*objects, seen: set[int] | None = None) -> int:
+    """The memory used by the objects and all objects reachable from them,
+    counting shared objects once."""
+    seen = set() if seen is None else seen
+    size, todo = 0, list(objects)
+    while todo:
+        obj = todo.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, (str, bytes, int, float, bool, type(None), array)):
+            continue
+        if isinstance(obj, dict):
+            todo.extend(obj.keys())
+            todo.extend(obj.values())
+        elif isinstance(obj, (tuple, list, set, frozenset)):
+            todo.extend(obj)
+        if hasattr(obj, "__dict__"):
+            todo.append(vars(obj))
+        for slot in getattr(type(obj), "__slots__", ()):
+            if hasattr(obj, slot):
+                todo.append(getattr(obj, slot))
+    return size
+
+
+def memory_stats(methods: list[tuple[Opcode, ...]]) -> dict[str, int]:
+    """The memory used by the opcodes of the methods, with and without
+    interning."""
+    interner = Interner()
+    interned = [interner.method(opcodes) for opcodes in methods]
+    return {
+        "methods": len(methods),
+        "opcodes": sum(map(len, methods)),
+        "unique": len(interner),
+        "bytes": deep_sizeof(methods),
+        "interned bytes": deep_sizeof(interned),
+    }
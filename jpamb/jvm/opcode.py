@@ -9,15 +9,14 @@ each instruction.
 
 from dataclasses import dataclass, fields
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from functools import cache
 from typing import Self
 
 import enum
-import sys
-from loguru import logger
+import os
 from jpamb.jvm import base as jvm
 
-logger.add(sys.stderr, format="[{level}] {message}")
-
 
 @dataclass(frozen=True, order=True)
 class Opcode(ABC):
@@ -26,75 +25,40 @@ class Opcode(ABC):
     offset: int
 
     def __post_init__(self):
-        for f in fields(self):
-            v = getattr(self, f.name)
+        if VALIDATE:
+            self.validate()
+
+    def validate(self):
+        """Check that the fields have the expected types."""
+        for name, expected in _field_types(type(self)):
+            v = getattr(self, name)
             assert isinstance(
-                v, f.type
-            ), f"Expected {f.name!r} to be type {f.type}, but was {v!r}, in {self!r}"
+                v, expected
+            ), f"Expected {name!r} to be type {expected}, but was {v!r}, in {self!r}"
 
     @classmethod
     def from_json(cls, json: dict) -> "Opcode":
-        match json["opr"]:
-            case "push":
-                opr = Push
-            case "newarray":
-                opr = NewArray
-            case "dup":
-                opr = Dup
-            case "array_store":
-                opr = ArrayStore
-            case "array_load":
-                opr = ArrayLoad
-            case "binary":
-                opr = Binary
-            case "store":
-                opr = Store
-            case "load":
-                opr = Load
-            case "arraylength":
-                opr = ArrayLength
-            case "if":
-                opr = If
-            case "get":
-                opr = Get
-            case "ifz":
-                opr = Ifz
-            case "cast":
-                opr = Cast
-            case "new":
-                opr = New
-            case "throw":
-                opr = Throw
-            case "incr":
-                opr = Incr
-            case "goto":
-                opr = Goto
-            case "return":
-                opr = Return
-            case "invoke":
-                match json["access"]:
-                    case "virtual":
-                        opr = InvokeVirtual
-                    case "static":
-                        opr = InvokeStatic
-                    case "interface":
-                        opr = InvokeInterface
-                    case "special":
-                        opr = InvokeSpecial
-                    case access:
-                        raise NotImplementedError(
-                            f"Unhandled invoke access {access!r} (implement yourself)"
-                        )
-            case opr:
+        key = json["opr"]
+        if key == "invoke":
+            key = (key, json["access"])
+        try:
+            opr = OPERATIONS[key]
+        except KeyError:
+            if isinstance(key, tuple):
                 raise NotImplementedError(
-                    f"Unhandled opcode {opr!r} (implement yourself)"
-                )
+                    f"Unhandled invoke access {key[1]!r} (implement yourself)"
+                ) from None
+            raise NotImplementedError(
+                f"Unhandled opcode {key!r} (implement yourself)"
+            ) from None
         try:
             return opr.from_json(json)
         except NotImplementedError as e:
             raise NotImplementedError(f"Unhandled opcode {json!r}") from e
 
     def help(self):
+        from loguru import logger
+
         logger.warning("Instructions can be found at: " + self.url())
         if self.semantics():
             logger.debug(f"Semantics:\n {self.semantics()}")
@@ -113,6 +77,48 @@ class Opcode(ABC):
         )
 
 
+# Checking the types of the fields of every opcode is slow, so it is only
+# done when enabled, by 'checkhealth', the tests, or setting JPAMB_VALIDATE=1.
+VALIDATE = os.environ.get("JPAMB_VALIDATE", "") not in ("", "0")
+
+
+@contextmanager
+def validation(enabled: bool = True):
+    """Enable (or disable) the validation of opcodes in the context."""
+    global VALIDATE
+    old, VALIDATE = VALIDATE, enabled
+    try:
+        yield
+    finally:
+        VALIDATE = old
+
+
+@cache
+def _field_types(cls) -> tuple[tuple[str, type], ...]:
+    return tuple((f.name, f.type) for f in fields(cls))
+
+
+# The opcode classes by their "opr", or ("invoke", access) for invokes.
+OPERATIONS: dict[str | tuple[str, str], type[Opcode]] = {}
+
+
+def operation(opr: str, access: str | None = None):
+    """Register the decorated class as the decoder of the operation."""
+
+    def register(cls):
+        OPERATIONS[opr if access is None else (opr, access)] = cls
+        return cls
+
+    return register
+
+
+def decode_method(bytecode: list[dict]) -> tuple[Opcode, ...]:
+    """Decode the "bytecode" list of a method in the jvm2json output."""
+    decode = Opcode.from_json
+    return tuple([decode(op) for op in bytecode])
+
+
+@operation("push")
 @dataclass(frozen=True, order=True)
 class Push(Opcode):
     """The push opcode"""
@@ -177,6 +183,7 @@ class Push(Opcode):
         return f"push:{self.value.type} {self.value.value}"
 
 
+@operation("newarray")
 @dataclass(frozen=True, order=True)
 class NewArray(Opcode):
     """The new array opcode"""
@@ -216,6 +223,7 @@ class NewArray(Opcode):
         return f"newarray[{self.dim}D] {self.type}"
 
 
+@operation("dup")
 @dataclass(frozen=True, order=True)
 class Dup(Opcode):
     """The dublicate the stack opcode"""
@@ -251,6 +259,7 @@ class Dup(Opcode):
         return f"dup {self.words}"
 
 
+@operation("array_store")
 @dataclass(frozen=True, order=True)
 class ArrayStore(Opcode):
     """The Array Store command that stores a value in the array."""
@@ -283,6 +292,7 @@ class ArrayStore(Opcode):
         return f"array_store {self.type}"
 
 
+@operation("cast")
 @dataclass(frozen=True, order=True)
 class Cast(Opcode):
     """Cast one type to another"""
@@ -317,6 +327,7 @@ class Cast(Opcode):
         return f"cast {self.from_} {self.to_}"
 
 
+@operation("array_load")
 @dataclass(frozen=True, order=True)
 class ArrayLoad(Opcode):
     """The Array Load command that load a value from the array."""
@@ -351,6 +362,7 @@ class ArrayLoad(Opcode):
         return f"array_load:{self.type}"
 
 
+@operation("arraylength")
 @dataclass(frozen=True, order=True)
 class ArrayLength(Opcode):
     """
@@ -385,6 +397,7 @@ class ArrayLength(Opcode):
         return "arraylength"
 
 
+@operation("invoke", "virtual")
 @dataclass(frozen=True, order=True)  # make it work for
 class InvokeVirtual(Opcode):
     """The invoke virtual opcode for calling instance methods"""
@@ -420,6 +433,7 @@ class InvokeVirtual(Opcode):
         return f"invoke virtual {self.method}"
 
 
+@operation("invoke", "static")
 @dataclass(frozen=True, order=True)
 class InvokeStatic(Opcode):
     """The invoke static opcode for calling static methods"""
@@ -455,6 +469,7 @@ class InvokeStatic(Opcode):
         return f"invoke static {self.method}"
 
 
+@operation("invoke", "interface")
 @dataclass(frozen=True, order=True)
 class InvokeInterface(Opcode):
     """The invoke interface opcode for calling interface methods"""
@@ -493,6 +508,7 @@ class InvokeInterface(Opcode):
         return f"invoke interface {self.method} (stack_size={self.stack_size})"
 
 
+@operation("invoke", "special")
 @dataclass(frozen=True, order=True)
 class InvokeSpecial(Opcode):
     """The invoke special opcode for calling constructors, private methods,
@@ -543,6 +559,7 @@ class InvokeSpecial(Opcode):
         return f"invoke special{interface_str} {self.method}"
 
 
+@operation("store")
 @dataclass(frozen=True, order=True)
 class Store(Opcode):
     """The store opcode that stores values to local variables"""
@@ -611,6 +628,7 @@ class BinaryOpr(enum.Enum):
         return self.name.lower()
 
 
+@operation("binary")
 @dataclass(frozen=True, order=True)
 class Binary(Opcode):
     type: jvm.Type
@@ -648,6 +666,7 @@ class Binary(Opcode):
         return self.real()
 
 
+@operation("load")
 @dataclass(frozen=True, order=True)
 class Load(Opcode):
     """The load opcode that loads values from local variables"""
@@ -687,6 +706,7 @@ class Load(Opcode):
         return f"load:{self.type} {self.index}"
 
 
+@operation("if")
 @dataclass(frozen=True, order=True)
 class If(Opcode):
     """The if opcode that performs conditional jumps based on comparison of two values.
@@ -752,6 +772,7 @@ class If(Opcode):
         return f"if {self.condition} {self.target}"
 
 
+@operation("get")
 @dataclass(frozen=True, order=True)
 class Get(Opcode):
     """The get opcode that retrieves field values (static or instance).
@@ -813,6 +834,7 @@ class Get(Opcode):
         return f"get {kind} {self.field}"
 
 
+@operation("ifz")
 @dataclass(frozen=True, order=True)
 class Ifz(Opcode):
     """The ifz opcode that performs conditional jumps based on comparison with zero/null.
@@ -881,6 +903,7 @@ class Ifz(Opcode):
         return f"ifz {self.condition} {self.target}"
 
 
+@operation("new")
 @dataclass(frozen=True, order=True)
 class New(Opcode):
     """The new opcode that creates a new instance of a class.
@@ -920,6 +943,7 @@ class New(Opcode):
         return f"new {self.classname}"
 
 
+@operation("throw")
 @dataclass(frozen=True, order=True)
 class Throw(Opcode):
     """The throw opcode that throws an exception object.
@@ -957,6 +981,7 @@ class Throw(Opcode):
         return "throw"
 
 
+@operation("incr")
 @dataclass(frozen=True, order=True)
 class Incr(Opcode):
     """The increment opcode that adds a constant value to a local variable.
@@ -999,6 +1024,7 @@ class Incr(Opcode):
         return f"incr {self.index} by {self.amount}"
 
 
+@operation("goto")
 @dataclass(frozen=True, order=True)
 class Goto(Opcode):
     """The goto opcode that performs an unconditional jump.
@@ -1039,6 +1065,7 @@ class Goto(Opcode):
         return f"goto {self.target}"
 
 
+@operation("return")
 @dataclass(frozen=True, order=True)
 class Return(Opcode):
     """The return opcode that returns (with optional value) from a method.
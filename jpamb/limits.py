@@ -0,0 +1,146 @@
+"""
+jpamb.limits
+
+This module contains the resource limits of the children run by
+'jpamb.process', and a small wrapper which sets the limits and then runs the
+command. Setting the limits in the wrapper, instead of between fork and exec
+of the runner, is safe when the runner has threads.
+
+The wrapper is run with 'python -m jpamb.limits [--memory BYTES] [--cpu
+SECONDS] [--processes N] -- CMD...'. It execs the command, except for python
+scripts run with this python, which are run in the wrapper itself, so that
+a 'MemoryError' or a failed fork can be told apart by the exit code (see
+'MEMORY_EXIT' and 'PROCESSES_EXIT').
+
+"""
+
+from dataclasses import dataclass
+import os
+import signal
+import sys
+
+# The exit codes of a python child that ran out of memory, or could not
+# start a process.
+MEMORY_EXIT = 93
+PROCESSES_EXIT = 94
+
+
+@dataclass(frozen=True)
+class Limits:
+    """Resource limits of a child; None means no limit.
+
+    'memory' is the bytes of address space (RLIMIT_AS), 'cpu' the seconds of
+    cpu time (RLIMIT_CPU), and 'processes' the number of processes of the
+    user (RLIMIT_NPROC, which is not enforced for root).
+    """
+
+    memory: int | None = None
+    cpu: int | None = None
+    processes: int | None = None
+
+    def __bool__(self):
+        return any(v is not None for v in (self.memory, self.cpu, self.processes))
+
+    def apply(self):
+        """Set the limits of the current process."""
+        import resource
+
+        for rlimit, value in [
+            (resource.RLIMIT_AS, self.memory),
+            (resource.RLIMIT_CPU, self.cpu),
+            (resource.RLIMIT_NPROC, self.processes),
+        ]:
+            if value is not None:
+                # The hard cpu limit is a bit higher, so that the child gets
+                # a SIGXCPU before it is killed.
+                hard = value + 1 if rlimit == resource.RLIMIT_CPU else value
+                resource.setrlimit(rlimit, (value, hard))
+
+    def wrap(self, cmd: list[str]) -> list[str]:
+        """The command run under the limits by the wrapper."""
+        args = [sys.executable, "-m", "jpamb.limits"]
+        for name in ("memory", "cpu", "processes"):
+            if (value := getattr(self, name)) is not None:
+                args += [f"--{name}", str(value)]
+        return args + ["--", *map(str, cmd)]
+
+    def exceeded(self, returncode: int) -> str | None:
+        """Guess which limit, if any, made the child fail, from its exit code.
+
+        Native children that run out of memory are expected to crash with a
+        SIGSEGV or a SIGABRT."""
+        if self.cpu is not None and returncode in (-signal.SIGXCPU, -signal.SIGKILL):
+            return "cpu"
+        if self.memory is not None and returncode in (
+            MEMORY_EXIT,
+            -signal.SIGSEGV,
+            -signal.SIGABRT,
+        ):
+            return "memory"
+        if self.processes is not None and returncode == PROCESSES_EXIT:
+            return "processes"
+        return None
+
+
+def exitcode(e: BaseException) -> int:
+    """The exit code of a python child that failed with the exception."""
+    if isinstance(e, MemoryError):
+        return MEMORY_EXIT
+    if isinstance(e, BlockingIOError):
+        return PROCESSES_EXIT
+    return 1
+
+
+def is_script(cmd: list[str]) -> bool:
+    """Check that the command runs a python script with this python."""
+    if len(cmd) < 2 or not str(cmd[1]).endswith(".py"):
+        return False
+    return os.path.abspath(cmd[0]) == os.path.abspath(sys.executable)
+
+
+def _run_script(argv: list[str]):
+    import runpy
+    import traceback
+
+    script, *_ = sys.argv = argv
+    path = os.path.abspath(script)
+    sys.path[0] = os.path.dirname(path)
+    try:
+        runpy.run_path(path, run_name="__main__")
+    except SystemExit:
+        raise
+    except BaseException as e:
+        # Leave out the frames of the wrapper, like a fresh interpreter.
+        tb = e.__traceback__
+        while tb is not None and tb.tb_frame.f_code.co_filename != path:
+            tb = tb.tb_next
+        traceback.print_exception(type(e), e, tb)
+        sys.exit(exitcode(e))
+
+
+def main(argv: list[str]):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="jpamb.limits")
+    parser.add_argument("--memory", type=int)
+    parser.add_argument("--cpu", type=int)
+    parser.add_argument("--processes", type=int)
+    parser.add_argument("cmd", nargs=argparse.REMAINDER)
+    args = parser.parse_args(argv)
+    cmd = args.cmd[1:] if args.cmd[:1] == ["--"] else args.cmd
+    if not cmd:
+        parser.error("expected a command")
+
+    Limits(args.memory, args.cpu, args.processes).apply()
+    if is_script(cmd):
+        _run_script(cmd[1:])
+        return
+    try:
+        os.execvp(cmd[0], cmd)
+    except OSError as e:
+        print(f"jpamb.limits: {cmd[0]}: {e.strerror}", file=sys.stderr)
+        sys.exit(127)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
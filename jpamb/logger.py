@@ -44,73 +44,17 @@ def summary64(cmd):
 
 def run_cmd(cmd: list[str], /, timeout, logger, **kwargs):
     import shlex
-    import threading
-    from time import monotonic, perf_counter_ns
+    from jpamb import process
 
     logger = logger.bind(process=summary64(cmd))
-    cp = None
-    stdout = []
-    stderr = []
-    tout = None
+    logger.debug(f"starting: {shlex.join(map(str, cmd))}")
     try:
-        start = monotonic()
-        start_ns = perf_counter_ns()
-
-        if timeout:
-            end = start + timeout
-        else:
-            end = None
-
-        logger.debug(f"starting: {shlex.join(map(str, cmd))}")
-
-        cp = subprocess.Popen(
-            cmd, stderr=subprocess.PIPE, stdout=subprocess.PIPE, text=True, **kwargs
-        )
-        assert cp and cp.stdout and cp.stderr
-
-        def log_lines(cp):
-            assert cp.stderr
-            with cp.stderr:
-                for line in iter(cp.stderr.readline, ""):
-                    stderr.append(line)
-                    logger.debug(line[:-1])
-
-        def save_result(cp):
-            assert cp.stdout
-            with cp.stdout:
-                stdout.append(cp.stdout.read())
-
-        terr = threading.Thread(target=log_lines, args=(cp,), daemon=True)
-        terr.start()
-        tout = threading.Thread(target=save_result, args=(cp,), daemon=True)
-        tout.start()
-
-        terr.join(end and end - monotonic())
-        tout.join(end and end - monotonic())
-        exitcode = cp.wait(end and end - monotonic())
-        end_ns = perf_counter_ns()
-
-        if exitcode != 0:
-            raise subprocess.CalledProcessError(
-                cmd=cmd,
-                returncode=exitcode,
-                stderr="\n".join(stderr),
-                output=stdout[0].strip(),
-            )
-
-        logger.debug("done")
-        return (stdout[0].strip(), end_ns - start_ns)
+        out, ns = process.run(cmd, timeout, logerr=logger.debug, **kwargs)
     except subprocess.CalledProcessError as e:
-        if tout:
-            tout.join()
-        e.stdout = stdout[0].strip()
+        e.stdout = e.stdout.strip()
         raise e
     except subprocess.TimeoutExpired:
-        logger.debug("process timed out, terminating")
-        if cp:
-            cp.terminate()
-            if cp.stdout:
-                cp.stdout.close()
-            if cp.stderr:
-                cp.stderr.close()
+        logger.debug("process timed out, terminated")
         raise
+    logger.debug("done")
+    return (out.strip(), ns)
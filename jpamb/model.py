@@ -8,9 +8,9 @@ This module provides the basic data model for working with the JPAMB.
 from contextlib import contextmanager
 from dataclasses import dataclass
 from pathlib import Path
-from loguru import logger
 import collections
 from collections import defaultdict
+import os
 import re
 
 from typing import Iterable
@@ -18,6 +18,11 @@ from typing import Iterable
 from jpamb import jvm
 from jpamb import timer
 
+# Where 'Suite.method_opcodes' reads the bytecode of methods from: the
+# "decompiled" output of jvm2json, or the "classfiles" themselves (see
+# 'jvm.classfile'). Set with JPAMB_OPCODES.
+OPCODES = os.environ.get("JPAMB_OPCODES", "decompiled")
+
 
 @dataclass(frozen=True, order=True)
 class Input:
@@ -34,6 +39,18 @@ class Input:
         values = jvm.Value.decode_many(input)
         return Input(tuple(values))
 
+    @staticmethod
+    def decode_many(inputs: Iterable[str]) -> list["Input"]:
+        """Decode many inputs, like the inputs of a case file, decoding each
+        distinct input only once."""
+        decoded: dict[str, Input] = {}
+        result = []
+        for input in inputs:
+            if (value := decoded.get(input)) is None:
+                value = decoded[input] = Input.decode(input)
+            result.append(value)
+        return result
+
     def encode(self) -> str:
         return "(" + ", ".join(v.encode() for v in self.values) + ")"
 
@@ -88,6 +105,8 @@ class Case:
 @contextmanager
 def _check(reason, failfast=False):
     """Used in the checkhealth command"""
+    from loguru import logger
+
     logger.info(reason)
     try:
         yield
@@ -194,6 +213,8 @@ class Response:
 
     @staticmethod
     def parse(out):
+        from loguru import logger
+
         predictions = {}
         for line in out.splitlines():
             try:
@@ -241,6 +262,19 @@ class Suite:
     def invalidate_cache(self):
         """Invalidate the case, and require a recomputation of the cached values."""
         self._cases = None
+        self._decompiled = {}
+        self._classfiles = {}
+
+    def preload(self):
+        """Read the cases and the decompiled classes ahead of time, which
+        processes forked from this one then share."""
+        self.cases
+        for cn in self.classes():
+            if OPCODES == "classfiles":
+                self.findclassfile(cn)
+                continue
+            with open(self.decompiledfile(cn), "rb") as fp:
+                self._decompiled[cn] = fp.read()
 
     @property
     def stats_folder(self) -> Path:
@@ -288,9 +322,17 @@ class Suite:
     def findclass(self, cn: jvm.ClassName) -> dict:
         import json
 
+        if (data := self._decompiled.get(cn)) is not None:
+            return json.loads(data)
         with open(self.decompiledfile(cn)) as fp:
             return json.load(fp)
 
+    def findclassfile(self, cn: jvm.ClassName) -> "jvm.ClassFile":
+        """The class file of the class, read once."""
+        if (cf := self._classfiles.get(cn)) is None:
+            cf = self._classfiles[cn] = jvm.ClassFile.read(self.classfile(cn))
+        return cf
+
     def findmethod(self, methodid: jvm.Absolute[jvm.MethodID]) -> jvm:
         methods = self.findclass(methodid.classname)["methods"]
         for method in methods:
@@ -307,9 +349,35 @@ class Suite:
             raise IndexError(f"Could not find {methodid}")
         return method
 
-    def method_opcodes(self, method: jvm.Absolute[jvm.MethodID]) -> list[jvm.Opcode]:
-        for op in self.findmethod(method)["code"]["bytecode"]:
-            yield jvm.Opcode.from_json(op)
+    def method_opcodes(
+        self, method: jvm.Absolute[jvm.MethodID], source: str | None = None
+    ) -> tuple["jvm.Opcode", ...]:
+        """The opcodes of the method, read from 'source', which defaults to
+        'OPCODES'."""
+        if (source or OPCODES) == "classfiles":
+            cf = self.findclassfile(method.classname)
+            return cf.method(method.extension).opcodes()
+        return jvm.decode_method(self.findmethod(method)["code"]["bytecode"])
+
+    def all_opcodes(self) -> Iterable[tuple[str, tuple["jvm.Opcode", ...]]]:
+        """The opcodes of every method in the decompiled classes that can be
+        decoded, by the name of the method."""
+        for cn in self.classes():
+            for method in self.findclass(cn)["methods"]:
+                if not method["code"]:
+                    continue
+                try:
+                    opcodes = jvm.decode_method(method["code"]["bytecode"])
+                except NotImplementedError:
+                    continue
+                yield f"{cn.dotted()}.{method['name']}", opcodes
+
+    def opcode_memory(self) -> dict[str, int]:
+        """The memory used by the opcodes of all methods, with and without
+        interning (see 'jvm.intern')."""
+        from jpamb.jvm.intern import memory_stats
+
+        return memory_stats([opcodes for _, opcodes in self.all_opcodes()])
 
     def classes(self) -> Iterable[jvm.ClassName]:
         for file in self.classfiles():
@@ -332,7 +400,12 @@ class Suite:
     def cases(self) -> tuple[Case, ...]:
         if self._cases is None:
             with open(self.case_file) as f:
-                self._cases = tuple(Case.decode(line) for line in f)
+                matches = [Case.match(line) for line in f]
+            inputs = Input.decode_many(m.group(2) for m in matches)
+            self._cases = tuple(
+                Case(jvm.AbsMethodID.decode(m.group(1)), input, m.group(3))
+                for m, input in zip(matches, inputs)
+            )
         return self._cases
 
     def case_methods(self) -> Iterable[tuple[jvm.Absolute[jvm.MethodID], set[str]]]:
@@ -343,12 +416,13 @@ class Suite:
 
         return methods.items()
 
-    def case_opcodes(self) -> list[jvm.Opcode]:
+    def case_opcodes(self) -> list["jvm.Opcode"]:
         for m, _ in self.case_methods():
             yield from self.method_opcodes(m)
 
     def checkhealth(self, failfast=False):
         """Checks the health of the repository through a sequence of tests"""
+        from loguru import logger
 
         def check(msg):
             return _check(msg, failfast)
@@ -391,7 +465,9 @@ class Suite:
         for method, _ in self.case_methods():
             with check(f"The method: [{method}]"):
                 try:
-                    for opr in self.method_opcodes(method):
+                    with jvm.validation():
+                        opcodes = self.method_opcodes(method)
+                    for opr in opcodes:
                         str(opr)
                         str(opr.real())
                 except NotImplementedError as e:
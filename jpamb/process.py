@@ -0,0 +1,318 @@
+"""
+jpamb.process
+
+This module contains the runner of subprocesses used by the cli and the
+logger. It runs the processes with asyncio, so that many children can be
+run at once on one event loop, instead of using two threads per child to
+read stdout and stderr.
+
+Each child is started in its own session, and so its own process group, so
+that it can be stopped together with any processes it started itself. The
+child can be run under resource limits (see 'jpamb.limits'). Children are
+reaped with 'os.wait4', so that the resources they used are known (see
+'Usage'); the processes left in the group of a child are killed before it is
+reaped, while its pid can not be reused.
+
+Python scripts can be run by a fork server instead (see 'FORKSERVER').
+
+"""
+
+import asyncio
+import contextlib
+from dataclasses import dataclass
+import os
+import signal
+import subprocess
+import sys
+import threading
+import weakref
+from time import perf_counter_ns
+from typing import Callable, Iterable, TYPE_CHECKING
+
+from jpamb import timeline
+from jpamb.limits import Limits
+
+if TYPE_CHECKING:
+    from jpamb.forkserver import ForkServer
+
+# The seconds between asking a process group to terminate and killing it.
+DEFAULT_GRACE = 0.5
+
+
+# The limits used when none are given, set by the cli.
+LIMITS = Limits()
+
+# The fork server to run python scripts with, if any, set by the cli; see
+# 'jpamb.forkserver'.
+FORKSERVER: "ForkServer | None" = None
+
+
+class LimitExceeded(subprocess.CalledProcessError):
+    """A child failed because it exceeded one of its 'Limits'."""
+
+    def __init__(self, limit: str, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.limit = limit
+
+    def __str__(self):
+        return f"Command '{self.cmd}' exceeded its {self.limit} limit."
+
+
+@dataclass(frozen=True)
+class Usage:
+    """The resources used by a child, as reported by 'os.wait4'.
+
+    'user' and 'system' are seconds of cpu time, and 'max_rss' is the peak
+    resident memory in bytes.
+    """
+
+    user: float
+    system: float
+    max_rss: int
+    voluntary_switches: int
+    involuntary_switches: int
+
+    @staticmethod
+    def from_rusage(ru) -> "Usage":
+        # ru_maxrss is in kilobytes on Linux, but bytes on macOS.
+        scale = 1 if sys.platform == "darwin" else 1024
+        return Usage(
+            user=ru.ru_utime,
+            system=ru.ru_stime,
+            max_rss=ru.ru_maxrss * scale,
+            voluntary_switches=ru.ru_nvcsw,
+            involuntary_switches=ru.ru_nivcsw,
+        )
+
+
+class _Reaper:
+    """Waits for the children of an event loop with 'os.wait4', to get their
+    resource usage, which asyncio's own child watchers throw away.
+
+    Children are reaped when a pidfd of the child becomes readable, where
+    there are pidfds, or else on SIGCHLD. Outside the main thread, where the
+    loop cannot handle signals, a thread blocks in 'os.waitid' until the
+    child exits, so that the time of the child does not depend on the
+    thread running it.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.waiting: dict[int, asyncio.Future] = {}
+        self.signals = False
+
+    def wait(self, pid: int) -> asyncio.Future:
+        """A future of the exit code and 'Usage' of the child."""
+        future = self.waiting[pid] = self.loop.create_future()
+        if hasattr(os, "pidfd_open"):
+            fd = os.pidfd_open(pid)
+            self.loop.add_reader(fd, self.exited, fd)
+            return future
+        if threading.current_thread() is not threading.main_thread():
+            threading.Thread(target=self.block, args=(pid,), daemon=True).start()
+            return future
+        if not self.signals:
+            self.loop.add_signal_handler(signal.SIGCHLD, self.reap)
+            self.signals = True
+        self.reap()
+        return future
+
+    def exited(self, fd: int):
+        self.loop.remove_reader(fd)
+        os.close(fd)
+        self.reap()
+
+    def block(self, pid: int):
+        """Wait for the child to exit, without reaping it."""
+        with contextlib.suppress(ChildProcessError):
+            os.waitid(os.P_PID, pid, os.WEXITED | os.WNOWAIT)
+        self.loop.call_soon_threadsafe(self.reap)
+
+    def reap(self):
+        for pid, future in list(self.waiting.items()):
+            try:
+                if not os.waitid(os.P_PID, pid, os.WEXITED | os.WNOHANG | os.WNOWAIT):
+                    continue
+                # Leftover processes may keep the pipes open; they are killed
+                # while the group of the unreaped child can not be reused.
+                _signal_group(pid, signal.SIGKILL)
+                _, status, ru = os.wait4(pid, 0)
+            except ChildProcessError:
+                status, ru = 255 << 8, None
+            del self.waiting[pid]
+            usage = Usage.from_rusage(ru) if ru is not None else None
+            future.set_result((os.waitstatus_to_exitcode(status), usage))
+        if not self.waiting and self.signals:
+            self.loop.remove_signal_handler(signal.SIGCHLD)
+            self.signals = False
+
+
+_REAPERS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _Reaper]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _reaper() -> _Reaper:
+    loop = asyncio.get_running_loop()
+    if (reaper := _REAPERS.get(loop)) is None:
+        reaper = _REAPERS[loop] = _Reaper(loop)
+    return reaper
+
+
+def _ignore(line: str):
+    pass
+
+
+async def _lines(pipe, lines: list[str], log):
+    loop = asyncio.get_running_loop()
+    stream = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(stream), pipe)
+    while line := await stream.readline():
+        text = line.decode(errors="replace")
+        lines.append(text)
+        log(text.rstrip("\n"))
+
+
+def _signal_group(pgid: int, sig: int):
+    with contextlib.suppress(ProcessLookupError, PermissionError):
+        os.killpg(pgid, sig)
+
+
+async def stop(pid: int, exited: asyncio.Future, grace: float = DEFAULT_GRACE):
+    """Stop the process group of the child: terminate it, and kill it if it
+    is still running after 'grace' seconds."""
+    _signal_group(pid, signal.SIGTERM)
+    with contextlib.suppress(TimeoutError):
+        await asyncio.wait_for(asyncio.shield(exited), grace)
+    if not exited.done():
+        _signal_group(pid, signal.SIGKILL)
+    await exited
+
+
+async def measure_async(
+    cmd: list[str],
+    /,
+    timeout: float | None = 2.0,
+    logout: Callable[[str], None] | None = None,
+    logerr: Callable[[str], None] | None = None,
+    limits: Limits | None = None,
+    grace: float = DEFAULT_GRACE,
+    **kwargs,
+) -> tuple[str, int, Usage]:
+    """Run the command and return its stdout, the nanoseconds it took, and
+    the resources it used.
+
+    Raises 'subprocess.CalledProcessError' if the command fails, or
+    'LimitExceeded' if it failed because of its limits. Raises
+    'subprocess.TimeoutExpired' if it takes longer than 'timeout' seconds,
+    after stopping its process group. Processes left in the group when the
+    command exits are killed. The lines of stdout and stderr are given to
+    'logout' and 'logerr' as they are read.
+    """
+    span = timeline.span("subprocess", "process", cmd=[str(c) for c in cmd])
+    with span:
+        return await _measure(
+            cmd, timeout, logout, logerr, limits, grace, span, **kwargs
+        )
+
+
+async def _measure(cmd, timeout, logout, logerr, limits, grace, span, **kwargs):
+    limits = LIMITS if limits is None else limits
+    stdout: list[str] = []
+    stderr: list[str] = []
+    start_ns = perf_counter_ns()
+    if FORKSERVER is not None and not kwargs and FORKSERVER.accepts(cmd):
+        cp = None
+        (out_r, out_w), (err_r, err_w) = os.pipe(), os.pipe()
+        try:
+            with timeline.span("spawn", "process", forkserver=True):
+                pid, exited = await FORKSERVER.spawn(cmd, out_w, err_w, limits)
+        finally:
+            os.close(out_w)
+            os.close(err_w)
+        pipes = (open(out_r, "rb", buffering=0), open(err_r, "rb", buffering=0))
+    else:
+        with timeline.span("spawn", "process", forkserver=False):
+            cp = subprocess.Popen(
+                limits.wrap(cmd) if limits else cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                start_new_session=True,
+                **kwargs,
+            )
+        pid, exited = cp.pid, _reaper().wait(cp.pid)
+        pipes = (cp.stdout, cp.stderr)
+    span.annotate(pid=pid)
+    readers = asyncio.gather(
+        _lines(pipes[0], stdout, logout or _ignore),
+        _lines(pipes[1], stderr, logerr or _ignore),
+    )
+    try:
+        async with asyncio.timeout(timeout):
+            exitcode, usage = await asyncio.shield(exited)
+            end_ns = perf_counter_ns()
+            await readers
+    except TimeoutError:
+        await stop(pid, exited, grace)
+        readers.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await readers
+        raise subprocess.TimeoutExpired(
+            cmd, timeout, output="".join(stdout), stderr="".join(stderr)
+        ) from None
+    finally:
+        # The child is reaped by us, so Popen should not wait for it.
+        if cp is not None:
+            cp.returncode = exited.result()[0] if exited.done() else -1
+
+    span.annotate(exitcode=exitcode, user=usage.user, max_rss=usage.max_rss)
+    if exitcode != 0:
+        error = "".join(stderr)
+        if limit := limits.exceeded(exitcode):
+            raise LimitExceeded(
+                limit, exitcode, cmd, output="".join(stdout), stderr=error
+            )
+        raise subprocess.CalledProcessError(
+            cmd=cmd,
+            returncode=exitcode,
+            stderr=error,
+            output="".join(stdout),
+        )
+    return ("".join(stdout), end_ns - start_ns, usage)
+
+
+async def run_async(cmd: list[str], /, *args, **kwargs) -> tuple[str, int]:
+    """Run the command and return its stdout and the nanoseconds it took,
+    see 'measure_async'."""
+    out, ns, _ = await measure_async(cmd, *args, **kwargs)
+    return (out, ns)
+
+
+def run(cmd: list[str], /, timeout=2.0, logout=None, logerr=None, **kwargs):
+    """Run a single command, see 'run_async'."""
+    return asyncio.run(run_async(cmd, timeout, logout, logerr, **kwargs))
+
+
+def measure(cmd: list[str], /, timeout=2.0, logout=None, logerr=None, **kwargs):
+    """Run a single command, see 'measure_async'."""
+    return asyncio.run(measure_async(cmd, timeout, logout, logerr, **kwargs))
+
+
+def run_many(
+    cmds: Iterable[list[str]], /, jobs: int = 8, timeout=2.0, **kwargs
+) -> list[tuple[str, int] | Exception]:
+    """Run the commands, at most 'jobs' at a time, on one event loop.
+
+    Returns the result of each command, or the exception it raised.
+    """
+
+    async def main():
+        limit = asyncio.Semaphore(jobs)
+
+        async def one(cmd):
+            async with limit:
+                return await run_async(cmd, timeout, **kwargs)
+
+        return await asyncio.gather(*(one(cmd) for cmd in cmds), return_exceptions=True)
+
+    return asyncio.run(main())
@@ -0,0 +1,182 @@
+"""
+jpamb.profiling
+
+This module contains the profiling of analyzers written in python, used by
+'test' and 'evaluate' with '--profile'. Each run of the analyzer is started
+with 'python -m jpamb.profiling', which runs its script under a profiler and
+saves the profile as a '.pstats' file, to be read with 'pstats' or tools
+like snakeviz.
+
+There are two profilers: 'cprofile', which counts every call but slows the
+analyzer down, and 'sampling', which looks at the stack of the analyzer
+every few milliseconds from another thread. The sampling profiler barely
+changes the running time, but its call counts are the number of samples a
+function was seen in.
+
+"""
+
+import marshal
+import os
+from pathlib import Path
+import pstats
+import re
+import runpy
+import sys
+import threading
+
+MODES = ("cprofile", "sampling")
+
+# The seconds between samples; python switches threads every 5ms, so
+# sampling more often gains little.
+INTERVAL = 0.005
+
+
+def is_python(cmd) -> bool:
+    """Check that the command runs a python script with this python."""
+    if len(cmd) < 2 or not str(cmd[1]).endswith(".py"):
+        return False
+    return os.path.abspath(cmd[0]) == os.path.abspath(sys.executable)
+
+
+def command(cmd, path: Path, mode: str = "cprofile") -> tuple:
+    """The command running the python script of 'cmd' under the profiler,
+    which saves the profile to 'path'."""
+    python, *rest = cmd
+    return (python, "-m", "jpamb.profiling", "--mode", mode, "--out", str(path), *rest)
+
+
+def filename(methodid, run: int | None = None) -> str:
+    """The name of the profile of a method, or of one of its runs."""
+    name = re.sub(r"[^\w.-]+", "_", str(methodid))
+    return f"{name}.pstats" if run is None else f"{name}.{run}.pstats"
+
+
+def _key(code) -> tuple[str, int, str]:
+    return (code.co_filename, code.co_firstlineno, code.co_name)
+
+
+class StackSampler:
+    """Samples the stack of a thread from a background thread, and keeps
+    the samples in the format of 'pstats'."""
+
+    def __init__(self, thread: int, interval: float = INTERVAL, skip=()):
+        self.target = thread
+        self.interval = interval
+        self.skip = set(skip)
+        self.own: dict[tuple, int] = {}
+        self.total: dict[tuple, int] = {}
+        self.callers: dict[tuple, dict[tuple, int]] = {}
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._sample, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def _sample(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            stack = []
+            while frame is not None:
+                if frame.f_code.co_filename not in self.skip:
+                    stack.append(_key(frame.f_code))
+                frame = frame.f_back
+            if not stack:
+                continue
+            self.own[stack[0]] = self.own.get(stack[0], 0) + 1
+            for key in set(stack):
+                self.total[key] = self.total.get(key, 0) + 1
+            for callee, caller in set(zip(stack, stack[1:])):
+                callers = self.callers.setdefault(callee, {})
+                callers[caller] = callers.get(caller, 0) + 1
+
+    def stats(self) -> dict:
+        """The samples as the statistics of 'pstats'."""
+        dt = self.interval
+        stats = {}
+        for key, total in self.total.items():
+            callers = {
+                caller: (n, n, 0.0, n * dt)
+                for caller, n in self.callers.get(key, {}).items()
+            }
+            stats[key] = (total, total, self.own.get(key, 0) * dt, total * dt, callers)
+        return stats
+
+
+def merge(paths: list[Path], out: Path):
+    """Merge the profiles into one, and remove them; runs that were killed
+    have no profile."""
+    paths = [Path(p) for p in paths if Path(p).exists()]
+    if not paths:
+        return
+    pstats.Stats(*map(str, paths)).dump_stats(out)
+    for path in paths:
+        if path != Path(out):
+            path.unlink()
+
+
+def table(paths: list[Path], top: int = 20) -> str:
+    """The 'top' functions that took the most time themselves, over all the
+    profiles."""
+    paths = [str(p) for p in paths if Path(p).exists()]
+    if not paths:
+        return "No profiles"
+    stats = pstats.Stats(*paths).stats
+    rows = sorted(stats.items(), key=lambda kv: kv[1][2], reverse=True)[:top]
+    lines = [f"{'ncalls':>9} {'tottime':>9} {'cumtime':>9}  function"]
+    for (file, line, name), (_, nc, tt, ct, _) in rows:
+        if file != "~":
+            try:
+                file = os.path.relpath(file)
+            except ValueError:
+                pass
+            name = f"{file}:{line}({name})"
+        lines.append(f"{nc:>9} {tt:>9.3f} {ct:>9.3f}  {name}")
+    return "\n".join(lines)
+
+
+def run(script: str, out: Path, mode: str = "cprofile"):
+    """Run the script as __main__ under the profiler, and save the profile,
+    also when the script exits or raises."""
+    path = os.path.abspath(script)
+    sys.path[0] = os.path.dirname(path)
+    if mode == "cprofile":
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            runpy.run_path(path, run_name="__main__")
+        finally:
+            profiler.disable()
+            profiler.dump_stats(out)
+    else:
+        sampler = StackSampler(threading.get_ident(), skip={__file__, runpy.__file__})
+        sampler.start()
+        try:
+            runpy.run_path(path, run_name="__main__")
+        finally:
+            sampler.stop()
+            with open(out, "wb") as fp:
+                marshal.dump(sampler.stats(), fp)
+
+
+def main(argv: list[str]):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="jpamb.profiling")
+    parser.add_argument("--mode", choices=MODES, default="cprofile")
+    parser.add_argument("--out", type=Path, required=True)
+    parser.add_argument("script")
+    parser.add_argument("args", nargs=argparse.REMAINDER)
+    args = parser.parse_args(argv)
+
+    sys.argv = [args.script, *args.args]
+    run(args.script, args.out, args.mode)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,213 @@
+"""
+jpamb.report
+
+This module contains the reports of 'evaluate'. While evaluating, the
+results are streamed to a checkpoint file in JSON Lines, one record per
+line, so that an interrupted evaluation can be resumed. When all methods
+are done, the records are finalized into the report.
+
+The records are:
+
+    {"kind": "info", "info": {...}}
+    {"kind": "iteration", "method": "...", "result": {...}}
+    {"kind": "method", "method": "...", "summary": {...}}
+
+"""
+
+import dataclasses
+from dataclasses import dataclass, field
+import json
+import operator
+import os
+from pathlib import Path
+import threading
+from typing import IO, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from jpamb.calibration import Calibration
+
+# How the resource usage of runs is combined in the report: the cpu times and
+# context switches are averaged like the time, and the peak memory is the
+# maximum.
+USAGE = {
+    "user": operator.add,
+    "system": operator.add,
+    "max_rss": max,
+    "voluntary_switches": operator.add,
+    "involuntary_switches": operator.add,
+}
+
+
+@dataclass
+class Checkpoint:
+    """The records of an evaluation, read from a checkpoint file."""
+
+    info: dict | None = None
+    methods: dict[str, dict] = field(default_factory=dict)
+    iterations: dict[str, list[dict]] = field(default_factory=dict)
+
+    def add(self, record: dict):
+        match record["kind"]:
+            case "info":
+                self.info = record["info"]
+            case "iteration":
+                self.iterations.setdefault(record["method"], []).append(
+                    record["result"]
+                )
+            case "method":
+                self.methods[record["method"]] = record["summary"]
+            case kind:
+                raise ValueError(f"Unknown checkpoint record {kind!r}")
+
+    @staticmethod
+    def read(path: Path) -> "Checkpoint":
+        """Read the checkpoint, ignoring a last line that was cut short."""
+        checkpoint = Checkpoint()
+        with open(path) as fp:
+            lines = fp.read().split("\n")
+        for i, line in enumerate(lines):
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                if i == len(lines) - 1:
+                    break
+                raise ValueError(f"{path}:{i + 1}: malformed checkpoint record")
+            checkpoint.add(record)
+        return checkpoint
+
+    def results(self, method: str) -> list[dict]:
+        """The results of the iterations of an unfinished method."""
+        return list(self.iterations.get(method, []))
+
+
+class CheckpointWriter:
+    """Appends records to a checkpoint file, one line at a time; it can be
+    shared between threads."""
+
+    def __init__(self, fp: IO):
+        self.fp = fp
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def open(path: Path, resume: bool = False) -> "CheckpointWriter":
+        if resume and path.exists():
+            # Drop the last record if it was cut short.
+            with open(path, "r+b") as fp:
+                data = fp.read()
+                fp.truncate(data.rfind(b"\n") + 1)
+        return CheckpointWriter(open(path, "a" if resume else "w"))
+
+    def write(self, kind: str, sync: bool = False, **fields):
+        line = json.dumps({"kind": kind, **fields}) + "\n"
+        with self.lock:
+            self.fp.write(line)
+            self.fp.flush()
+            if sync:
+                os.fsync(self.fp.fileno())
+
+    def info(self, info: dict):
+        self.write("info", info=info, sync=True)
+
+    def iteration(self, method: str, result: dict):
+        self.write("iteration", method=method, result=result)
+
+    def method(self, method: str, summary: dict):
+        self.write("method", method=method, summary=summary, sync=True)
+
+    def close(self):
+        self.fp.close()
+
+
+def summarize_method(results: list[dict], statistics: dict | None = None) -> dict:
+    """The summary of a method from the results of its iterations; runs
+    that exceeded a limit or timed out are recorded, but not averaged."""
+    completed = [r for r in results if "score" in r]
+    n = max(len(completed), 1)
+    summary = {
+        "score": sum(r["score"] for r in completed) / n,
+        "time": sum(r["time"] for r in completed) / n,
+        "relative": sum(r["relative"] for r in completed) / n,
+    }
+    for k, combine in USAGE.items():
+        values = [r[k] for r in completed]
+        if combine is max:
+            summary[k] = max(values, default=0)
+        else:
+            summary[k] = sum(values) / n
+    if statistics is not None:
+        summary["statistics"] = statistics
+    summary["iterations"] = results
+    return summary
+
+
+def finalize(
+    info: dict | None,
+    bymethod: dict[str, dict],
+    calibration: "Calibration | None" = None,
+    profile: str = "python",
+) -> dict:
+    """The report of an evaluation from the summaries of its methods, and
+    the calibration of the machine their times are relative to."""
+    n = max(len(bymethod), 1)
+    report = {
+        "info": info,
+        "bymethod": bymethod,
+        "score": sum(m["score"] for m in bymethod.values()),
+        "time": sum(m["time"] for m in bymethod.values()) / n,
+        "relative": sum(m["relative"] for m in bymethod.values()) / n,
+    }
+    for k, combine in USAGE.items():
+        values = [m[k] for m in bymethod.values()]
+        if combine is max:
+            report[k] = max(values, default=0)
+        else:
+            report[k] = sum(values) / n
+    if calibration is not None:
+        report["calibration"] = {
+            "profile": profile,
+            "composite": calibration.composite(profile),
+            **dataclasses.asdict(calibration),
+        }
+    return report
+
+
+def merge(reports: dict[str, dict], methods: list[str]) -> dict:
+    """Merge the reports of the shards of an evaluation, by their names.
+
+    The shards must be of the same analyzer, and together cover each of the
+    'methods' exactly once. The 'system' of the analyzer may differ between
+    shards; the merged report has the first one. The calibration is kept if
+    it is the same for every shard, and is otherwise the list of the
+    calibrations of the shards.
+    """
+    if not reports:
+        raise ValueError("Expected at least one report")
+
+    def analyzer(info):
+        return {k: v for k, v in (info or {}).items() if k != "system"}
+
+    (first, info), *rest = ((name, r.get("info")) for name, r in reports.items())
+    for name, other in rest:
+        if analyzer(other) != analyzer(info):
+            raise ValueError(f"{name} is of another analyzer than {first}")
+
+    found: dict[str, str] = {}
+    for name, r in reports.items():
+        for method in r["bymethod"]:
+            if method in found:
+                raise ValueError(f"{method} is in both {found[method]} and {name}")
+            found[method] = name
+    if unknown := set(found) - set(methods):
+        raise ValueError(f"{found[min(unknown)]} has unknown method {min(unknown)}")
+    if missing := [m for m in methods if m not in found]:
+        raise ValueError(f"No report has {missing[0]} ({len(missing)} missing)")
+
+    bymethod = {m: reports[found[m]]["bymethod"][m] for m in methods}
+    merged = finalize(info, bymethod)
+    calibrations = [r["calibration"] for r in reports.values() if "calibration" in r]
+    if calibrations:
+        same = all(c == calibrations[0] for c in calibrations)
+        merged["calibration"] = calibrations[0] if same else calibrations
+    return merged
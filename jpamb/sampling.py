@@ -0,0 +1,103 @@
+"""
+jpamb.sampling
+
+This module contains the statistics used by 'evaluate' to decide how many
+times to run an analyzer: confidence intervals of the mean, and rejection
+of outliers.
+
+"""
+
+from dataclasses import dataclass, field
+import math
+import statistics
+
+# The two-sided 95% critical values of Student's t distribution, by degrees
+# of freedom; above 30 the normal distribution is close enough.
+T95 = (
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,
+)  # fmt: skip
+Z95 = 1.960
+
+
+def confidence_interval(samples: list[float]) -> tuple[float, float]:
+    """The 95% confidence interval of the mean of the samples."""
+    n = len(samples)
+    if n == 0:
+        return (-math.inf, math.inf)
+    mean = statistics.fmean(samples)
+    if n == 1:
+        return (mean, mean)
+    t = T95[n - 2] if n - 1 <= len(T95) else Z95
+    half = t * statistics.stdev(samples) / math.sqrt(n)
+    return (mean - half, mean + half)
+
+
+def reject_outliers(samples: list[float], k: float = 3.0) -> list[float]:
+    """The samples that are within 'k' scaled median absolute deviations of
+    the median."""
+    if len(samples) < 3:
+        return list(samples)
+    median = statistics.median(samples)
+    # 1.4826 scales the MAD to the standard deviation of normal data.
+    mad = 1.4826 * statistics.median(abs(x - median) for x in samples)
+    if mad == 0:
+        return list(samples)
+    return [x for x in samples if abs(x - median) <= k * mad]
+
+
+@dataclass
+class Sampler:
+    """The samples of one measurement, and whether there are enough of them.
+
+    Without a 'width', exactly 'minimum' runs are made. Otherwise samples
+    are taken until the confidence interval is at most 'width' wide, there
+    are 'maximum' runs, or 'budget' seconds are spent.
+    """
+
+    minimum: int = 3
+    width: float | None = None
+    maximum: int = 30
+    budget: float | None = None
+    outliers: bool = True
+    samples: list[float] = field(default_factory=list)
+    failures: int = 0
+    seconds: float = 0.0
+
+    def add(self, sample: float, seconds: float = 0.0):
+        self.samples.append(sample)
+        self.seconds += seconds
+
+    def fail(self):
+        """Count a run that gave no sample towards the number of runs."""
+        self.failures += 1
+
+    def kept(self) -> list[float]:
+        if self.outliers:
+            return reject_outliers(self.samples)
+        return list(self.samples)
+
+    def done(self) -> bool:
+        n = len(self.samples) + self.failures
+        if n < self.minimum:
+            return False
+        if self.width is None or n >= self.maximum:
+            return True
+        if self.budget is not None and self.seconds >= self.budget:
+            return True
+        low, high = confidence_interval(self.kept())
+        return high - low <= self.width
+
+    def summary(self) -> dict:
+        kept = self.kept()
+        if not kept:
+            return {"samples": 0, "rejected": 0}
+        low, high = confidence_interval(kept)
+        return {
+            "samples": len(self.samples),
+            "rejected": len(self.samples) - len(kept),
+            "mean": statistics.fmean(kept),
+            "median": statistics.median(kept),
+            "ci": [low, high],
+        }
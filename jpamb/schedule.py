@@ -0,0 +1,214 @@
+"""
+jpamb.schedule
+
+This module contains the scheduling of the methods of the suite over
+several workers, used by 'test' and 'evaluate'. The methods are dispatched
+longest first (LPT), which keeps a slow method from being started last. The
+costs of the methods are the durations recorded in a history file by
+earlier runs, or estimated from the size of their bytecode when there is no
+history.
+
+The methods can also be split into shards, to be run on different machines,
+see 'shard_methods'.
+
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import heapq
+import json
+from pathlib import Path
+import statistics
+from time import perf_counter
+from typing import Callable
+
+from jpamb.logger import log
+
+DEFAULT_FILE = Path(".jpamb-history.json")
+
+# The weight of a new duration in the history; older durations decay.
+ALPHA = 0.5
+
+# The seconds per instruction of a method when nothing is known; only used
+# to predict the makespan, the order is the same for any value.
+SECONDS_PER_OPCODE = 0.005
+
+
+@dataclass
+class History:
+    """The seconds per run of each method, by program."""
+
+    path: Path | None = DEFAULT_FILE
+    programs: dict[str, dict[str, float]] = field(default_factory=dict)
+
+    @staticmethod
+    def load(path: Path | None = DEFAULT_FILE) -> "History":
+        if path is None:
+            return History(None)
+        try:
+            with open(path) as fp:
+                return History(path, json.load(fp))
+        except (OSError, ValueError):
+            return History(path)
+
+    def save(self):
+        if self.path is None:
+            return
+        with open(self.path, "w") as fp:
+            json.dump(self.programs, fp, indent=2, sort_keys=True)
+
+    def record(self, program: str, durations: dict[str, float]):
+        known = self.programs.setdefault(program, {})
+        for method, seconds in durations.items():
+            old = known.get(method)
+            known[method] = (
+                seconds if old is None else ALPHA * seconds + (1 - ALPHA) * old
+            )
+
+    def estimate(self, program: str, sizes: dict[str, int]) -> dict[str, float]:
+        """The seconds per run of the methods, from their history, or else
+        from their size relative to the methods with a history."""
+        known = self.programs.get(program, {})
+        ratios = [known[m] / max(n, 1) for m, n in sizes.items() if m in known]
+        ratio = statistics.median(ratios) if ratios else SECONDS_PER_OPCODE
+        return {m: known.get(m, ratio * max(n, 1)) for m, n in sizes.items()}
+
+
+@dataclass
+class Schedule[K]:
+    """The order to dispatch the work in, and its predicted makespan."""
+
+    order: list[K]
+    costs: dict[K, float]
+    predicted: float
+
+
+def plan[K](costs: dict[K, float], workers: int) -> Schedule[K]:
+    """Dispatch the work longest first; the makespan is predicted by giving
+    each piece of work to the worker that is free first."""
+    order = sorted(costs, key=lambda k: costs[k], reverse=True)
+    loads = [0.0] * max(workers, 1)
+    for k in order:
+        heapq.heapreplace(loads, loads[0] + costs[k])
+    return Schedule(order, costs, max(loads))
+
+
+@dataclass
+class Outcome[K]:
+    """The results of executing a schedule; a result is the exception, if
+    the work raised one."""
+
+    results: dict[K, object]
+    durations: dict[K, float]
+    makespan: float
+
+
+def execute[K](
+    work: Callable[[K], object], schedule: Schedule[K], jobs: int = 1
+) -> Outcome[K]:
+    """Do the work of the schedule on 'jobs' threads, in its order; with one
+    job, the work is done on the calling thread."""
+
+    def timed(k):
+        start = perf_counter()
+        try:
+            result = work(k)
+        except Exception as e:
+            result = e
+        return result, perf_counter() - start
+
+    start = perf_counter()
+    if jobs <= 1:
+        # On the calling thread, usually the main one, without a pool.
+        done = {k: timed(k) for k in schedule.order}
+    else:
+        with ThreadPoolExecutor(jobs, thread_name_prefix="worker") as pool:
+            futures = {k: pool.submit(timed, k) for k in schedule.order}
+            done = {k: f.result() for k, f in futures.items()}
+    makespan = perf_counter() - start
+
+    log.success(
+        f"Makespan: predicted {schedule.predicted:0.2f}s, actual {makespan:0.2f}s"
+    )
+    return Outcome(
+        {k: r for k, (r, _) in done.items()},
+        {k: d for k, (_, d) in done.items()},
+        makespan,
+    )
+
+
+def parse_shard(text: str) -> tuple[int, int]:
+    """Parse a shard 'i/N', where 1 <= i <= N."""
+    index, _, count = text.partition("/")
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        raise ValueError(f"Expected a shard like 1/4, got {text!r}") from None
+    if not 1 <= index <= count:
+        raise ValueError(
+            f"Expected the shard {text!r} to be between 1/{count} and {count}/{count}"
+        )
+    return (index, count)
+
+
+def shard[K](costs: dict[K, float], index: int, count: int) -> list[K]:
+    """The work of shard 'index' of 'count', balanced by cost: the work is
+    given longest first to the shard with the least work. The partition is
+    the same on every machine, given the same costs."""
+    shards = [(0.0, i) for i in range(1, count + 1)]
+    mine = []
+    for k in sorted(costs, key=lambda k: (-costs[k], str(k))):
+        load, i = heapq.heappop(shards)
+        if i == index:
+            mine.append(k)
+        heapq.heappush(shards, (load + costs[k], i))
+    return mine
+
+
+def shard_methods[K](suite, methods: list[K], index: int, count: int) -> list[K]:
+    """The methods of shard 'index' of 'count', in their original order.
+
+    The methods are balanced by their number of instructions, and not by
+    their history, which differs between machines.
+    """
+    sizes = method_sizes(suite, methods)
+    mine = set(shard({m: sizes[str(m)] for m in methods}, index, count))
+    return [m for m in methods if m in mine]
+
+
+def method_sizes(suite, methods) -> dict[str, int]:
+    """The number of instructions of the methods."""
+    sizes = {}
+    for m in methods:
+        try:
+            sizes[str(m)] = len(suite.method_opcodes(m))
+        except NotImplementedError:
+            sizes[str(m)] = len(suite.findmethod(m)["code"]["bytecode"])
+    return sizes
+
+
+def run_methods[K](
+    suite,
+    methods: list[K],
+    work: Callable[[K], object],
+    program: str,
+    jobs: int = 1,
+    history: History | None = None,
+    runs: int = 1,
+) -> Outcome[K]:
+    """Do the work for each method, slowest first, and record how long the
+    'runs' runs of the 'program' on each method took in the history."""
+    history = History(None) if history is None else history
+    estimate = history.estimate(program, method_sizes(suite, methods))
+    schedule = plan({m: runs * estimate[str(m)] for m in methods}, jobs)
+    outcome = execute(work, schedule, jobs)
+    history.record(
+        program,
+        {
+            str(m): seconds / max(runs, 1)
+            for m, seconds in outcome.durations.items()
+            if not isinstance(outcome.results[m], Exception)
+        },
+    )
+    history.save()
+    return outcome
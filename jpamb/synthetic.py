@@ -0,0 +1,389 @@
+"""
+jpamb.synthetic
+
+This module contains a generator of synthetic methods, to see how analyzers
+scale with the size of a method, its branches, its loops, and its use of
+arrays. The methods are written as decompiled classes in the jvm2json format
+that 'jvm.Opcode.from_json' reads, in a folder laid out like the suite, so
+that analyzers can run on it with the folder as their working directory:
+
+    CORPUS/decompiled/jpamb/synthetic/Method0.json
+    CORPUS/stats/cases.txt
+    CORPUS/synthetic.json
+
+Each method is 'run:(I)V', of its own class, so that the size of the class
+file grows with the method. The methods only use the opcodes of the cases,
+and every loop runs a constant number of times, so the expected result of
+each case is found by running the method with 'jpamb.interpreter'. The
+shapes of the methods are listed in 'synthetic.json'.
+
+"""
+
+from dataclasses import dataclass, asdict
+import json
+from pathlib import Path
+import random
+
+from jpamb import jvm, model
+
+PACKAGE = "jpamb/synthetic"
+
+# The int variables of a method are the locals 1 to VARIABLES; local 0 is
+# the parameter.
+VARIABLES = 4
+
+# The length of the array of a method.
+ARRAY = 8
+
+# The share of statements that are loops, while the loops are not nested
+# deeper than the shape allows.
+LOOPS = 0.05
+
+# The share of statements that are assertions.
+ASSERTIONS = 0.01
+
+# The share of divisions and array accesses that use a variable, and so may
+# divide by zero or be out of bounds; the others use a constant.
+HAZARDS = 0.01
+
+# Cases with a run longer than this many instructions have no expected
+# result in 'cases.txt'.
+MAX_STEPS = 10_000_000
+
+NEGATE = {"eq": "ne", "ne": "eq", "lt": "ge", "ge": "lt", "gt": "le", "le": "gt"}
+
+# The sizes of the instructions in bytes, for their offsets.
+SIZES = {
+    "push": 2,
+    "if": 3,
+    "ifz": 3,
+    "goto": 3,
+    "incr": 3,
+    "get": 3,
+    "new": 3,
+    "invoke": 3,
+    "newarray": 2,
+}
+
+
+@dataclass(frozen=True)
+class Shape:
+    """The shape of a synthetic method: about 'instructions' instructions,
+    of which a share 'branch_density' of the statements are ifs, and a share
+    'arrays' use an array; loops are nested 'loop_depth' deep."""
+
+    instructions: int = 1000
+    branch_density: float = 0.1
+    loop_depth: int = 1
+    arrays: float = 0.1
+    seed: int = 0
+
+
+class _Label:
+    index: int | None = None
+
+
+class Generator:
+    """Generates the bytecode of a method of a shape, in the jvm2json format."""
+
+    def __init__(self, shape: Shape, classname: str):
+        self.shape = shape
+        self.classname = classname
+        self.rng = random.Random(shape.seed)
+        self.bytecode: list[dict] = []
+        self.deepest = 0
+        # The counter of a loop at depth d is local VARIABLES + 1 + d.
+        self.counters = VARIABLES + 1
+
+    def emit(self, opr: str, **fields):
+        self.bytecode.append({"opr": opr, **fields})
+
+    def place(self, label: _Label):
+        label.index = len(self.bytecode)
+
+    def variable(self) -> int:
+        return self.rng.randint(1, VARIABLES)
+
+    def push(self, value: int):
+        self.emit("push", value={"type": "integer", "value": value})
+
+    def load(self, index: int, type="int"):
+        self.emit("load", index=index, type=type)
+
+    def store(self, index: int, type="int"):
+        self.emit("store", index=index, type=type)
+
+    def generate(self) -> tuple[list[dict], int]:
+        """The bytecode of the method, and the most instructions a run of it
+        can take."""
+        steps = 0
+        for i in range(1, VARIABLES + 1):
+            self.load(0)
+            self.push(i)
+            self.emit("binary", operant="mul", type="int")
+            self.store(i)
+            steps += 4
+        if self.shape.arrays:
+            self.push(ARRAY)
+            self.emit("newarray", type="int", dim=1)
+            self.store(VARIABLES + 1, "ref")
+            steps += 3
+        budget = self.shape.instructions - len(self.bytecode) - 1
+        steps += self.block(budget, 0)
+        self.emit("return", type=None)
+
+        offset = 0
+        for op in self.bytecode:
+            if isinstance(label := op.get("target"), _Label):
+                op["target"] = label.index
+            op["offset"] = offset
+            offset += SIZES.get(op["opr"], 1)
+        return self.bytecode, steps + 1
+
+    def block(self, budget: int, depth: int) -> int:
+        """Generate statements until 'budget' instructions are used, and
+        return the most instructions they can take."""
+        rng, shape = self.rng, self.shape
+        end = len(self.bytecode) + budget
+        steps = 0
+        while (left := end - len(self.bytecode)) > 0:
+            loop = depth < shape.loop_depth and left >= 16
+            if loop and (depth >= self.deepest or rng.random() < LOOPS):
+                steps += self.loop(rng.randint(8, max(8, left // 4)), depth + 1)
+            elif left >= 8 and rng.random() < shape.branch_density:
+                steps += self.branch(rng.randint(4, max(4, left // 4)), depth)
+            elif left >= 6 and rng.random() < shape.arrays:
+                steps += self.array()
+            elif left >= 10 and rng.random() < ASSERTIONS:
+                steps += self.assertion()
+            else:
+                steps += self.assign()
+        return steps
+
+    def assign(self) -> int:
+        rng = self.rng
+        self.load(self.variable())
+        if rng.random() < HAZARDS:
+            self.load(self.variable())
+            self.emit("binary", operant=rng.choice(["div", "rem"]), type="int")
+        else:
+            self.push(rng.randint(1, 9))
+            self.emit("binary", operant=rng.choice(["add", "sub", "mul"]), type="int")
+        self.store(self.variable())
+        return 4
+
+    def index(self):
+        self.load(VARIABLES + 1, "ref")
+        if self.rng.random() < HAZARDS:
+            self.load(self.variable())
+            self.push(ARRAY)
+            self.emit("binary", operant="rem", type="int")
+        else:
+            self.push(self.rng.randrange(ARRAY))
+
+    def array(self) -> int:
+        start = len(self.bytecode)
+        match self.rng.randrange(3):
+            case 0:
+                self.index()
+                self.load(self.variable())
+                self.emit("array_store", type="int")
+            case 1:
+                self.index()
+                self.emit("array_load", type="int")
+                self.store(self.variable())
+            case _:
+                self.load(VARIABLES + 1, "ref")
+                self.emit("arraylength")
+                self.store(self.variable())
+        return len(self.bytecode) - start
+
+    def branch(self, budget: int, depth: int) -> int:
+        after = _Label()
+        self.load(self.variable())
+        self.push(self.rng.randint(-9, 9))
+        condition = self.rng.choice(list(NEGATE))
+        self.emit("if", condition=NEGATE[condition], target=after)
+        steps = 3 + self.block(budget - 3, depth)
+        self.place(after)
+        return steps
+
+    def loop(self, budget: int, depth: int) -> int:
+        self.deepest = max(self.deepest, depth)
+        counter = self.counters + depth
+        times = self.rng.randint(2, 4)
+        start, after = _Label(), _Label()
+        self.push(0)
+        self.store(counter)
+        self.place(start)
+        self.load(counter)
+        self.push(times)
+        self.emit("if", condition="ge", target=after)
+        body = self.block(budget - 7, depth)
+        self.emit("incr", index=counter, amount=1)
+        self.emit("goto", target=start)
+        self.place(after)
+        return 2 + times * (body + 5) + 3
+
+    def assertion(self) -> int:
+        after = _Label()
+        self.emit(
+            "get",
+            static=True,
+            field={
+                "class": self.classname,
+                "name": "$assertionsDisabled",
+                "type": "boolean",
+            },
+        )
+        self.emit("ifz", condition="ne", target=after)
+        self.load(self.variable())
+        self.push(self.rng.randint(-9, 9))
+        self.emit("if", condition="ne", target=after)
+        self.emit("new", **{"class": "java/lang/AssertionError"})
+        self.emit("dup", words=1)
+        self.emit(
+            "invoke",
+            access="special",
+            method={
+                "args": [],
+                "is_interface": False,
+                "name": "<init>",
+                "ref": {"kind": "class", "name": "java/lang/AssertionError"},
+                "returns": None,
+            },
+        )
+        self.emit("throw")
+        self.place(after)
+        return 9
+
+
+def method_json(bytecode: list[dict], shape: Shape) -> dict:
+    return {
+        "access": ["public", "static"],
+        "annotations": [],
+        "code": {
+            "annotations": [],
+            "bytecode": bytecode,
+            "exceptions": [],
+            "lines": [],
+            "max_locals": VARIABLES + 2 + shape.loop_depth,
+            "max_stack": 4,
+            "stack_map": [],
+        },
+        "default": None,
+        "exceptions": [],
+        "name": "run",
+        "params": [
+            {
+                "annotations": [],
+                "type": {"annotations": [], "base": "int"},
+                "visible": True,
+            }
+        ],
+        "returns": {"annotations": [], "type": None},
+        "typeparams": [],
+    }
+
+
+def class_json(classname: str, methods: list[dict]) -> dict:
+    return {
+        "access": ["public", "super"],
+        "annotations": [],
+        "bootstrapmethods": [],
+        "enclosingmethod": None,
+        "fields": [
+            {
+                "access": ["static", "final", "synthetic"],
+                "annotations": [],
+                "name": "$assertionsDisabled",
+                "type": {"annotations": [], "base": "boolean"},
+                "value": None,
+            }
+        ],
+        "innerclasses": [],
+        "interfaces": [],
+        "methods": methods,
+        "name": classname,
+        "super": {
+            "annotations": [],
+            "args": [],
+            "inner": None,
+            "name": "java/lang/Object",
+        },
+        "typeparams": [],
+        "version": [63, 0],
+    }
+
+
+def generate(folder: Path, shapes: list[Shape], inputs: int = 3) -> list[dict]:
+    """Write a method of each shape to the corpus in 'folder', with the
+    cases of 'inputs' inputs each, and return the manifest of the corpus."""
+    from jpamb.interpreter import Interpreter
+
+    folder = folder.absolute()
+    (folder / "decompiled" / PACKAGE).mkdir(parents=True, exist_ok=True)
+    (folder / "stats").mkdir(exist_ok=True)
+
+    manifest = []
+    cases = []
+    for i, shape in enumerate(shapes):
+        classname = f"{PACKAGE}/Method{i}"
+        bytecode, steps = Generator(shape, classname).generate()
+        with open(folder / "decompiled" / f"{classname}.json", "w") as fp:
+            json.dump(class_json(classname, [method_json(bytecode, shape)]), fp)
+        methodid = jvm.AbsMethodID.decode(f"{classname.replace('/', '.')}.run:(I)V")
+        manifest.append(
+            {
+                "method": methodid.encode(),
+                "instructions": len(bytecode),
+                "steps": steps,
+                **asdict(shape),
+            }
+        )
+        if steps > MAX_STEPS:
+            continue
+
+        rng = random.Random(shape.seed)
+        values = [0] + [rng.randint(-100, 100) for _ in range(inputs - 1)]
+        cases += [(methodid, model.Input.decode(f"({v})")) for v in values[:inputs]]
+
+    suite = model.Suite(folder)
+    suite.invalidate_cache()
+    interpreter = Interpreter(suite, max_steps=MAX_STEPS + 1)
+    with open(folder / "stats" / "cases.txt", "w") as fp:
+        for methodid, input in cases:
+            result = interpreter.run(methodid, input)
+            fp.write(model.Case(methodid, input, result).encode() + "\n")
+    with open(folder / "synthetic.json", "w") as fp:
+        json.dump(manifest, fp, indent=2)
+    return manifest
+
+
+def scaling(
+    folder: Path, program, repeat: int = 1, timeout: float = 60.0
+) -> list[dict]:
+    """Run the program on each method of the corpus in 'folder', with the
+    corpus as its working directory, and return the manifest with the best
+    of 'repeat' times of each method, or the error of the method."""
+    from jpamb import process
+
+    folder = folder.absolute()
+    # The program is run in the corpus, so paths to it must be absolute.
+    program = [str(Path(p).absolute()) if Path(p).exists() else p for p in program]
+    with open(folder / "synthetic.json") as fp:
+        manifest = json.load(fp)
+    for entry in manifest:
+        times = []
+        try:
+            for _ in range(repeat):
+                _, ns, _ = process.measure(
+                    program + [entry["method"]], timeout=timeout, cwd=folder
+                )
+                times.append(ns)
+        except process.subprocess.TimeoutExpired:
+            entry["error"] = "timeout"
+        except process.subprocess.CalledProcessError as e:
+            entry["error"] = f"exit code {e.returncode}"
+        entry["seconds"] = min(times) / 1e9 if times else None
+    return manifest
@@ -0,0 +1,146 @@
+"""
+jpamb.timeline
+
+This module contains the timeline of a run, which 'test', 'interpret',
+'evaluate' and 'build' write with '--trace-out' in the Chrome Trace Event
+format, to be opened in Perfetto (ui.perfetto.dev) or chrome://tracing. The
+spans of the cases, the subprocesses, the calibration and the calls to
+jvm2json are recorded on the track of the thread that ran them, so there is
+one track per worker.
+
+Recording a span costs two reads of the clock and an append to a list; the
+events are only encoded when the timeline is written. When no timeline is
+recorded, 'span' does nothing.
+
+"""
+
+import json
+import os
+from pathlib import Path
+import threading
+from time import perf_counter_ns
+
+# The timeline being recorded, if any.
+TIMELINE: "Timeline | None" = None
+
+
+class Span:
+    """A span of the timeline, recorded when its 'with' block ends."""
+
+    __slots__ = ("timeline", "name", "cat", "args", "start")
+
+    def __init__(self, timeline: "Timeline", name: str, cat: str, args: dict):
+        self.timeline = timeline
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def annotate(self, **args):
+        """Add arguments to the span, shown when it is selected."""
+        self.args.update(args)
+
+    def __enter__(self):
+        self.start = perf_counter_ns()
+        return self
+
+    def __exit__(self, kind, error, _):
+        end = perf_counter_ns()
+        if kind is not None:
+            self.args["error"] = kind.__name__
+        self.timeline.add(self, end)
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def annotate(self, **args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        pass
+
+
+NO_SPAN = _NoSpan()
+
+
+class Timeline:
+    """The spans of a run, by thread."""
+
+    def __init__(self, name: str = "jpamb"):
+        self.name = name
+        self.origin = perf_counter_ns()
+        self.spans: list[tuple[Span, int, int]] = []
+        self.threads: dict[int, str] = {}
+
+    def span(self, name: str, cat: str = "jpamb", **args) -> Span:
+        return Span(self, name, cat, args)
+
+    def add(self, span: Span, end: int):
+        thread = threading.get_ident()
+        if thread not in self.threads:
+            self.threads[thread] = threading.current_thread().name
+        self.spans.append((span, thread, end))
+
+    def events(self) -> list[dict]:
+        """The events of the timeline, in the Chrome Trace Event format."""
+        pid = os.getpid()
+        tids = {thread: tid for tid, thread in enumerate(self.threads, start=1)}
+        events = [
+            {"ph": "M", "name": "process_name", "pid": pid, "args": {"name": self.name}}
+        ]
+        for thread, tid in tids.items():
+            events.append(
+                {
+                    "ph": "M",
+                    "name": "thread_name",
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {"name": self.threads[thread]},
+                }
+            )
+        for span, thread, end in sorted(self.spans, key=lambda s: s[0].start):
+            events.append(
+                {
+                    "ph": "X",
+                    "name": span.name,
+                    "cat": span.cat,
+                    "pid": pid,
+                    "tid": tids[thread],
+                    "ts": (span.start - self.origin) / 1000,
+                    "dur": (end - span.start) / 1000,
+                    "args": span.args,
+                }
+            )
+        return events
+
+    def write(self, path: Path):
+        with open(path, "w") as fp:
+            json.dump(
+                {"traceEvents": self.events(), "displayTimeUnit": "ms"},
+                fp,
+                default=str,
+            )
+
+
+def span(name: str, cat: str = "jpamb", **args) -> Span | _NoSpan:
+    """A span of the timeline being recorded, or nothing."""
+    if TIMELINE is None:
+        return NO_SPAN
+    return TIMELINE.span(name, cat, **args)
+
+
+def start(name: str = "jpamb") -> Timeline:
+    """Start recording a timeline."""
+    global TIMELINE
+    TIMELINE = Timeline(name)
+    return TIMELINE
+
+
+def stop() -> Timeline | None:
+    """Stop recording the timeline, and return it."""
+    global TIMELINE
+    timeline, TIMELINE = TIMELINE, None
+    return timeline
@@ -0,0 +1,170 @@
+"""
+jpamb.trace
+
+This module contains a compact binary recorder of the instructions executed
+by the 'jpamb.interpreter'.
+
+Each record is five signed 64 bit integers: the method (as an index into
+the method table of the trace), the pc, the kind of opcode (an index into
+'OPCODES'), and a summary of the top of the stack as a tag and a value.
+Records are kept in an 'array' used as a ring buffer, so only the last
+'capacity' records are kept, and a trace can be left on for long runs.
+
+A trace file starts with the 'MAGIC' line, followed by a line of JSON with
+the method table and the counts, followed by the records in machine byte
+order.
+
+"""
+
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+import json
+import sys
+
+from jpamb import jvm
+
+MAGIC = b"JPAMB-TRACE 1\n"
+
+FIELDS = 5
+
+OPCODES: tuple[type, ...] = tuple(
+    sorted(jvm.Opcode.__subclasses__(), key=lambda c: c.__name__)
+)
+OPCODE_INDEX = {c: i for i, c in enumerate(OPCODES)}
+
+# The tags of the top of stack summary
+EMPTY, INT, NULL, ARRAY, OBJECT = range(5)
+TAGS = ("empty", "int", "null", "array", "object")
+
+
+def summary(stack: list) -> tuple[int, int]:
+    """Summarize the top of the stack as a tag and a value. Arrays are
+    summarized by their length."""
+    if not stack:
+        return EMPTY, 0
+    top = stack[-1]
+    if top is None:
+        return NULL, 0
+    if isinstance(top, int):
+        return INT, top
+    if isinstance(top, list):
+        return ARRAY, len(top)
+    return OBJECT, 0
+
+
+@dataclass(frozen=True)
+class Record:
+    methodid: str
+    pc: int
+    opcode: str
+    tag: str
+    value: int
+
+    def __str__(self):
+        top = {"empty": "-", "null": "null", "object": "object"}.get(self.tag)
+        if top is None:
+            top = f"{self.tag} {self.value}"
+        return f"{self.methodid}:{self.pc:03d} {self.opcode:<14} top={top}"
+
+
+class Trace:
+    """A ring buffer of the last 'capacity' executed instructions."""
+
+    def __init__(self, capacity: int = 1 << 16):
+        self.capacity = capacity
+        self.buffer = array("q", bytes(8 * FIELDS * capacity))
+        self.count = 0
+        self.position = 0
+        self.offset = 0
+        self.methods: list[str] = []
+        self.method_index: dict[jvm.AbsMethodID, int] = {}
+
+    def method(self, methodid: jvm.AbsMethodID) -> int:
+        try:
+            return self.method_index[methodid]
+        except KeyError:
+            self.methods.append(methodid.encode())
+            index = self.method_index[methodid] = len(self.methods) - 1
+            return index
+
+    def record(self, method: int, pc: int, opcode: type, stack: list):
+        i = self.position
+        buffer = self.buffer
+        buffer[i] = method
+        buffer[i + 1] = pc
+        buffer[i + 2] = OPCODE_INDEX[opcode]
+        if stack and type(top := stack[-1]) is int:
+            buffer[i + 3] = INT
+            buffer[i + 4] = top
+        else:
+            buffer[i + 3], buffer[i + 4] = summary(stack)
+        i += FIELDS
+        self.position = 0 if i == len(buffer) else i
+        self.count += 1
+
+    def ordered(self) -> array:
+        """The kept records in the order they were recorded."""
+        if self.count <= self.capacity:
+            return self.buffer[: self.count * FIELDS]
+        split = (self.count % self.capacity) * FIELDS
+        return self.buffer[split:] + self.buffer[:split]
+
+    def records(self) -> list[Record]:
+        data = self.ordered()
+        return [
+            Record(
+                self.methods[data[i]],
+                data[i + 1],
+                OPCODES[data[i + 2]].__name__,
+                TAGS[data[i + 3]],
+                data[i + 4],
+            )
+            for i in range(0, len(data), FIELDS)
+        ]
+
+    @property
+    def dropped(self) -> int:
+        """The number of records overwritten in the ring buffer."""
+        return self.offset + max(0, self.count - self.capacity)
+
+    def write(self, path: Path):
+        data = self.ordered()
+        header = {
+            "methods": self.methods,
+            "count": self.offset + self.count,
+            "capacity": self.capacity,
+            "byteorder": sys.byteorder,
+        }
+        with open(path, "wb") as f:
+            f.write(MAGIC)
+            f.write(json.dumps(header).encode() + b"\n")
+            data.tofile(f)
+
+    @staticmethod
+    def read(path: Path) -> "Trace":
+        with open(path, "rb") as f:
+            if f.readline() != MAGIC:
+                raise ValueError(f"{path} is not a trace file")
+            header = json.loads(f.readline())
+            data = array("q", f.read())
+        if header["byteorder"] != sys.byteorder:
+            data.byteswap()
+        trace = Trace(max(1, len(data) // FIELDS))
+        trace.buffer[: len(data)] = data
+        trace.methods = header["methods"]
+        trace.count = len(data) // FIELDS
+        trace.position = 0
+        trace.offset = header["count"] - trace.count
+        return trace
+
+
+def diff(a: list[Record], b: list[Record]) -> int | None:
+    """The index of the first record where the traces differ, or None if they
+    are the same."""
+    for i, (x, y) in enumerate(zip(a, b)):
+        if x != y:
+            return i
+    if len(a) != len(b):
+        return min(len(a), len(b))
+    return None
@@ -0,0 +1,46 @@
+import dataclasses
+
+from click.testing import CliRunner
+
+from jpamb import bench, cli, model
+
+
+def test_benchmarks_run():
+    results = bench.run(model.Suite(), repeat=1, min_time=0)
+    assert list(results) == list(bench.BENCHMARKS)
+    for name, result in results.items():
+        assert result.ops > 0, name
+        assert result.ops_per_sec > 0, name
+        assert result.best_ns <= result.median_ns, name
+        assert result.peak >= 0, name
+
+
+def test_compare(tmp_path):
+    results = bench.run(model.Suite(), ["Case.decode", "Input.decode"], 1, 0)
+    bench.save(results, tmp_path / "bench.json")
+    baseline = bench.load(tmp_path / "bench.json")["results"]
+    assert baseline == results
+
+    slower = dataclasses.replace(results["Case.decode"])
+    slower.best_ns = int(slower.best_ns * 1.5)
+    changes = bench.compare(baseline, {**results, "Case.decode": slower}, 0.1)
+    assert changes["Case.decode"].regression
+    assert not changes["Input.decode"].regression
+    assert bench.compare(baseline, {"Other": slower}) == {}
+
+
+def test_cli_bench(tmp_path):
+    runner = CliRunner()
+    output = tmp_path / "bench.json"
+    args = ["bench", "-f", "^Case", "--repeat", "1", "--min-time", "0"]
+    result = runner.invoke(cli.cli, args + ["-o", str(output)])
+    assert result.exit_code == 0, result.output
+    assert "Case.decode" in result.output
+
+    saved = bench.load(output)
+    saved["results"]["Case.decode"].best_ns //= 100
+    bench.save(saved["results"], output)
+    args += ["-o", str(tmp_path / "new.json"), "--baseline", str(output)]
+    result = runner.invoke(cli.cli, args)
+    assert result.exit_code == 1
+    assert "regression" in result.output
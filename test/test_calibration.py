@@ -0,0 +1,57 @@
+import math
+
+from jpamb import calibration
+from jpamb.calibration import Calibration, Calibrator
+
+
+def fake(sieve=1000):
+    return Calibration({"sieve": sieve, "python": 100, "allocation": 10, "memory": 1})
+
+
+def test_composite():
+    c = fake(1)
+    assert math.isclose(c.composite("python"), 10 ** ((3 * 2 + 2 * 1) / 7))
+    assert math.isclose(c.relative(c.composite("native"), "native"), 0)
+
+
+def test_kernels():
+    for kernel in calibration.KERNELS.values():
+        assert calibration.time_kernel(kernel, repeat=1) > 0
+
+
+def test_load(tmp_path):
+    path = tmp_path / "calibration.json"
+    assert Calibration.load(path) is None
+    saved = fake()
+    saved.save(path)
+    assert Calibration.load(path) == saved
+
+    other = fake()
+    other.machine = {**other.machine, "node": "elsewhere"}
+    other.save(path)
+    assert Calibration.load(path) is None
+
+
+def test_calibrator(tmp_path, monkeypatch):
+    measured = []
+
+    def measure(repeat=5):
+        measured.append(fake())
+        return measured[-1]
+
+    monkeypatch.setattr(Calibration, "measure", staticmethod(measure))
+    path = tmp_path / "calibration.json"
+    calibrator = Calibrator(path, interval=0)
+
+    # The machine is slower than the saved calibration says, so it is
+    # measured again on every check.
+    first = calibrator.get()
+    assert len(measured) == 1 and Calibration.load(path) == first
+    calibrator.get()
+    assert len(measured) == 2
+
+    monkeypatch.setattr(Calibration, "recheck", lambda self: True)
+    calibrator.get()
+    assert len(measured) == 2
+    assert Calibrator(path).get() == measured[-1]
+    assert len(measured) == 2
@@ -0,0 +1,64 @@
+import pytest
+
+from jpamb import jvm, model
+from jpamb.interpreter import Interpreter
+
+suite = model.Suite()
+
+
+def decode(decoder):
+    try:
+        return decoder()
+    except NotImplementedError:
+        return NotImplementedError
+
+
+@pytest.mark.parametrize("cn", sorted(suite.classes()), ids=str)
+def test_same_as_decompiled(cn):
+    cf = jvm.ClassFile.read(suite.classfile(cn))
+    data = suite.findclass(cn)
+    assert cf.name == data["name"]
+    assert [m.name for m in cf.methods] == [m["name"] for m in data["methods"]]
+    for method, expected in zip(cf.methods, data["methods"]):
+        if expected["code"] is None:
+            assert method.code is None
+            continue
+        code = expected["code"]
+        assert method.code.max_stack == code["max_stack"]
+        assert method.code.max_locals == code["max_locals"]
+        assert list(method.code.offsets) == [op["offset"] for op in code["bytecode"]]
+        assert [
+            {
+                "start": h.start,
+                "end": h.end,
+                "handler": h.handler,
+                "catchType": h.catch_type,
+            }
+            for h in method.code.exceptions
+        ] == code["exceptions"]
+        with jvm.validation():
+            opcodes = decode(method.opcodes)
+        assert opcodes == decode(lambda: jvm.decode_method(code["bytecode"]))
+
+
+def test_method_opcodes():
+    for method, _ in suite.case_methods():
+        assert suite.method_opcodes(method, "classfiles") == suite.method_opcodes(
+            method, "decompiled"
+        )
+    with pytest.raises(IndexError):
+        suite.findclassfile(method.classname).method(jvm.MethodID.decode("missing:()V"))
+
+
+def test_interpreter(monkeypatch):
+    monkeypatch.setattr(model, "OPCODES", "classfiles")
+    suite.invalidate_cache()
+    interpreter = Interpreter(suite)
+    for case in suite.cases:
+        assert interpreter.run(case.methodid, case.input) == case.result, str(case)
+    assert suite._classfiles
+
+
+def test_not_a_classfile():
+    with pytest.raises(ValueError, match="magic"):
+        jvm.ClassFile.parse(b"\x00" * 16)
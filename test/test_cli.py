@@ -77,3 +77,78 @@ def test_interpret():
 
     assert result.exit_code == 0
     assert "Total 58/58" in result.output
+
+
+@pytest.mark.slow
+def test_evaluate_shards(tmp_path):
+    import json
+    import subprocess
+    import sys
+
+    def evaluate(shard):
+        report = tmp_path / f"shard{shard}.json"
+        cmd = [sys.executable, "-m", "jpamb.cli", "evaluate", "-N", "1"]
+        cmd += ["--shard", f"{shard}/2", "-r", str(report)]
+        cmd += ["--calibration", str(tmp_path / "calibration.json")]
+        cmd += ["--history", str(tmp_path / "history.json")]
+        cmd += ["-W", str(solutions[0])]
+        return report, subprocess.Popen(cmd, stderr=subprocess.DEVNULL)
+
+    shards = [evaluate(1), evaluate(2)]
+    for _, process in shards:
+        assert process.wait() == 0
+    reports = [json.loads(report.read_text()) for report, _ in shards]
+    assert reports[0]["shard"] == "1/2"
+    assert not set(reports[0]["bymethod"]) & set(reports[1]["bymethod"])
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli.cli,
+        ["merge-reports", *(str(report) for report, _ in shards)],
+        catch_exceptions=False,
+    )
+    assert result.exit_code == 0
+    merged = json.loads(result.output)
+    assert len(merged["bymethod"]) == len(cli.model.Suite().case_methods())
+    assert merged["score"] == pytest.approx(sum(r["score"] for r in reports))
+    assert "shard" not in merged
+
+    result = runner.invoke(cli.cli, ["merge-reports", str(shards[0][0])])
+    assert result.exit_code == 1
+    assert "missing" in result.output
+
+
+@pytest.mark.slow
+def test_evaluate_checkpoint(tmp_path):
+    import json
+
+    report = tmp_path / "report.json"
+    args = ["evaluate", "-N", "1", "--shard", "1/8", "-r", str(report)]
+    args += ["--calibration", str(tmp_path / "calibration.json")]
+    args += ["--history", str(tmp_path / "history.json")]
+    args += ["-W", str(solutions[0])]
+
+    runner = CliRunner()
+    result = runner.invoke(cli.cli, args, catch_exceptions=False)
+    assert result.exit_code == 0
+    checkpoint = tmp_path / "report.json.jsonl"
+    assert checkpoint.exists()
+    methods = json.loads(report.read_text())["bymethod"]
+
+    result = runner.invoke(cli.cli, args + ["--resume"], catch_exceptions=False)
+    assert result.exit_code == 0
+    assert "Skipping" in result.output
+    assert json.loads(report.read_text())["bymethod"].keys() == methods.keys()
+
+    # A checkpoint of another analyzer is not resumed.
+    lines = checkpoint.read_text().splitlines()
+    record = json.loads(lines[0])
+    record["info"]["version"] = "other"
+    checkpoint.write_text("\n".join([json.dumps(record)] + lines[1:]) + "\n")
+    result = runner.invoke(cli.cli, args + ["--resume"], catch_exceptions=False)
+    assert result.exit_code == 0
+    assert "starting over" in result.output
+    assert "Skipping" not in result.output
+    assert (
+        json.loads(checkpoint.read_text().splitlines()[0])["info"]["version"] != "other"
+    )
@@ -0,0 +1,49 @@
+import io
+import json
+
+from jpamb.events import NO_EVENTS, EventWriter, open_events
+
+
+class Closing(io.StringIO):
+    def close(self):
+        self.text = self.getvalue()
+        super().close()
+
+
+def test_event_writer():
+    fp = Closing()
+    with EventWriter(fp) as events:
+        for i in range(3000):
+            events.emit("stdout", case="A.f:()V", line=str(i))
+    records = [json.loads(line) for line in fp.text.splitlines()]
+    assert records[0]["kind"] == "start"
+    assert [r["line"] for r in records[1:]] == [str(i) for i in range(3000)]
+    ts = [r["ts"] for r in records]
+    assert ts == sorted(ts)
+
+
+def test_no_events():
+    assert open_events(None) is NO_EVENTS
+    NO_EVENTS.emit("case", case="A.f:()V")
+    NO_EVENTS.close()
+
+
+def test_cli_events(tmp_path):
+    from click.testing import CliRunner
+
+    from jpamb import cli
+
+    path = tmp_path / "events.jsonl"
+    result = CliRunner().invoke(
+        cli.cli,
+        ["test", "-f", "Simple.assertPositive", "--events", str(path)]
+        + ["--history", str(tmp_path / "history.json")]
+        + ["--with-python", "solutions/apriori.py"],
+        catch_exceptions=False,
+    )
+    assert result.exit_code == 0
+    kinds = [json.loads(line)["kind"] for line in path.read_text().splitlines()]
+    assert kinds[0] == "start"
+    for kind in ["case", "spawn", "exit", "response", "score", "done"]:
+        assert kind in kinds
+    assert kinds.index("spawn") < kinds.index("exit") < kinds.index("done")
@@ -0,0 +1,90 @@
+import subprocess
+import sys
+import time
+
+import pytest
+
+from jpamb import process
+from jpamb.forkserver import ForkServer
+
+SCRIPT = """
+import atexit, sys
+atexit.register(lambda: print("exit"))
+print(__name__, __file__ == {file!r}, sys.argv[1:])
+print("err", file=sys.stderr)
+match sys.argv[1]:
+    case "raise":
+        raise ValueError("boom")
+    case "exit":
+        sys.exit(3)
+    case "sleep":
+        import time
+        time.sleep(10)
+    case "allocate":
+        x = bytearray(2**30)
+"""
+
+
+@pytest.fixture(scope="module")
+def forkserver():
+    with ForkServer() as server:
+        yield server
+
+
+@pytest.fixture
+def script(tmp_path):
+    path = tmp_path / "analyzer.py"
+    path.write_text(SCRIPT.format(file=str(path)))
+    return str(path)
+
+
+def run(server, cmd, **kwargs):
+    """Run the command, and return its exit code, stdout and stderr."""
+    old, process.FORKSERVER = process.FORKSERVER, server
+    stderr = []
+    try:
+        out, _ = process.run(cmd, logerr=stderr.append, **kwargs)
+        return (0, out, "\n".join(stderr))
+    except subprocess.CalledProcessError as e:
+        return (e.returncode, e.stdout, e.stderr.rstrip())
+    finally:
+        process.FORKSERVER = old
+
+
+@pytest.mark.parametrize("arg", ["ok", "raise", "exit"])
+def test_same_as_fresh(forkserver, script, arg):
+    cmd = [sys.executable, script, arg]
+    assert run(forkserver, cmd) == run(None, cmd)
+
+
+@pytest.mark.parametrize("arg", ["ok", "raise", "exit", "allocate"])
+def test_same_as_fresh_with_limits(forkserver, script, arg):
+    cmd = [sys.executable, script, arg]
+    limits = process.Limits(memory=512 * 1024 * 1024)
+    assert run(forkserver, cmd, limits=limits) == run(None, cmd, limits=limits)
+
+
+def test_accepts(forkserver, script):
+    assert forkserver.accepts([sys.executable, script])
+    assert not forkserver.accepts([sys.executable, "-c", "print()"])
+    assert not forkserver.accepts(["python2", script])
+
+
+def test_timeout(forkserver, script):
+    start = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        run(forkserver, [sys.executable, script, "sleep"], timeout=0.5)
+    assert time.monotonic() - start < 5
+    # The server still works after a child was killed.
+    _, out, _ = run(forkserver, [sys.executable, script, "ok"])
+    assert out.startswith("__main__ True ['ok']")
+
+
+def test_measure(forkserver, script):
+    process.FORKSERVER = forkserver
+    try:
+        out, ns, usage = process.measure([sys.executable, script, "ok"])
+    finally:
+        process.FORKSERVER = None
+    assert out.endswith("exit\n")
+    assert ns > 0 and usage.max_rss > 0
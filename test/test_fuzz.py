@@ -0,0 +1,44 @@
+import pytest
+
+from jpamb import jvm, model
+from jpamb.fuzz import fuzz
+
+suite = model.Suite()
+
+
+def test_fuzz_finds_magic_number():
+    mid = jvm.AbsMethodID.decode("jpamb.cases.Simple.divideByNMinus10054203:(I)I")
+    result = fuzz(suite, mid, executions=200)
+    assert result.found["divide by zero"].values == (jvm.Value.int(10054203),)
+    assert "ok" in result.found
+
+
+METHODS = [
+    "jpamb.cases.Arrays.arrayNotEmpty:([I)V",
+    "jpamb.cases.Arrays.arraySometimesNull:(I)V",
+    "jpamb.cases.Arrays.arraySpellsHello:([C)V",
+    "jpamb.cases.Calls.allPrimesArePositive:(I)V",
+    "jpamb.cases.Simple.checkBeforeDivideByN2:(I)I",
+    "jpamb.cases.Simple.divideZeroByZero:(II)I",
+    "jpamb.cases.Simple.multiError:(Z)I",
+    "jpamb.cases.Tricky.collatz:(I)V",
+]
+
+
+@pytest.mark.parametrize("methodid", METHODS)
+def test_fuzz_outcomes_are_expected(methodid):
+    mid = jvm.AbsMethodID.decode(methodid)
+    expected = {c.result for c in suite.cases if c.methodid == mid}
+    assert expected, methodid
+    result = fuzz(suite, mid, executions=100, max_steps=1000)
+    assert set(result.found) - {"*"} <= expected
+
+
+def test_fuzz_jobs_is_reproducible():
+    mid = jvm.AbsMethodID.decode("jpamb.cases.Simple.divideByN:(I)I")
+    first = fuzz(suite, mid, executions=200, jobs=2, seed=1, rounds=2)
+    second = fuzz(suite, mid, executions=200, jobs=2, seed=1, rounds=2)
+    assert [i.encode() for i in first.corpus] == [i.encode() for i in second.corpus]
+    assert first.executions == second.executions
+    # Each worker replays the corpus, and fuzzes 50 inputs per round.
+    assert 200 <= first.executions < 200 + 4 * len(first.corpus)
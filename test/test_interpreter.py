@@ -0,0 +1,160 @@
+from jpamb import jvm, model
+from jpamb.interpreter import (
+    Coverage,
+    Interpreter,
+    OpcodeStats,
+    count_cases,
+    cover_cases,
+    resolve,
+)
+from jpamb.compiler import Compiler, translate
+
+import pytest
+from hypothesis import given, settings, strategies as st
+
+suite = model.Suite()
+interpreter = Interpreter(suite)
+compiler = Compiler(suite)
+
+
+@pytest.mark.parametrize(
+    "backend", [interpreter, compiler], ids=["interpreter", "compiled"]
+)
+def test_cases(backend):
+    for case in suite.cases:
+        assert backend.run(case.methodid, case.input) == case.result, str(case)
+
+
+def test_coverage():
+    coverage = Coverage()
+    covering = Interpreter(suite, coverage=coverage)
+    for case in suite.cases:
+        assert covering.run(case.methodid, case.input) == case.result, str(case)
+
+    mid = jvm.AbsMethodID.decode("jpamb.cases.Tricky.collatz:(I)V")
+    size = len(interpreter.opcodes(mid))
+    assert coverage.covered(mid) == size
+
+    cases = [case.encode() for case in suite.cases]
+    merged = Coverage()
+    for chunk in (cases[0::2], cases[1::2]):
+        merged.merge(Coverage.decode(cover_cases(suite.workfolder, chunk)))
+    assert merged.encode() == coverage.encode()
+
+
+def test_opcode_stats():
+    coverage, stats = Coverage(), OpcodeStats()
+    covering = Interpreter(suite, coverage=coverage)
+    counting = Interpreter(suite, stats=stats)
+    for case in suite.cases:
+        assert counting.run(case.methodid, case.input) == case.result, str(case)
+        covering.run(case.methodid, case.input)
+    for m, counts in stats.counts.items():
+        assert bytes(n > 0 for n in counts) == coverage.bitmaps[m]
+
+    collatz = jvm.AbsMethodID.decode("jpamb.cases.Tricky.collatz:(I)V")
+    single = OpcodeStats()
+    Interpreter(suite, stats=single).run(collatz, model.Input.decode("(7)"))
+    summary = single.summary(interpreter.opcodes)
+    assert summary["total"] == sum(single.counts[collatz])
+    assert sum(r["count"] for r in summary["byopcode"].values()) == summary["total"]
+    counts = [r["count"] for r in summary["instructions"]]
+    assert counts == sorted(counts, reverse=True)
+
+    cases = [case.encode() for case in suite.cases]
+    merged = OpcodeStats()
+    for chunk in (cases[0::2], cases[1::2]):
+        merged.merge(OpcodeStats.decode(count_cases(suite.workfolder, chunk)))
+    assert merged.encode() == stats.encode()
+
+
+def test_opcode_stats_timed():
+    stats = OpcodeStats(sample=1)
+    timing = Interpreter(suite, stats=stats)
+    collatz = jvm.AbsMethodID.decode("jpamb.cases.Tricky.collatz:(I)V")
+    assert timing.run(collatz, model.Input.decode("(7)")) == "ok"
+    summary = stats.summary(interpreter.opcodes)
+    for name, row in summary["byopcode"].items():
+        assert row["time"]["samples"] == row["count"], name
+        assert row["time"]["p50_ns"] <= row["time"]["p90_ns"]
+
+    with pytest.raises(ValueError):
+        Interpreter(suite, coverage=Coverage(), stats=OpcodeStats())
+
+
+def test_translate_straight_line():
+    mid = jvm.AbsMethodID.decode("jpamb.cases.Simple.divideByN:(I)I")
+    source = translate(tuple(suite.method_opcodes(mid)), mid.extension.params).source
+    assert "pc" not in source, "methods without branches should be straight-line"
+
+
+def st_int_methods():
+    methods = [
+        m
+        for m, _ in suite.case_methods()
+        if len(m.extension.params) > 0
+        and all(isinstance(p, jvm.Int) for p in m.extension.params)
+    ]
+    return st.sampled_from(methods)
+
+
+def allocates(method: jvm.AbsMethodID, seen=()) -> bool:
+    """Check if the method, or a method of the cases it calls, allocates
+    arrays, like 'new int[n]'."""
+    for opcode in suite.method_opcodes(method):
+        match opcode:
+            case jvm.NewArray():
+                return True
+            case jvm.InvokeStatic(method=callee):
+                callee = resolve(callee)
+                if (
+                    callee.classname.packages == method.classname.packages
+                    and callee not in seen
+                    and allocates(callee, (*seen, method))
+                ):
+                    return True
+    return False
+
+
+def st_ints(method: jvm.AbsMethodID, full=st.integers(-(2**31), 2**31 - 1)):
+    """Ints for the parameters of the method; methods that allocate arrays
+    only get small ints, so that they do not allocate gigabytes."""
+    return st.integers(-(2**10), 2**10) if allocates(method) else full
+
+
+@settings(max_examples=50, deadline=None)
+@given(st_int_methods(), st.data())
+def test_compiled_agrees_with_interpreter(method, data):
+    values = [data.draw(st_ints(method)) for _ in method.extension.params]
+    input = model.Input(tuple(jvm.Value.int(v) for v in values))
+    assert compiler.run(method, input) == interpreter.run(method, input)
+
+
+def test_batch_agrees_with_cases():
+    pytest.importorskip("numpy")
+    from jpamb.batch import BatchInterpreter
+
+    batch = BatchInterpreter(suite)
+    for method, cases in model.Case.by_methodid(suite.cases):
+        inputs = [c.input for c in cases] * 3
+        expected = [c.result for c in cases] * 3
+        assert batch.run_many(method, inputs) == expected, str(method)
+
+
+@settings(max_examples=20, deadline=None)
+@given(st_int_methods(), st.data())
+def test_batch_agrees_with_interpreter(method, data):
+    pytest.importorskip("numpy")
+    from jpamb.batch import BatchInterpreter
+
+    batch = BatchInterpreter(suite, max_steps=1000)
+    small = Interpreter(suite, max_steps=1000)
+    ints = st_ints(method) | st.integers(-50, 50)
+    inputs = [
+        model.Input(
+            tuple(jvm.Value.int(data.draw(ints)) for _ in method.extension.params)
+        )
+        for _ in range(data.draw(st.integers(1, 32)))
+    ]
+    expected = [small.run(method, i) for i in inputs]
+    assert batch.run_many(method, inputs) == expected
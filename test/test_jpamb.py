@@ -14,3 +14,52 @@ def test_classfile():
     assert jpamb.classfile(mid).absolute(), "should be absolute"
     assert jpamb.classfile(mid).name == "Simple.class", "should be Simple.class"
     assert jpamb.classfile(mid).exists(), "should exist"
+
+
+# The cumulative microseconds 'import jpamb' may take.
+IMPORT_BUDGET = 25_000
+
+
+def importtime(code: str) -> dict[str, int]:
+    """The cumulative microseconds of the imports of running the code."""
+    import subprocess
+    import sys
+
+    cp = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in cp.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_import_time():
+    # The fastest of a few runs, as the machine may be busy.
+    best = min(importtime("import jpamb")["jpamb"] for _ in range(3))
+    assert best < IMPORT_BUDGET
+
+
+def test_import_no_side_effects():
+    code = """
+import sys
+sys.argv = ["analyzer.py", "jpamb.cases.Simple.assertPositive:(I)V", "(1)"]
+import jpamb
+jpamb.getcase()
+assert "loguru" not in sys.modules, "should not import loguru"
+assert "jpamb.jvm.opcode" not in sys.modules, "should not import the opcodes"
+"""
+    times = importtime(code)
+    assert "jpamb.model" in times
+
+
+def test_lazy_attributes():
+    assert jpamb.Suite is jpamb.model.Suite
+    assert jvm.Push is jvm.opcode.Push
+    assert "decode_method" in dir(jvm)
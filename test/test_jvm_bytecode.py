@@ -1,5 +1,6 @@
 from jpamb import jvm, model
 
+import pytest
 from hypothesis import given, strategies as st
 
 suite = model.Suite()
@@ -22,9 +23,25 @@ def st_caseopcodes():
 
 @given(st_casemethods())
 def test_parse_opcode(method):
-    for opcode in suite.findmethod(method)["code"]["bytecode"]:
-        op = jvm.Opcode.from_json(opcode)
-        assert isinstance(op, jvm.Opcode)
+    with jvm.validation():
+        for opcode in suite.findmethod(method)["code"]["bytecode"]:
+            op = jvm.Opcode.from_json(opcode)
+            assert isinstance(op, jvm.Opcode)
+
+
+@given(st_casemethods())
+def test_decode_method(method):
+    bytecode = suite.findmethod(method)["code"]["bytecode"]
+    with jvm.validation():
+        expected = tuple(jvm.Opcode.from_json(op) for op in bytecode)
+    assert jvm.decode_method(bytecode) == expected
+
+
+def test_validation():
+    bad = {"offset": "0", "opr": "dup", "words": 1}
+    assert isinstance(jvm.Opcode.from_json(bad), jvm.Dup)
+    with jvm.validation(), pytest.raises(AssertionError):
+        jvm.Opcode.from_json(bad)
 
 
 @given(st_caseopcodes())
@@ -50,3 +67,16 @@ def test_opcode_real(op):
 @given(st_caseopcodes())
 def test_opcode_hash(op):
     assert hash(op)
+
+
+def test_interning():
+    interner = jvm.Interner()
+    methods = [opcodes for _, opcodes in suite.all_opcodes()]
+    interned = [interner.method(opcodes) for opcodes in methods]
+    for opcodes, method in zip(methods, interned):
+        assert method.opcodes() == opcodes
+        assert method.same_as(interner.method(opcodes))
+    assert len(interner) < sum(map(len, methods))
+
+    stats = suite.opcode_memory()
+    assert stats["interned bytes"] < stats["bytes"]
@@ -2,6 +2,7 @@ from jpamb import model, jvm
 from pathlib import Path
 
 import pytest
+from hypothesis import given, strategies as st
 
 
 def test_suite_singleton():
@@ -48,3 +49,33 @@ def test_classlookup():
         assert suite.sourcefile(cn) in sourcefiles
         assert suite.classfile(cn) in classfiles
         assert suite.decompiledfile(cn) in decompiledfiles
+
+
+ints = st.integers(min_value=-(2**31), max_value=2**31 - 1)
+chars = st.characters(exclude_characters="'", exclude_categories=["Cs"])
+values = st.one_of(
+    ints.map(jvm.Value.int),
+    st.booleans().map(jvm.Value.boolean),
+    chars.map(jvm.Value.char),
+    st.lists(ints).map(lambda xs: jvm.Value.array(jvm.Int(), xs)),
+    st.lists(chars).map(lambda cs: jvm.Value.array(jvm.Char(), cs)),
+)
+
+
+@given(st.lists(values).map(lambda vs: model.Input(tuple(vs))))
+def test_input_roundtrip(input):
+    assert model.Input.decode(input.encode()) == input
+
+
+def test_input_decode_many():
+    lines = ["(1, [I:1, -2 ,3])", "([C:']', ','])", "(1, [I:1, -2 ,3])", "([I:])"]
+    inputs = model.Input.decode_many(lines)
+    assert inputs == [model.Input.decode(line) for line in lines]
+    assert inputs[0] is inputs[2]
+    assert inputs[1].values[0].value == ("]", ",")
+
+
+def test_input_large_array():
+    xs = list(range(-50_000, 50_000))
+    input = model.Input((jvm.Value.array(jvm.Int(), xs),))
+    assert model.Input.decode(input.encode()) == input
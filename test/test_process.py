@@ -0,0 +1,126 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from jpamb import process
+
+
+def python(code: str) -> list[str]:
+    return [sys.executable, "-S", "-c", code]
+
+
+def test_run():
+    lines = []
+    out, ns = process.run(python("print('a'); print('b')"), logout=lines.append)
+    assert out == "a\nb\n"
+    assert lines == ["a", "b"]
+    assert ns > 0
+
+
+def test_run_failure():
+    cmd = python("import sys; print('out'); print('err', file=sys.stderr); sys.exit(3)")
+    with pytest.raises(subprocess.CalledProcessError) as e:
+        process.run(cmd)
+    assert (e.value.returncode, e.value.stdout, e.value.stderr) == (3, "out\n", "err\n")
+
+
+def test_run_timeout():
+    start = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        process.run(python("import time; time.sleep(10)"), timeout=0.5)
+    assert time.monotonic() - start < 5
+
+
+def test_run_many():
+    cmds = [python(f"print({i})") for i in range(20)] + [
+        python("import sys; sys.exit(1)")
+    ]
+    results = process.run_many(cmds, jobs=4)
+    assert [out for out, _ in results[:-1]] == [f"{i}\n" for i in range(20)]
+    assert isinstance(results[-1], subprocess.CalledProcessError)
+
+
+def alive(pid: int) -> bool:
+    """Check if the process is running, counting zombies as dead."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+@pytest.mark.skipif(not os.path.exists("/proc"), reason="needs /proc")
+def test_run_timeout_stops_group(tmp_path):
+    pidfile = tmp_path / "pid"
+    spawn = (
+        "import subprocess, sys, time; "
+        "p = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)']); "
+        f"open({str(pidfile)!r}, 'w').write(str(p.pid)); "
+        "time.sleep(60)"
+    )
+    with pytest.raises(subprocess.TimeoutExpired):
+        process.run(python(spawn), timeout=1)
+    pid = int(pidfile.read_text())
+    time.sleep(0.1)
+    assert not alive(pid)
+
+
+def test_run_cpu_limit():
+    with pytest.raises(process.LimitExceeded) as e:
+        process.run(
+            python("while True: pass"), timeout=10, limits=process.Limits(cpu=1)
+        )
+    assert e.value.limit == "cpu"
+
+
+def test_run_memory_limit(tmp_path):
+    script = tmp_path / "allocate.py"
+    script.write_text("x = bytearray(2**30)\n")
+    limits = process.Limits(memory=512 * 1024 * 1024)
+    with pytest.raises(process.LimitExceeded) as e:
+        process.run([sys.executable, str(script)], limits=limits)
+    assert e.value.limit == "memory"
+    assert "MemoryError" in e.value.stderr
+
+
+def test_run_limits_in_thread():
+    from concurrent.futures import ThreadPoolExecutor
+
+    code = "import resource; print(resource.getrlimit(resource.RLIMIT_CPU))"
+    limits = process.Limits(cpu=5)
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(process.run, python(code), limits=limits)]
+        futures += [pool.submit(process.run, python("pass")) for _ in range(8)]
+        out, _ = futures[0].result()
+    assert out == "(5, 6)\n"
+
+
+def test_run_failure_is_not_a_limit():
+    limits = process.Limits(memory=512 * 1024 * 1024, cpu=5)
+    with pytest.raises(subprocess.CalledProcessError) as e:
+        process.run(python("import sys; sys.exit(3)"), limits=limits)
+    assert not isinstance(e.value, process.LimitExceeded)
+    assert e.value.returncode == 3
+
+
+def test_measure():
+    code = "x = bytearray(200 * 2**20); sum(range(10**7))"
+    out, ns, usage = process.measure(python(code), timeout=20)
+    assert usage.max_rss > 200 * 2**20
+    assert usage.user > 0
+    assert usage.user + usage.system < ns / 1e9 + 0.1
+
+
+def test_measure_in_thread():
+    from concurrent.futures import ThreadPoolExecutor
+
+    code = "import sys; sys.exit(3)"
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(process.run, [python("print(1)")] * 8))
+        with pytest.raises(subprocess.CalledProcessError) as e:
+            pool.submit(process.run, python(code)).result()
+    assert [out for out, _ in results] == ["1\n"] * 8
+    assert e.value.returncode == 3
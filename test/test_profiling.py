@@ -0,0 +1,68 @@
+import pstats
+import subprocess
+import sys
+
+import pytest
+from click.testing import CliRunner
+
+from jpamb import cli, profiling
+
+SCRIPT = """
+import sys
+
+def busy():
+    return sum(i * i for i in range(300_000))
+
+for _ in range(10):
+    busy()
+print(sys.argv[1])
+sys.exit(3)
+"""
+
+
+@pytest.mark.parametrize("mode", profiling.MODES)
+def test_profiled_script(tmp_path, mode):
+    script = tmp_path / "script.py"
+    script.write_text(SCRIPT)
+    out = tmp_path / "script.pstats"
+    cmd = profiling.command((sys.executable, str(script)), out, mode)
+    cp = subprocess.run(cmd + ("hello",), capture_output=True, text=True)
+    assert (cp.returncode, cp.stdout) == (3, "hello\n")
+
+    stats = pstats.Stats(str(out)).stats
+    (busy,) = [v for (file, _, name), v in stats.items() if name == "busy"]
+    assert busy[3] > 0
+    assert "(busy)" in profiling.table([out], top=50)
+
+
+def test_filename():
+    name = profiling.filename("jpamb.cases.Simple.assertPositive:(I)V")
+    assert name == "jpamb.cases.Simple.assertPositive_I_V.pstats"
+    assert profiling.filename("A.f:()V", -1) == "A.f_V.-1.pstats"
+
+
+def test_cli_profile(tmp_path):
+    runner = CliRunner()
+    args = ["test", "-f", "Simple.assertPositive", "--profile", str(tmp_path)]
+    args += ["--history", str(tmp_path / "history.json")]
+    result = runner.invoke(
+        cli.cli, args + ["-W", "solutions/bytecoder.py"], catch_exceptions=False
+    )
+    assert result.exit_code == 0
+    assert "tottime" in result.output
+    (path,) = tmp_path.glob("*.pstats")
+    assert path.name == "jpamb.cases.Simple.assertPositive_I_V.pstats"
+
+    result = runner.invoke(cli.cli, args + ["--", "java", "-version"])
+    assert result.exit_code == 2
+    assert "only works for analyzers in python" in result.output
+
+
+def test_is_python():
+    import os
+
+    relative = os.path.relpath(sys.executable)
+    assert profiling.is_python((relative, "solutions/apriori.py"))
+    assert profiling.is_python((sys.executable, "solutions/apriori.py"))
+    assert not profiling.is_python(("java", "Main.py"))
+    assert not profiling.is_python((sys.executable, "-c", "pass"))
@@ -0,0 +1,101 @@
+import pytest
+
+from jpamb.report import (
+    Checkpoint,
+    CheckpointWriter,
+    finalize,
+    merge,
+    summarize_method,
+)
+
+
+def iteration(i, score, max_rss=100):
+    return {
+        "iteration": i,
+        "score": score,
+        "time": 10,
+        "relative": 0.5,
+        "user": 1.0,
+        "system": 0.5,
+        "max_rss": max_rss,
+        "voluntary_switches": 2,
+        "involuntary_switches": 0,
+    }
+
+
+def test_checkpoint_roundtrip(tmp_path):
+    path = tmp_path / "report.jsonl"
+    writer = CheckpointWriter.open(path)
+    writer.info({"name": "test"})
+    writer.iteration("A.f:()V", iteration(0, 1.0))
+    writer.method("A.f:()V", summarize_method([iteration(0, 1.0)]))
+    writer.iteration("A.g:()V", iteration(0, 0.5))
+    writer.close()
+
+    checkpoint = Checkpoint.read(path)
+    assert checkpoint.info == {"name": "test"}
+    assert list(checkpoint.methods) == ["A.f:()V"]
+    assert checkpoint.results("A.g:()V") == [iteration(0, 0.5)]
+
+
+def test_checkpoint_cut_short(tmp_path):
+    path = tmp_path / "report.jsonl"
+    writer = CheckpointWriter.open(path)
+    writer.iteration("A.f:()V", iteration(0, 1.0))
+    writer.close()
+    with open(path, "a") as fp:
+        fp.write('{"kind": "iteration", "meth')
+
+    assert Checkpoint.read(path).results("A.f:()V") == [iteration(0, 1.0)]
+
+    writer = CheckpointWriter.open(path, resume=True)
+    writer.iteration("A.f:()V", iteration(1, 1.0))
+    writer.close()
+    assert len(Checkpoint.read(path).results("A.f:()V")) == 2
+
+    with open(path, "a") as fp:
+        fp.write("{\n{}\n")
+    with pytest.raises(ValueError):
+        Checkpoint.read(path)
+
+
+def test_finalize():
+    f = summarize_method(
+        [
+            iteration(0, 1.0, 100),
+            {"iteration": 1, "timeout": 2.0},
+            iteration(2, 0.0, 300),
+        ]
+    )
+    assert f["score"] == 0.5
+    assert f["max_rss"] == 300
+    assert f["user"] == 1.0
+    assert len(f["iterations"]) == 3
+
+    g = summarize_method([{"iteration": 0, "limit": "memory"}])
+    assert g["score"] == 0 and g["max_rss"] == 0
+
+    report = finalize({"name": "test"}, {"A.f:()V": f, "A.g:()V": g})
+    assert report["score"] == 0.5
+    assert report["max_rss"] == 300
+    assert report["user"] == 0.5
+
+
+def test_merge():
+    methods = ["A.f:()V", "A.g:()V"]
+    info = {"name": "test", "system": "a"}
+    f = summarize_method([iteration(0, 1.0)])
+    g = summarize_method([iteration(0, 0.5)])
+    shards = {
+        "1.json": finalize(info, {"A.f:()V": f}),
+        "2.json": finalize({**info, "system": "b"}, {"A.g:()V": g}),
+    }
+    merged = merge(shards, methods)
+    assert merged == finalize(info, {"A.f:()V": f, "A.g:()V": g})
+
+    with pytest.raises(ValueError, match="missing"):
+        merge({"1.json": shards["1.json"]}, methods)
+    with pytest.raises(ValueError, match="both"):
+        merge({**shards, "3.json": shards["1.json"]}, methods)
+    with pytest.raises(ValueError, match="another analyzer"):
+        merge({**shards, "2.json": finalize({"name": "other"}, {})}, methods)
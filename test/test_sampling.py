@@ -0,0 +1,48 @@
+import math
+
+from jpamb.sampling import Sampler, confidence_interval, reject_outliers
+
+
+def test_confidence_interval():
+    assert confidence_interval([]) == (-math.inf, math.inf)
+    assert confidence_interval([2.0]) == (2.0, 2.0)
+    low, high = confidence_interval([1.0, 2.0, 3.0])
+    assert low < 2.0 < high
+    # t(2) * stdev / sqrt(3) = 4.303 * 1 / 1.732...
+    assert math.isclose(high - 2.0, 4.303 / math.sqrt(3))
+
+
+def test_reject_outliers():
+    samples = [1.0, 1.1, 0.9, 1.0, 1.05, 10.0]
+    assert reject_outliers(samples) == samples[:-1]
+    assert reject_outliers([1.0, 1.0, 5.0, 1.0]) == [1.0, 1.0, 5.0, 1.0]
+
+
+def test_sampler_fixed():
+    sampler = Sampler(minimum=3)
+    for x in [1.0, 5.0]:
+        sampler.add(x)
+        assert not sampler.done()
+    sampler.fail()
+    assert sampler.done()
+
+
+def test_sampler_adaptive():
+    sampler = Sampler(minimum=3, width=0.1, maximum=10)
+    for x in [1.0, 1.01, 0.99]:
+        sampler.add(x)
+    assert sampler.done()
+
+    sampler = Sampler(minimum=3, width=0.1, maximum=10)
+    for x in [1.0, 2.0, 3.0]:
+        sampler.add(x)
+    assert not sampler.done()
+    for _ in range(7):
+        sampler.fail()
+    assert sampler.done()
+
+    sampler = Sampler(minimum=2, width=0.1, budget=1.0)
+    sampler.add(1.0, 0.6)
+    sampler.add(2.0, 0.6)
+    assert sampler.done()
+    assert sampler.summary()["samples"] == 2
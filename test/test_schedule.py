@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+
+from jpamb import model
+from jpamb.schedule import (
+    History,
+    execute,
+    parse_shard,
+    plan,
+    run_methods,
+    shard,
+    shard_methods,
+)
+
+
+def test_plan():
+    schedule = plan({"a": 1, "b": 5, "c": 3, "d": 3, "e": 2}, workers=2)
+    assert schedule.order == ["b", "c", "d", "e", "a"]
+    # b | c d, then e joins b and a joins c d.
+    assert schedule.predicted == 7
+
+    assert plan({"a": 1, "b": 2}, workers=1).predicted == 3
+    assert plan({}, workers=4).predicted == 0
+
+
+def test_history(tmp_path):
+    path = tmp_path / "history.json"
+    history = History.load(path)
+    assert history.estimate("p", {"a": 10, "b": 20}) == {"a": 0.05, "b": 0.1}
+
+    history.record("p", {"a": 1.0})
+    history.record("p", {"a": 2.0})
+    history.save()
+
+    history = History.load(path)
+    assert history.programs == {"p": {"a": 1.5}}
+    # Methods without history are estimated by their size.
+    assert history.estimate("p", {"a": 10, "b": 20}) == {"a": 1.5, "b": 3.0}
+
+
+def test_execute():
+    schedule = plan({"a": 1, "b": 2}, workers=2)
+    outcome = execute(lambda k: 1 / (k == "a"), schedule, jobs=2)
+    assert outcome.results["a"] == 1
+    assert isinstance(outcome.results["b"], ZeroDivisionError)
+    assert outcome.makespan >= max(outcome.durations.values())
+
+
+def test_execute_inline():
+    schedule = plan({"a": 1, "b": 2}, workers=1)
+    outcome = execute(lambda k: threading.current_thread(), schedule, jobs=1)
+    assert set(outcome.results.values()) == {threading.current_thread()}
+
+
+def test_run_methods(tmp_path):
+    suite = model.Suite()
+    methods = [m for m, _ in suite.case_methods()][:4]
+    history = History.load(tmp_path / "history.json")
+    outcome = run_methods(suite, methods, str, "p", jobs=2, history=history)
+    assert outcome.results == {m: str(m) for m in methods}
+    assert set(History.load(history.path).programs["p"]) == set(map(str, methods))
+
+
+def test_shard():
+    costs = {"a": 1, "b": 5, "c": 3, "d": 3, "e": 2}
+    shards = [shard(costs, i, 2) for i in (1, 2)]
+    assert shards == [["b", "e"], ["c", "d", "a"]]
+    assert shard(costs, 1, 1) == ["b", "c", "d", "e", "a"]
+
+    suite = model.Suite()
+    methods = [m for m, _ in suite.case_methods()]
+    shards = [shard_methods(suite, methods, i, 3) for i in (1, 2, 3)]
+    assert sorted(sum(shards, []), key=methods.index) == methods
+    assert shards[0] == [m for m in methods if m in shards[0]]
+
+
+def test_parse_shard():
+    assert parse_shard("2/4") == (2, 4)
+    for text in ["0/4", "5/4", "1", "a/b"]:
+        with pytest.raises(ValueError):
+            parse_shard(text)
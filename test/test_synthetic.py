@@ -0,0 +1,56 @@
+import json
+
+from click.testing import CliRunner
+import pytest
+
+from jpamb import cli, jvm, model, synthetic
+from jpamb.interpreter import Interpreter
+
+SHAPES = [
+    synthetic.Shape(500, branch_density=0.2, loop_depth=0, arrays=0.2, seed=1),
+    synthetic.Shape(2000, branch_density=0.1, loop_depth=2, arrays=0.1, seed=2),
+    synthetic.Shape(3000, branch_density=0.0, loop_depth=3, arrays=0.0, seed=3),
+]
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_generated_opcodes_decode(shape):
+    bytecode, steps = synthetic.Generator(shape, "jpamb/synthetic/Test").generate()
+    assert abs(len(bytecode) - shape.instructions) <= 10
+    with jvm.validation():
+        for op in bytecode:
+            jvm.Opcode.from_json(op)
+
+
+def test_generate_cases(tmp_path):
+    manifest = synthetic.generate(tmp_path, SHAPES)
+    assert [e["instructions"] for e in manifest] == [
+        pytest.approx(s.instructions, abs=10) for s in SHAPES
+    ]
+    assert json.loads((tmp_path / "synthetic.json").read_text()) == manifest
+
+    suite = model.Suite(tmp_path)
+    assert len(suite.cases) == 3 * len(SHAPES)
+    steps = {e["method"]: e["steps"] for e in manifest}
+    for case in suite.cases:
+        interpreter = Interpreter(suite, max_steps=steps[case.methodid.encode()])
+        assert interpreter.run(case.methodid, case.input) == case.result
+        assert case.result != "*"
+
+
+def test_cli_synthetic(tmp_path):
+    runner = CliRunner()
+    corpus = tmp_path / "corpus"
+    result = runner.invoke(
+        cli.cli, ["synthetic", "generate", "--sizes", "100,300", str(corpus)]
+    )
+    assert result.exit_code == 0, result.output
+    assert (corpus / "stats" / "cases.txt").exists()
+
+    report = tmp_path / "scaling.json"
+    args = ["synthetic", "scaling", "--report", str(report), str(corpus)]
+    result = runner.invoke(cli.cli, args + ["-W", "solutions/bytecoder.py"])
+    assert result.exit_code == 0, result.output
+    timed = json.loads(report.read_text())
+    assert [e["instructions"] for e in timed] == [100, 300]
+    assert all(e["seconds"] > 0 for e in timed)
@@ -0,0 +1,67 @@
+import json
+import threading
+
+from click.testing import CliRunner
+
+from jpamb import cli, timeline
+
+
+def test_timeline_tracks():
+    tl = timeline.Timeline("test")
+    with tl.span("outer", "case", n=1) as span:
+        with tl.span("inner", "process"):
+            pass
+        span.annotate(done=True)
+
+    def worker():
+        with tl.span("other", "case"):
+            pass
+
+    thread = threading.Thread(target=worker, name="worker_0")
+    thread.start()
+    thread.join()
+
+    events = tl.events()
+    names = {e["args"]["name"] for e in events if e["name"] == "thread_name"}
+    assert names == {threading.current_thread().name, "worker_0"}
+    spans = {e["name"]: e for e in events if e["ph"] == "X"}
+    assert list(spans) == ["outer", "inner", "other"]
+    assert spans["outer"]["args"] == {"n": 1, "done": True}
+    assert spans["outer"]["tid"] == spans["inner"]["tid"] != spans["other"]["tid"]
+    outer, inner = spans["outer"], spans["inner"]
+    assert outer["ts"] <= inner["ts"]
+    assert inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+
+
+def test_span_error():
+    tl = timeline.Timeline()
+    try:
+        with tl.span("failing"):
+            raise KeyError
+    except KeyError:
+        pass
+    (event,) = [e for e in tl.events() if e["ph"] == "X"]
+    assert event["args"] == {"error": "KeyError"}
+
+
+def test_no_timeline():
+    assert timeline.TIMELINE is None
+    assert timeline.span("nothing") is timeline.NO_SPAN
+
+
+def test_cli_trace_out(tmp_path):
+    path = tmp_path / "run.json"
+    result = CliRunner().invoke(
+        cli.cli,
+        ["test", "-f", "Simple.assert", "-j", "2", "--trace-out", str(path)]
+        + ["--history", str(tmp_path / "history.json")]
+        + ["--with-python", "solutions/apriori.py"],
+        catch_exceptions=False,
+    )
+    assert result.exit_code == 0
+    assert timeline.TIMELINE is None
+    events = json.loads(path.read_text())["traceEvents"]
+    cats = {e.get("cat") for e in events}
+    assert {"case", "process", "report"} <= cats
+    threads = {e["args"]["name"] for e in events if e["name"] == "thread_name"}
+    assert len([t for t in threads if t.startswith("worker")]) == 2
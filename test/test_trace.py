@@ -0,0 +1,36 @@
+from jpamb import jvm, model
+from jpamb.interpreter import Interpreter
+from jpamb.trace import Trace, diff
+
+suite = model.Suite()
+collatz = jvm.AbsMethodID.decode("jpamb.cases.Tricky.collatz:(I)V")
+
+
+def record(input: str, capacity: int = 1 << 16) -> Trace:
+    trace = Trace(capacity)
+    Interpreter(suite, trace=trace).run(collatz, model.Input.decode(input))
+    return trace
+
+
+def test_trace_round_trip(tmp_path):
+    trace = record("(7)")
+    trace.write(tmp_path / "a.trace")
+    read = Trace.read(tmp_path / "a.trace")
+    assert read.records() == trace.records()
+    assert read.records()[0].opcode == "Get"
+
+
+def test_trace_ring_buffer(tmp_path):
+    full, ring = record("(7)"), record("(7)", capacity=10)
+    assert ring.dropped == full.count - 10
+    assert ring.records() == full.records()[-10:]
+    ring.write(tmp_path / "ring.trace")
+    assert Trace.read(tmp_path / "ring.trace").dropped == ring.dropped
+
+
+def test_trace_diff():
+    seven, nine = record("(7)").records(), record("(9)").records()
+    assert diff(seven, seven) is None
+    i = diff(seven, nine)
+    assert seven[:i] == nine[:i]
+    assert seven[i].value == 7 and nine[i].value == 9